@@ -11,18 +11,29 @@ Copyright (c) 2022 Andrew Shteren
 Improved file archiving, correct encoding of
 names and symbolic links with progress bar
 
-So far only supports .zip
+Supports .zip and .tar with gz, xz or bz2
+compression, format is chosen by extension
 
 '''
+import bisect
+import contextlib
+import errno
 import hashlib
+import io
 import itertools
+import json
 import multiprocessing
 import os
+import re
 import shutil
+import stat
+import tarfile
+import tempfile
 import threading
 import time
 import zipfile
-from operator import attrgetter
+import zlib
+from operator import attrgetter, itemgetter
 from typing import IO, Iterator
 
 import charset_normalizer
@@ -33,6 +44,11 @@ from widgets import clear_terminal
 if WINDOWS_VT_MODE():
     import ctypes
 
+#  Read buffer for copying members
+CHUNK_SIZE = 1024 * 1024
+#  Buffer of split archive volumes
+VOLUME_BUFFER_SIZE = 8 * 1024 * 1024
+
 
 class ProgressBar():
 
@@ -243,293 +259,987 @@ class ProgressBar():
         self.change_cursor_visibility(True)
 
 
-class ZipFile(zipfile.ZipFile):
+class IgnorePatterns():
 
-    def __init__(
-        self,
-        file: str | IO,
-        mode: str="r",
-        compression: int=zipfile.ZIP_STORED,
-        allowZip64: bool=True,
-        compresslevel: int | None=None,
-        *,
-        strict_timestamps: bool=True,
-        preferredEncoding: str="cp866",
-        ignore: list[str]=[],
-        overwriteDuplicates: bool=False,
-        symlinksToFiles: bool=False,
-        progressbar: bool=False,
-        useBarPrefix: bool=True,
-        clearBarAfterFinished: bool=False
-    ):
+    #  Directories with cached results, the cache
+    #  is cleared when it's full
+    CACHE_SIZE = 65536
+
+    def __init__(self, patterns: list[str]):
         '''
-        Better ZipFile with proper names and symlinks encoding & progressbar
+        Glob ignore patterns compiled into one matcher
 
         Args:
-            file (str | IO): Either the path to the file, 
-                or a file-like object
-            mode (str, optional): File mode. Defaults to "r".
-            compression (int, optional): ZIP_STORED (no compression),
-                ZIP_DEFLATED (requires zlib), ZIP_BZIP2 (requires bz2)
-                or ZIP_LZMA (requires lzma). Defaults to zipfile.ZIP_STORED.
-            allowZip64 (bool, optional): if True ZipFile will create files
-                with ZIP64 extensions when needed, otherwise it will raise
-                an exception when this would be necessary. Defaults to True.
-            compresslevel (int | None, optional): None (default for the given
-                compression type) or an integer specifying the level to pass
-                to the compressor. When using ZIP_STORED or ZIP_LZMA this
-                keyword has no effect. When using ZIP_DEFLATED integers 0
-                through 9 are accepted. When using ZIP_BZIP2 integers 1
-                through 9 are accepted. Defaults to None.
-            strict_timestamps (bool, optional): Strict timestamps.
-                Defaults to True.
-            preferredEncoding (str, optional): Encoding to use when
-                guessing the original. Defaults to "cp866".
-            ignore (list[str], optional): Filenames to ignore.
-                Defaults to [].
-            overwriteDuplicates (bool, optional): Overwrite if file exists
-                or write filename with number in it. If you are going to
-                enable this option - open archive in 'a' mode.
-                Defaults to False
-            symlinksToFiles (bool, optional): Replace symbolic links with the
-                files they point to or not. If the file does not exist, the link
-                will be packed. Hard links are always written as regular files
-                regardless of this option. Defaults to False
-            progressbar (bool, optional): Render progress bar while
-                running or not. Defaults to False.
-            useBarPrefix (bool, optional): Show progress bar prefix, disable
-                this option if your program itself prints events to the terminal.
-                Defaults to True
-            clearBarAfterFinished (bool, optional): Clears progress bar after it's
-                finished. Defaults to False
-
-        If you use progressbar option on Windows - run your code in the
-        "if __name__ == '__main__'" statement
+            patterns (list[str]): Names or glob patterns.
+                A pattern without slashes matches any path
+                component (".git", "*.tmp"), a trailing slash
+                matches directories only ("build/"), a slash
+                inside anchors the pattern to the root of the
+                path ("docs/build", "/build") and "**" matches
+                any number of directories ("**/__pycache__")
+
+        Paths are matched as given, archives match member names
+        relative to their root, see Archive.is_ignored. Results
+        for directories are cached, so once a directory is ignored
+        its whole subtree is ignored without matching
         '''
-        self.latestCharset = None
-        self.preferredEncoding = preferredEncoding
-        
-        super().__init__(
-            file=file,
-            mode=mode,
-            compression=compression,
-            allowZip64=allowZip64,
-            compresslevel=compresslevel,
-            strict_timestamps=strict_timestamps
-        )
-
-        #  Archive filename
-        self.arcname = os.path.basename(self.filename)
+        self.patterns = list(patterns)
+        self._dirs = {}
 
-        self.ignore = ignore
-        self.overwriteDuplicates = overwriteDuplicates
-        self.symlinksToFiles = symlinksToFiles
-        
-        self.progressbar = progressbar
-
-        if progressbar:
-            self.prefix = multiprocessing.Array("c", 272)
-            self.prefix.value = b""
-            self.counter = multiprocessing.Value("i", 0)
-            self.unit = multiprocessing.Array("c", 6)
-            self.unit.value = b"files"
-            self.finished = multiprocessing.Value("b", False)
-            self._start_progressbar("__init__", createOnly=True)
-        
-        self.useBarPrefix = useBarPrefix
-        self.clearBarAfterFinished = clearBarAfterFinished
-
-    def __exit__(self, type, value, traceback):
-        self.close()
-        
-        #  Delete archive if empty
-        if self.filelist:
-            return
+        if self.patterns:
+            regex = "|".join(f"(?:{self.translate(pattern)})" for pattern in self.patterns)
+            self._regex = re.compile(regex, re.DOTALL)
+        else:
+            self._regex = None
 
-        if self.progressbar:
-            if self.useBarPrefix:
-                self.prefix.value = f"Removing \"{self.arcname}\" : ".encode()
-            self.counter.value = -1
-            self.unit.value = b""
-            self._start_progressbar("__exit__")
-        
-        os.remove(self.filename)
-        self._finish_progressbar("__exit__")
+    def __repr__(self) -> str:
+        return f"IgnorePatterns({self.patterns})"
 
-    def _start_progressbar(self, ownerName: str, createOnly: bool=False):
+    @staticmethod
+    def translate(pattern: str) -> str:
         '''
-        Start progress bar
-        Because we cannot restart a terminated process.
-        We need to instantiate a new.
+        Translate glob pattern to regex, which
+        matches a path with slash separators and
+        a trailing slash for directories
 
         Args:
-            ownerName (str): Name of the progress bar owner.
-                This is an additional protection against updating and
-                finishing the progress bar with other functions.
-            createOnly (bool, optional): Don't start renderingProcess
-                after creating. Defaults to False.
-        '''
-        self._progressbarOwner = ownerName
-        self.renderingProcess = multiprocessing.Process(
-            target=ProgressBar(40).start_rendering_mp,
-            args=(self.prefix, self.counter, self.unit, self.finished)
-        )
-        if not createOnly:
-            self.renderingProcess.start()
+            pattern (str): Glob pattern
 
-    def _update_progressbar(self, callerName: str):
+        Returns:
+            str: Regular expression
         '''
-        Increment progressbar counter if needed
+        pattern = pattern.replace("\\", "/")
+        dirOnly = pattern.endswith("/")
+        pattern = pattern.rstrip("/")
+        anchored = "/" in pattern
+        parts = pattern.strip("/").split("/")
 
-        Args:
-            callerName (str): Caller name, compared
-            with progress bar owner's name
-        '''
-        if self._progressbarOwner != callerName:
-            return
+        regex = "" if anchored else "(?:.*/)?"
 
-        if self.progressbar and self.counter.value != -1:
-            with self.counter.get_lock():
-                self.counter.value += 1
+        for index, part in enumerate(parts):
+            last = index == len(parts) - 1
 
-    def _reset_progressbar(self):
-        '''
-        Reset progress bar values to defaults
-        '''
-        self.prefix.value = b""
-        self.counter.value = 0
-        self.unit.value = b"files"
-        self.finished.value = False
+            if part == "**":
+                regex += ".+" if last else "(?:.*/)?"
+                continue
 
-    def _finish_progressbar(self, callerName: str):
-        '''
-        Finish progressbar
+            i = 0
+            while i < len(part):
+                char = part[i]
+                i += 1
+                if char == "*":
+                    regex += "[^/]*"
+                elif char == "?":
+                    regex += "[^/]"
+                elif char == "[":
+                    end = i
+                    if part[end:end + 1] == "!":
+                        end += 1
+                    if part[end:end + 1] == "]":
+                        end += 1
+                    end = part.find("]", end)
+                    if end == -1:
+                        regex += "\\["
+                        continue
+                    chars = part[i:end].replace("\\", "\\\\")
+                    if chars.startswith("!"):
+                        chars = "^" + chars[1:]
+                    elif chars.startswith("^"):
+                        chars = "\\" + chars
+                    regex += f"[{chars}]"
+                    i = end + 1
+                else:
+                    regex += re.escape(char)
 
-        Args:
-            callerName (str): Caller name, compared
-            with progress bar owner's name
-        '''
-        if self._progressbarOwner != callerName:
-            return
+            if not last:
+                regex += "/"
 
-        if self.progressbar and self.renderingProcess.is_alive():
-            with self.finished.get_lock():
-                self.finished.value = True
-            self.renderingProcess.join()
-            if self.clearBarAfterFinished:
-                clear_terminal(1)
-            self._reset_progressbar()
-    
-    def _RealGetContents(self):
-        '''
-        Read in the table of contents for the ZIP file.
+        return regex + ("/" if dirOnly else "/?")
+
+    def _is_dir_ignored(self, dir: str) -> bool:
         '''
-        fp = self.fp
-        try:
-            endrec = zipfile._EndRecData(fp)
-        except OSError:
-            raise zipfile.BadZipFile("File is not a zip file")
-        if not endrec:
-            raise zipfile.BadZipFile("File is not a zip file")
-        if self.debug > 1:
-            print(endrec)
-        size_cd = endrec[zipfile._ECD_SIZE]             # bytes in central directory
-        offset_cd = endrec[zipfile._ECD_OFFSET]         # offset of central directory
-        self._comment = endrec[zipfile._ECD_COMMENT]    # archive comment
+        Check if directory or any of its parents is ignored
 
-        # "concat" is zero, unless zip was concatenated to another file
-        concat = endrec[zipfile._ECD_LOCATION] - size_cd - offset_cd
-        if endrec[zipfile._ECD_SIGNATURE] == zipfile.stringEndArchive64:
-            # If Zip64 extension structures are present, account for them
-            concat -= (zipfile.sizeEndCentDir64 + zipfile.sizeEndCentDir64Locator)
+        Args:
+            dir (str): Normalized directory path without
+                trailing slash
 
-        if self.debug > 2:
-            inferred = concat + offset_cd
-            print("given, inferred, offset", offset_cd, inferred, concat)
-        # self.start_dir:  Position of start of central directory
-        self.start_dir = offset_cd + concat
-        fp.seek(self.start_dir, 0)
-        data = fp.read(size_cd)
-        fp = zipfile.io.BytesIO(data)
-        total = 0
-        while total < size_cd:
-            centdir = fp.read(zipfile.sizeCentralDir)
-            if len(centdir) != zipfile.sizeCentralDir:
-                raise zipfile.BadZipFile("Truncated central directory")
-            centdir = zipfile.struct.unpack(zipfile.structCentralDir, centdir)
-            if centdir[zipfile._CD_SIGNATURE] != zipfile.stringCentralDir:
-                raise zipfile.BadZipFile("Bad magic number for central directory")
-            if self.debug > 2:
-                print(centdir)
-            filename = fp.read(centdir[zipfile._CD_FILENAME_LENGTH])
-            flags = centdir[5]
-            if flags & 0x800:
-                # UTF-8 file names extension
-                filename = filename.decode('utf-8')
-            else:
-                #------------------------------------------------------
-                #    Fix broken filenames due to incorrect encoding    
-                #------------------------------------------------------
-                filename = self.decode_filename(filename)
-            # Create ZipInfo instance to store file information
-            x = zipfile.ZipInfo(filename)
-            x.extra = fp.read(centdir[zipfile._CD_EXTRA_FIELD_LENGTH])
-            x.comment = fp.read(centdir[zipfile._CD_COMMENT_LENGTH])
-            x.header_offset = centdir[zipfile._CD_LOCAL_HEADER_OFFSET]
-            (x.create_version, x.create_system, x.extract_version, x.reserved,
-             x.flag_bits, x.compress_type, t, d,
-             x.CRC, x.compress_size, x.file_size) = centdir[1:12]
-            if x.extract_version > zipfile.MAX_EXTRACT_VERSION:
-                raise NotImplementedError("zip file version %.1f" %
-                                          (x.extract_version / 10))
-            x.volume, x.internal_attr, x.external_attr = centdir[15:18]
-            # Convert date/time code to (year, month, day, hour, min, sec)
-            x._raw_time = t
-            x.date_time = ( (d>>9)+1980, (d>>5)&0xF, d&0x1F,
-                            t>>11, (t>>5)&0x3F, (t&0x1F) * 2 )
+        Returns:
+            bool: Ignored or not
+        '''
+        ignored = self._dirs.get(dir)
 
-            x._decodeExtra()
-            x.header_offset = x.header_offset + concat
-            self.filelist.append(x)
-            self.NameToInfo[x.filename] = x
+        if ignored is None:
+            parent = dir.rpartition("/")[0]
+            ignored = (
+                bool(parent) and self._is_dir_ignored(parent)
+                or self._regex.fullmatch(f"{dir}/") is not None
+            )
+            if len(self._dirs) >= self.CACHE_SIZE:
+                self._dirs.clear()
+            self._dirs[dir] = ignored
 
-            # update total bytes read from central directory
-            total = (total + zipfile.sizeCentralDir + centdir[zipfile._CD_FILENAME_LENGTH]
-                     + centdir[zipfile._CD_EXTRA_FIELD_LENGTH]
-                     + centdir[zipfile._CD_COMMENT_LENGTH])
+        return ignored
 
-            if self.debug > 2:
-                print("total", total)
-    
-    def is_ignored(self, path: str) -> bool:
+    def match(self, path: str) -> bool:
         '''
-        Check if file is being ignored according to the ignore parameter
+        Check if path is ignored
 
         Args:
-            path (str): Path, name or arcname
+            path (str): Path, name or arcname. Directories
+                must end with a slash to match patterns with
+                a trailing slash
 
         Returns:
             bool: Ignored or not
         '''
-        if os.sep == "\\":
-            path = path.replace("\\", "/")
+        if self._regex is None:
+            return False
+
+        path = path.replace("\\", "/")
+        isDir = path.endswith("/")
+        path = "/".join(part for part in path.split("/") if part and part != ".")
+
+        if not path:
+            return False
+
+        if isDir:
+            return self._is_dir_ignored(path)
 
-        if frozenset(path.split("/")).intersection(self.ignore):
+        parent = path.rpartition("/")[0]
+        if parent and self._is_dir_ignored(parent):
             return True
-        
-        return False
 
-    def guess_encoding(self, binaryText: bytes) -> tuple[str, str]:
-        '''
-        Guesses encoding and decodes text using it
+        return self._regex.fullmatch(path) is not None
 
-        Args:
-            binaryText (bytes): Text to decode
 
-        Returns:
-            tuple[str, str]: Pair of encoding and decoded string
+class SeekableZipExtFile(zipfile.ZipExtFile):
+
+    def __init__(
+        self,
+        fileobj,
+        mode,
+        zipinfo,
+        pwd=None,
+        close_fileobj=False,
+        *,
+        checkpoints: list[tuple] | None=None,
+        interval: int=16 * 1024 * 1024
+    ):
         '''
-        for attempt in range(3):
+        ZipExtFile with fast seek()
+
+        Stored members are seeked directly. For deflated members
+        the decompressor state is saved every interval bytes while
+        reading, so seek() resumes from the nearest checkpoint
+        instead of decompressing the member from the start
+
+        Args:
+            checkpoints (list[tuple] | None, optional): Seek index
+                shared between opened copies of the member. Filled in
+                while reading, see build_index(). Defaults to None.
+            interval (int, optional): Uncompressed bytes between
+                checkpoints. Each of them takes about 40 KiB of memory.
+                Defaults to 16 MiB.
+
+        The rest of arguments are the same as for zipfile.ZipExtFile
+        '''
+        super().__init__(fileobj, mode, zipinfo, pwd, close_fileobj)
+
+        #  Decompressor state can't be copied for the others
+        #  and decrypter state isn't saved
+        if (
+            not self._seekable
+            or self._compress_type != zipfile.ZIP_DEFLATED
+            or self._decrypter is not None
+        ):
+            checkpoints = None
+        elif checkpoints is None:
+            checkpoints = []
+
+        #  [(position, filePosition, compressLeft, runningCrc, decompressor)]
+        self._checkpoints = checkpoints
+        self.interval = interval
+
+    def _read1(self, n):
+        #  Decompress in small steps to place checkpoints evenly
+        if self._checkpoints is not None:
+            n = min(n, max(self.interval // 4, self.MIN_READ_SIZE))
+
+        data = super()._read1(n)
+
+        if self._checkpoints is not None and not self._eof:
+            position = self._orig_file_size - self._left
+            last = self._checkpoints[-1][0] if self._checkpoints else 0
+
+            if position - last >= self.interval:
+                self._checkpoints.append((
+                    position,
+                    self._fileobj.tell(),
+                    self._compress_left,
+                    self._running_crc,
+                    self._decompressor.copy()
+                ))
+
+        return data
+
+    def build_index(self):
+        '''
+        Read the member to the end to fill the seek index,
+        then return to the current position
+        '''
+        position = self.tell()
+
+        if self._checkpoints:
+            self.seek(self._checkpoints[-1][0])
+
+        while self.read(self.MAX_SEEK_READ):
+            pass
+
+        self.seek(position)
+
+    def seek(self, offset, whence=os.SEEK_SET):
+        if self.closed:
+            raise ValueError("seek on closed file.")
+        if not self._seekable:
+            raise io.UnsupportedOperation("underlying stream is not seekable")
+
+        position = self.tell()
+
+        if whence == os.SEEK_SET:
+            target = offset
+        elif whence == os.SEEK_CUR:
+            target = position + offset
+        elif whence == os.SEEK_END:
+            target = self._orig_file_size + offset
+        else:
+            raise ValueError("whence must be os.SEEK_SET (0), "
+                             "os.SEEK_CUR (1), or os.SEEK_END (2)")
+
+        target = min(max(target, 0), self._orig_file_size)
+
+        #  Inside of the read buffer
+        bufferOffset = target - position + self._offset
+        if 0 <= bufferOffset < len(self._readbuffer):
+            return super().seek(target)
+
+        if self._compress_type == zipfile.ZIP_STORED and self._decrypter is None:
+            self._restore_state(
+                target,
+                self._orig_compress_start + target,
+                self._orig_compress_size - target,
+                self._running_crc,
+                None
+            )
+            #  CRC of the partial read can't be checked
+            self._expected_crc = None
+            return self.tell()
+
+        if self._checkpoints:
+            index = bisect.bisect_right(self._checkpoints, target, key=itemgetter(0)) - 1
+            if index >= 0:
+                checkpoint = self._checkpoints[index]
+                #  Backwards or closer than the current position
+                if target < position or checkpoint[0] > position:
+                    self._restore_state(*checkpoint)
+
+        return super().seek(target)
+
+    def _restore_state(
+        self,
+        position: int,
+        filePosition: int,
+        compressLeft: int,
+        runningCrc: int,
+        decompressor
+    ):
+        '''
+        Continue reading from the given position
+        '''
+        self._fileobj.seek(filePosition)
+        self._compress_left = compressLeft
+        self._left = self._orig_file_size - position
+        self._running_crc = runningCrc
+        if decompressor is not None:
+            self._decompressor = decompressor.copy()
+        self._readbuffer = b""
+        self._offset = 0
+        self._eof = False
+
+
+class VolumeFile(io.RawIOBase):
+
+    def __init__(self, filename: str, mode: str="r", volumeSize: int | None=None):
+        '''
+        Volumes of split archive as one seekable file
+
+        Volumes are named name.zip.001, name.zip.002 ... It's a
+        plain byte split, not a spanned zip: concatenated volumes
+        make a regular archive, so the other tools need them joined
+        first, e.g. cat name.zip.* > name.zip
+
+        Args:
+            filename (str): Path to the archive without volume number
+            mode (str, optional): "r", "w" or "a". Defaults to "r".
+            volumeSize (int | None, optional): Max size of a volume
+                when writing. Defaults to the size of the first
+                existing volume or no limit.
+        '''
+        super().__init__()
+        self.name = filename
+        self.mode = mode
+
+        self._volumes = []
+        self._sizes = []
+        self._starts = []
+        self._position = 0
+
+        paths = self.find_volumes(filename)
+
+        #  Archive written without limit becomes the first volume
+        if mode == "a" and not paths and os.path.isfile(filename):
+            os.rename(filename, self.volume_path(0))
+            paths = [self.volume_path(0)]
+
+        if mode in ("w", "x") or not paths and mode == "a":
+            for path in paths:
+                os.remove(path)
+            paths = []
+        elif not paths:
+            raise FileNotFoundError(f"No such file: '{filename}'")
+
+        if volumeSize is None and len(paths) > 1:
+            volumeSize = os.path.getsize(paths[0])
+        self.volumeSize = volumeSize
+
+        for path in paths:
+            self._open_volume(path, "rb" if mode == "r" else "r+b")
+
+        if not paths:
+            self._open_volume(self.volume_path(0), "w+b")
+
+    def __repr__(self) -> str:
+        return f"VolumeFile(filename=\"{self.name}\", volumes={len(self._volumes)})"
+
+    @staticmethod
+    def find_volumes(filename: str) -> list[str]:
+        '''
+        Find existing volumes of the archive
+
+        Args:
+            filename (str): Path to the archive
+
+        Returns:
+            list[str]: Paths of volumes in order,
+                empty if the archive isn't split
+        '''
+        paths = []
+
+        for number in itertools.count(1):
+            path = f"{filename}.{number:03d}"
+            if not os.path.isfile(path):
+                break
+            paths.append(path)
+
+        return paths
+
+    @property
+    def paths(self) -> list[str]:
+        '''
+        Paths of volumes
+        '''
+        return [ volume.name for volume in self._volumes ]
+
+    def volume_path(self, index: int) -> str:
+        return f"{self.name}.{index + 1:03d}"
+
+    def _open_volume(self, path: str, mode: str):
+        volume = open(path, mode, buffering=VOLUME_BUFFER_SIZE)
+        volume.seek(0, os.SEEK_END)
+        self._starts.append(sum(self._sizes))
+        self._sizes.append(volume.tell())
+        self._volumes.append(volume)
+
+    def _locate(self, position: int) -> int:
+        '''
+        Index of volume containing position
+        '''
+        return max(bisect.bisect_right(self._starts, position) - 1, 0)
+
+    @property
+    def size(self) -> int:
+        return self._starts[-1] + self._sizes[-1]
+
+    def readable(self) -> bool:
+        return True
+
+    def writable(self) -> bool:
+        return self.mode != "r"
+
+    def seekable(self) -> bool:
+        return True
+
+    def tell(self) -> int:
+        return self._position
+
+    def seek(self, offset: int, whence: int=os.SEEK_SET) -> int:
+        if whence == os.SEEK_SET:
+            position = offset
+        elif whence == os.SEEK_CUR:
+            position = self._position + offset
+        elif whence == os.SEEK_END:
+            position = self.size + offset
+        else:
+            raise ValueError(f"invalid whence ({whence})")
+
+        #  Like a real file, zipfile relies on it
+        if position < 0:
+            raise OSError(errno.EINVAL, "Invalid argument")
+
+        self._position = position
+        return position
+
+    def readinto(self, buffer) -> int:
+        buffer = memoryview(buffer).cast("B")
+        done = 0
+
+        while done < len(buffer) and self._position < self.size:
+            index = self._locate(self._position)
+            volume = self._volumes[index]
+            volume.seek(self._position - self._starts[index])
+            count = volume.readinto(
+                buffer[done:done + self._starts[index] + self._sizes[index] - self._position]
+            )
+            if not count:
+                break
+            done += count
+            self._position += count
+
+        return done
+
+    def write(self, data) -> int:
+        if not self.writable():
+            raise io.UnsupportedOperation("File not open for writing")
+
+        data = memoryview(data).cast("B")
+        done = 0
+
+        while done < len(data):
+            index = self._locate(self._position)
+            offset = self._position - self._starts[index]
+
+            if index < len(self._volumes) - 1:
+                limit = self._sizes[index]
+            elif self.volumeSize:
+                #  Volume written without limit may be bigger
+                limit = max(self.volumeSize, self._sizes[index])
+            else:
+                limit = offset + len(data) - done
+
+            #  Last volume is full, start a new one
+            if offset >= limit:
+                self._open_volume(self.volume_path(index + 1), "w+b")
+                continue
+
+            count = min(limit - offset, len(data) - done)
+            volume = self._volumes[index]
+            volume.seek(offset)
+            volume.write(data[done:done + count])
+
+            self._sizes[index] = max(self._sizes[index], offset + count)
+            done += count
+            self._position += count
+
+        return done
+
+    def truncate(self, size: int | None=None) -> int:
+        if size is None:
+            size = self._position
+
+        index = self._locate(size)
+
+        for volume in self._volumes[index + 1:]:
+            volume.close()
+            os.remove(volume.name)
+
+        del self._volumes[index + 1:]
+        del self._sizes[index + 1:]
+        del self._starts[index + 1:]
+
+        self._volumes[index].truncate(size - self._starts[index])
+        self._sizes[index] = size - self._starts[index]
+        return size
+
+    def flush(self):
+        for volume in self._volumes:
+            if not volume.closed:
+                volume.flush()
+
+    def close(self):
+        if self.closed:
+            return
+
+        self.flush()
+        for volume in self._volumes:
+            volume.close()
+
+        super().close()
+
+
+class IOScheduler():
+
+    def __init__(self, rotationalReads: int=1, solidStateReads: int | None=None):
+        '''
+        Limits concurrent reads per block device, so
+        parallel workers don't thrash rotational disks
+        with seeks while SSDs get deep queues
+
+        Paths are mapped to devices by the longest mount
+        point in /proc/self/mountinfo, the device type is
+        read from /sys/dev/block/<major:minor>/queue/rotational.
+        Elsewhere all paths share one solid state device
+
+        Args:
+            rotationalReads (int, optional): In-flight reads
+                on a rotational device. Defaults to 1.
+            solidStateReads (int | None, optional): In-flight
+                reads on other devices. Defaults to the number
+                of ThreadPoolExecutor workers.
+        '''
+        if solidStateReads is None:
+            solidStateReads = min(32, (os.cpu_count() or 1) + 4)
+
+        self.rotationalReads = rotationalReads
+        self.solidStateReads = solidStateReads
+        self.mounts = self._read_mounts()
+        self._devices = {}
+        self._rotational = {}
+        self._limits = {}
+        self._lock = threading.Lock()
+
+    def __repr__(self) -> str:
+        return (
+            "IOScheduler("
+            f"rotationalReads={self.rotationalReads}, "
+            f"solidStateReads={self.solidStateReads}"
+            ")"
+        )
+
+    @staticmethod
+    def _read_mounts() -> list[tuple[str, str]]:
+        '''
+        Parse mount points from procfs
+
+        Returns:
+            list[tuple[str, str]]: Mount points and their
+                major:minor, the longest mount points first
+        '''
+        mounts = []
+
+        try:
+            with open("/proc/self/mountinfo", "r") as mountsFile:
+                for mount in mountsFile:
+                    fields = mount.split()
+                    #  Spaces and tabs are escaped as octal
+                    mountPoint = re.sub(
+                        r"\\([0-7]{3})",
+                        lambda match: chr(int(match[1], 8)),
+                        fields[4]
+                    )
+                    mounts.append((mountPoint, fields[2]))
+        except OSError:
+            return []
+
+        mounts.sort(key=lambda mount: len(mount[0]), reverse=True)
+        return mounts
+
+    def device(self, path: str) -> str | None:
+        '''
+        Block device of the path
+
+        Args:
+            path (str): Path on the device
+
+        Returns:
+            str | None: major:minor or None if unknown
+        '''
+        if path in self._devices:
+            return self._devices[path]
+
+        realpath = os.path.realpath(path)
+        device = None
+
+        for mountPoint, majorMinor in self.mounts:
+            if realpath == mountPoint or realpath.startswith(mountPoint.rstrip("/") + "/"):
+                device = majorMinor
+                break
+
+        self._devices[path] = device
+        return device
+
+    def is_rotational(self, path: str) -> bool:
+        '''
+        Check if the path is on a rotational device
+
+        Args:
+            path (str): Path on the device
+
+        Returns:
+            bool: Device is rotational
+        '''
+        device = self.device(path)
+
+        if device not in self._rotational:
+            rotational = False
+
+            if device is not None:
+                block = os.path.realpath(f"/sys/dev/block/{device}")
+                #  Partitions have no queue, it belongs to the disk
+                if os.path.isfile(os.path.join(block, "partition")):
+                    block = os.path.dirname(block)
+                try:
+                    with open(os.path.join(block, "queue", "rotational"), "r") as queueFile:
+                        rotational = queueFile.read().strip() == "1"
+                except OSError:
+                    pass
+
+            self._rotational[device] = rotational
+
+        return self._rotational[device]
+
+    def limit(self, path: str) -> threading.BoundedSemaphore:
+        '''
+        Semaphore of in-flight reads on device of the path
+
+        Args:
+            path (str): Path on the device
+
+        Returns:
+            threading.BoundedSemaphore: Shared by all paths
+                on the device
+        '''
+        device = self.device(path)
+
+        with self._lock:
+            if device not in self._limits:
+                if self.is_rotational(path):
+                    reads = self.rotationalReads
+                else:
+                    reads = self.solidStateReads
+                self._limits[device] = threading.BoundedSemaphore(reads)
+
+        return self._limits[device]
+
+    @contextlib.contextmanager
+    def reading(self, *paths: str):
+        '''
+        Hold a read slot on devices of all paths
+
+        Slots are taken in the same order by every
+        thread, so readers of several devices can't
+        deadlock each other
+
+        Args:
+            paths (str): Paths to read, the roots of
+                trees can be used, devices are cached
+        '''
+        devices = { self.device(path): path for path in paths }
+        limits = [ self.limit(devices[device]) for device in sorted(devices, key=str) ]
+
+        with contextlib.ExitStack() as stack:
+            for limit in limits:
+                stack.enter_context(limit)
+            yield
+
+    def order(self, path: str, items: list, key) -> list:
+        '''
+        Order reads of files on the device of the path
+
+        Rotational devices are read in order of inodes,
+        which mostly follows the on-disk layout, other
+        devices keep the given order
+
+        Args:
+            path (str): Path on the device
+            items (list): Items to read
+            key (Callable): Returns inode of the item
+
+        Returns:
+            list: Ordered items
+        '''
+        if self.is_rotational(path):
+            return sorted(items, key=key)
+        return items
+
+
+class Stats():
+
+    def __init__(self, enabled: bool=True):
+        '''
+        Wall and CPU time of archive phases and counters
+        of files, bytes and system calls
+
+        Time of nested phases is not counted in the outer
+        ones, so the phases add up to the total time
+
+        Args:
+            enabled (bool, optional): Collect statistics,
+                disabled stats cost nothing. Defaults to True.
+        '''
+        self.enabled = enabled
+        #  {"phase": [wall, cpu, calls]}
+        self.phases = {}
+        #  {"counter": value}
+        self.counters = {}
+        #  [phase, wall start, cpu start] of running phases
+        self._stack = []
+        self._created = time.perf_counter()
+
+    def __repr__(self) -> str:
+        return f"<Stats phases={len(self.phases)} counters={len(self.counters)}>"
+
+    def phase(self, name: str) -> contextlib.AbstractContextManager:
+        '''
+        Context manager timing the phase
+
+        Args:
+            name (str): Phase name
+
+        Returns:
+            contextlib.AbstractContextManager: Timer
+        '''
+        if not self.enabled:
+            return contextlib.nullcontext()
+        return self._phase(name)
+
+    @contextlib.contextmanager
+    def _phase(self, name: str):
+        wall, cpu = time.perf_counter(), time.process_time()
+
+        #  pause the outer phase
+        if self._stack:
+            self._account(wall, cpu)
+
+        self._stack.append([name, wall, cpu])
+        self.phases.setdefault(name, [0.0, 0.0, 0])[2] += 1
+
+        try:
+            yield
+        finally:
+            wall, cpu = time.perf_counter(), time.process_time()
+            self._account(wall, cpu)
+            self._stack.pop()
+            #  resume the outer phase
+            if self._stack:
+                self._stack[-1][1:] = wall, cpu
+
+    def _account(self, wall: float, cpu: float):
+        '''
+        Add time since the start of the running phase to it
+        '''
+        name, wallStart, cpuStart = self._stack[-1]
+        phase = self.phases[name]
+        phase[0] += wall - wallStart
+        phase[1] += cpu - cpuStart
+
+    def add(self, name: str, value: int=1):
+        '''
+        Increase the counter
+
+        Args:
+            name (str): Counter name
+            value (int, optional): Increment. Defaults to 1.
+        '''
+        if self.enabled:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def as_dict(self) -> dict:
+        '''
+        Returns:
+            dict: Phases, counters and total wall time
+        '''
+        return {
+            "total": time.perf_counter() - self._created,
+            "phases": {
+                name: { "wall": wall, "cpu": cpu, "calls": calls }
+                for name, (wall, cpu, calls) in self.phases.items()
+            },
+            "counters": dict(sorted(self.counters.items()))
+        }
+
+    def report(self) -> str:
+        '''
+        Returns:
+            str: Table of phases sorted by wall time and counters
+        '''
+        stats = self.as_dict()
+        lines = [
+            f"{'phase':<12} {'wall, s':>10} {'cpu, s':>10} {'calls':>10}"
+        ]
+
+        for name, phase in sorted(stats["phases"].items(), key=lambda item: -item[1]["wall"]):
+            lines.append(f"{name:<12} {phase['wall']:>10.3f} {phase['cpu']:>10.3f} {phase['calls']:>10}")
+
+        lines.append(f"{'total':<12} {stats['total']:>10.3f}")
+
+        if stats["counters"]:
+            lines.append("")
+        for name, value in stats["counters"].items():
+            lines.append(f"{name:<20} {value:>12}")
+
+        return "\n".join(lines)
+
+
+class Archive():
+    '''
+    Common part of archive formats: ignore patterns, names
+    decoding, duplicates renaming and progress bar
+    '''
+
+    def _init_archive(
+        self,
+        ignore: list[str],
+        overwriteDuplicates: bool,
+        symlinksToFiles: bool,
+        progressbar: bool,
+        useBarPrefix: bool,
+        clearBarAfterFinished: bool,
+        sync: bool
+    ):
+        '''
+        Set the options shared by all archive formats,
+        see ZipFile for the description of arguments
+        '''
+        #  Archive filename
+        self.arcname = os.path.basename(self.filename)
+
+        self.ignore = ignore
+        self.overwriteDuplicates = overwriteDuplicates
+        self.symlinksToFiles = symlinksToFiles
+        self.sync = sync
+        
+        self.progressbar = progressbar
+        self._progressbarOwner = None
+
+        if progressbar:
+            self.prefix = multiprocessing.Array("c", 272)
+            self.prefix.value = b""
+            self.counter = multiprocessing.Value("i", 0)
+            self.unit = multiprocessing.Array("c", 6)
+            self.unit.value = b"files"
+            self.finished = multiprocessing.Value("b", False)
+            self._start_progressbar("__init__", createOnly=True)
+        
+        self.useBarPrefix = useBarPrefix
+        self.clearBarAfterFinished = clearBarAfterFinished
+
+    def _start_progressbar(self, ownerName: str, createOnly: bool=False):
+        '''
+        Start progress bar
+        Because we cannot restart a terminated process.
+        We need to instantiate a new.
+
+        Args:
+            ownerName (str): Name of the progress bar owner.
+                This is an additional protection against updating and
+                finishing the progress bar with other functions.
+            createOnly (bool, optional): Don't start renderingProcess
+                after creating. Defaults to False.
+        '''
+        self._progressbarOwner = ownerName
+        self.renderingProcess = multiprocessing.Process(
+            target=ProgressBar(40).start_rendering_mp,
+            args=(self.prefix, self.counter, self.unit, self.finished)
+        )
+        if not createOnly:
+            self.renderingProcess.start()
+
+    def _update_progressbar(self, callerName: str):
+        '''
+        Increment progressbar counter if needed
+
+        Args:
+            callerName (str): Caller name, compared
+            with progress bar owner's name
+        '''
+        if self._progressbarOwner != callerName:
+            return
+
+        if self.progressbar and self.counter.value != -1:
+            with self.counter.get_lock():
+                self.counter.value += 1
+
+    def _reset_progressbar(self):
+        '''
+        Reset progress bar values to defaults
+        '''
+        self.prefix.value = b""
+        self.counter.value = 0
+        self.unit.value = b"files"
+        self.finished.value = False
+
+    def _finish_progressbar(self, callerName: str):
+        '''
+        Finish progressbar
+
+        Args:
+            callerName (str): Caller name, compared
+            with progress bar owner's name
+        '''
+        if self._progressbarOwner != callerName:
+            return
+
+        if self.progressbar and self.renderingProcess.is_alive():
+            with self.finished.get_lock():
+                self.finished.value = True
+            self.renderingProcess.join()
+            if self.clearBarAfterFinished:
+                clear_terminal(1)
+            self._reset_progressbar()
+
+    @property
+    def ignore(self) -> list[str]:
+        return self.ignorePatterns.patterns
+
+    @ignore.setter
+    def ignore(self, patterns: list[str]):
+        self.ignorePatterns = IgnorePatterns(patterns)
+
+    def is_ignored(self, path: str) -> bool:
+        '''
+        Check if member is being ignored according to the ignore parameter
+
+        Names are matched relative to the archive root, the dir
+        named as the archive without extension if the member is
+        in it, so patterns select the same files when writing
+        and extracting
+
+        Args:
+            path (str): Member name. Directories
+                should end with a slash
+
+        Returns:
+            bool: Ignored or not
+        '''
+        name = path.replace("\\", "/").lstrip("/")
+        root = f"{split_archive_extension(self.arcname)[0]}/"
+
+        if name.startswith(root):
+            name = name[len(root):]
+
+        return self.ignorePatterns.match(name)
+
+    def guess_encoding(self, binaryText: bytes) -> tuple[str, str]:
+        '''
+        Guesses encoding and decodes text using it
+
+        Args:
+            binaryText (bytes): Text to decode
+
+        Returns:
+            tuple[str, str]: Pair of encoding and decoded string
+        '''
+        for attempt in range(3):
             try:
                 #  Guess encoding
                 if not self.latestCharset:
@@ -538,356 +1248,2000 @@ class ZipFile(zipfile.ZipFile):
                     self.latestCharset = encoding
                 #  Use last guessed
                 else:
-                    encoding = self.latestCharset
-                    text = binaryText.decode(self.latestCharset)
-                #  Checking to make sure the encoding is guessed correctly
-                text.encode(encoding)
-                break
-            except (UnicodeDecodeError, UnicodeEncodeError):
-                #  Can't guess and decode with preferred & last
-                #  Use historical ZIP filename encoding
-                if not self.latestCharset:
-                    encoding = "cp437"
-                    text = binaryText.decode("cp437")
-                    break
+                    encoding = self.latestCharset
+                    text = binaryText.decode(self.latestCharset)
+                #  Checking to make sure the encoding is guessed correctly
+                text.encode(encoding)
+                break
+            except (UnicodeDecodeError, UnicodeEncodeError):
+                #  Can't guess and decode with preferred & last
+                #  Use historical ZIP filename encoding
+                if not self.latestCharset:
+                    encoding = "cp437"
+                    text = binaryText.decode("cp437")
+                    break
+                else:
+                    #  First attempt can't decode with last
+                    #  Use preferred filename encoding
+                    if attempt == 0 and self.latestCharset != self.preferredEncoding:
+                        self.latestCharset = self.preferredEncoding
+                    #  Second attempt can't decode with preferred
+                    #  Try to guess
+                    else:
+                        self.latestCharset = None
+        
+        return encoding, text
+
+    def decode_filename(self, filename: bytes) -> str:
+        '''
+        Decodes a filename, splitting it into parts.
+        This is necessary in order to reduce the number 
+        of charset_normalizer errors
+
+        Args:
+            filename (bytes): Encoded filename
+
+        Returns:
+            str: Decoded filename
+        '''
+        self.stats.add("decoded_names")
+
+        with self.stats.phase("decode"):
+            filenames = []
+            for filename in filename.split(b"/"):
+                filename = self.guess_encoding(filename)[1]
+                filenames.append(filename)
+        
+        filename = "/".join(filenames)
+        return filename
+
+    def get_unique_filename(self, filename: str) -> Iterator[str]:
+        '''
+        Unique name generator: adds a number to the filename
+        
+        Used to rename duplicates if the overwriteDuplicates
+        parameter is disabled
+
+        Args:
+            filename (str): Filename
+
+        Yields:
+            Iterator[str]: filename (1), filename (2) ...
+        '''
+        filename, extension = os.path.splitext(filename)
+        number = itertools.count(1)
+        
+        while True:
+            yield f"{filename} ({next(number)}){extension}"
+
+    def _deal_with_duplicates(self, targetpath: str, isDir: bool) -> str:
+        '''
+        Overwrite existing file or find a free
+        name for it, depending on overwriteDuplicates
+
+        Args:
+            targetpath (str): Path to extract member to
+            isDir (bool): Member is a directory
+
+        Returns:
+            str: Path to extract member to
+        '''
+        if os.path.lexists(targetpath):
+            #  Synced dir is updated in place
+            if self.sync and isDir and not os.path.islink(targetpath) and os.path.isdir(targetpath):
+                pass
+            elif self.overwriteDuplicates or self.sync:
+                if isDir and not os.path.islink(targetpath):
+                    shutil.rmtree(targetpath)
+                else:
+                    os.remove(targetpath)
+            else:
+                #  Don't rename dirs, only files
+                if not isDir:
+                    targetpath, name = os.path.split(targetpath)
+                    for name in self.get_unique_filename(name):
+                        name = os.path.join(targetpath, name)
+                        if not os.path.lexists(name):
+                            targetpath = name
+                            break
+
+        return targetpath
+
+
+class ZipFile(Archive, zipfile.ZipFile):
+
+    #  Member with content hashes of the archive files
+    MANIFEST_NAME = "__manifest__"
+    #  Sidecar journal of completed members
+    JOURNAL_SUFFIX = ".journal"
+    #  ZipInfo attributes needed to rebuild central directory
+    JOURNAL_FIELDS = (
+        "create_version", "create_system", "extract_version", "reserved",
+        "flag_bits", "compress_type", "CRC", "compress_size", "file_size",
+        "volume", "internal_attr", "external_attr", "header_offset"
+    )
+
+    def __init__(
+        self,
+        file: str | IO,
+        mode: str="r",
+        compression: int=zipfile.ZIP_STORED,
+        allowZip64: bool=True,
+        compresslevel: int | None=None,
+        *,
+        strict_timestamps: bool=True,
+        preferredEncoding: str="cp866",
+        ignore: list[str]=[],
+        overwriteDuplicates: bool=False,
+        symlinksToFiles: bool=False,
+        progressbar: bool=False,
+        useBarPrefix: bool=True,
+        clearBarAfterFinished: bool=False,
+        sync: bool=False,
+        hashAlgorithm: str | None=None,
+        deduplicate: bool=False,
+        seekInterval: int=16 * 1024 * 1024,
+        volumeSize: int | None=None,
+        journal: bool=False,
+        checkpointInterval: float=10.0,
+        stats: bool=False
+    ):
+        '''
+        Better ZipFile with proper names and symlinks encoding & progressbar
+
+        Args:
+            file (str | IO): Either the path to the file, 
+                or a file-like object
+            mode (str, optional): File mode. Defaults to "r".
+            compression (int, optional): ZIP_STORED (no compression),
+                ZIP_DEFLATED (requires zlib), ZIP_BZIP2 (requires bz2)
+                or ZIP_LZMA (requires lzma). Defaults to zipfile.ZIP_STORED.
+            allowZip64 (bool, optional): if True ZipFile will create files
+                with ZIP64 extensions when needed, otherwise it will raise
+                an exception when this would be necessary. Defaults to True.
+            compresslevel (int | None, optional): None (default for the given
+                compression type) or an integer specifying the level to pass
+                to the compressor. When using ZIP_STORED or ZIP_LZMA this
+                keyword has no effect. When using ZIP_DEFLATED integers 0
+                through 9 are accepted. When using ZIP_BZIP2 integers 1
+                through 9 are accepted. Defaults to None.
+            strict_timestamps (bool, optional): Strict timestamps.
+                Defaults to True.
+            preferredEncoding (str, optional): Encoding to use when
+                guessing the original. Defaults to "cp866".
+            ignore (list[str], optional): Filenames or glob patterns
+                to ignore, see IgnorePatterns. Defaults to [].
+            overwriteDuplicates (bool, optional): Overwrite if file exists
+                or write filename with number in it. If you are going to
+                enable this option - open archive in 'a' mode.
+                Defaults to False
+            symlinksToFiles (bool, optional): Replace symbolic links with the
+                files they point to or not. If the file does not exist, the link
+                will be packed. Hard links are always written as regular files
+                regardless of this option. Defaults to False
+            progressbar (bool, optional): Render progress bar while
+                running or not. Defaults to False.
+            useBarPrefix (bool, optional): Show progress bar prefix, disable
+                this option if your program itself prints events to the terminal.
+                Defaults to True
+            clearBarAfterFinished (bool, optional): Clears progress bar after it's
+                finished. Defaults to False
+            sync (bool, optional): Extract only members that differ from
+                the files on disk, identical files are skipped and the rest
+                are overwritten. Files are compared by size and modification
+                time, then by CRC32 if the time differs. Extracted files get
+                the member modification time. Defaults to False
+            hashAlgorithm (str | None, optional): Hash files content with
+                this hashlib algorithm ("sha256", "blake2b") while writing
+                and store the hashes in the manifest member, see manifest.
+                When appending to an archive with a manifest, its algorithm
+                is used by default. Defaults to None
+            deduplicate (bool, optional): Write files with the same content
+                as an already written member as __duplicate__ entries that
+                refer to it. Only files with the size of some member are
+                hashed before writing. On extraction the content is copied
+                from the extracted original. Enables hashAlgorithm, "sha256"
+                by default. Removing the original member breaks its
+                duplicates. Defaults to False
+            seekInterval (int, optional): Uncompressed bytes between seek
+                checkpoints of deflated members opened for reading. The
+                index is kept while the archive is open, so seek() in the
+                member costs at most this much decompression, see
+                SeekableZipExtFile. Defaults to 16 MiB
+            volumeSize (int | None, optional): Split the archive into
+                volumes of this size: name.zip.001, name.zip.002 ... for
+                removable drives with file size limits. Existing volumes
+                are detected automatically when reading or appending, see
+                VolumeFile. Defaults to None
+            journal (bool, optional): Keep a sidecar journal of completed
+                members next to the archive, so an interrupted write can be
+                resumed. Reopen the archive in 'a' mode with this option to
+                truncate it to the last good member and skip members that
+                are already written. Defaults to False
+            checkpointInterval (float, optional): Seconds between journal
+                checkpoints, each of them syncs the archive to disk.
+                Defaults to 10.0
+            stats (bool, optional): Collect time of phases and counters
+                of files, bytes and system calls in the stats attribute.
+                Defaults to False
+
+        If you use progressbar option on Windows - run your code in the
+        "if __name__ == '__main__'" statement
+        '''
+        self.latestCharset = None
+        self.preferredEncoding = preferredEncoding
+        self.stats = Stats(stats)
+
+        if deduplicate and hashAlgorithm is None:
+            hashAlgorithm = "sha256"
+
+        self.hashAlgorithm = hashAlgorithm
+        self.deduplicate = deduplicate
+        #  Originals for deduplication {"hash": "arcname"}
+        self._contents = {}
+        self._contentSizes = set()
+        #  Extracted originals of duplicates {"arcname": "path"}
+        self._extractedOriginals = {}
+        self.seekInterval = seekInterval
+        #  {"arcname": checkpoints} for SeekableZipExtFile
+        self.seekIndexes = {}
+        #  {"arcname": {"size": size, "mtime": mtime, "hash": hexdigest}}
+        self.manifest = {}
+        self._manifestModified = False
+
+        self.journal = journal
+        self.checkpointInterval = checkpointInterval
+        self._journalEntries = None
+        #  Members written before the interruption, they are skipped
+        self._resumedNames = set()
+        #  Members written since the write was started
+        self._writtenNames = set()
+
+        #  Split archive
+        self.volumes = None
+        if isinstance(file, (str, os.PathLike)):
+            file = os.fspath(file)
+            if volumeSize or mode != "w" and VolumeFile.find_volumes(file):
+                if journal:
+                    raise ValueError("journal is not supported for split archives")
+                self.volumes = file = VolumeFile(file, mode, volumeSize)
+
+        if journal:
+            if not isinstance(file, (str, os.PathLike)):
+                raise ValueError("journal requires a path to the archive")
+            self.journalPath = f"{os.fspath(file)}{self.JOURNAL_SUFFIX}"
+            if os.path.exists(self.journalPath):
+                if mode == "a":
+                    self._journalEntries = self._recover_from_journal(file)
+                else:
+                    os.remove(self.journalPath)
+        
+        try:
+            with self.stats.phase("open"):
+                super().__init__(
+                    file=file,
+                    mode=mode,
+                    compression=compression,
+                    allowZip64=allowZip64,
+                    compresslevel=compresslevel,
+                    strict_timestamps=strict_timestamps
+                )
+        except:
+            if self.volumes:
+                self.volumes.close()
+            raise
+
+        self._init_archive(
+            ignore=ignore,
+            overwriteDuplicates=overwriteDuplicates,
+            symlinksToFiles=symlinksToFiles,
+            progressbar=progressbar,
+            useBarPrefix=useBarPrefix,
+            clearBarAfterFinished=clearBarAfterFinished,
+            sync=sync
+        )
+
+        if self.MANIFEST_NAME in self.NameToInfo:
+            with self.stats.phase("manifest"):
+                self._load_manifest()
+
+        if journal and self.mode != "r":
+            self._open_journal()
+
+    def __exit__(self, type, value, traceback):
+        #  Interrupted write is resumed from the journal,
+        #  so the archive is left for the next run to truncate
+        if type is not None and getattr(self, "_journalFile", None):
+            self._abandon()
+            return
+
+        self.close()
+        
+        #  Delete archive if empty
+        if self.filelist:
+            return
+
+        if self.progressbar:
+            if self.useBarPrefix:
+                self.prefix.value = f"Removing \"{self.arcname}\" : ".encode()
+            self.counter.value = -1
+            self.unit.value = b""
+            self._start_progressbar("__exit__")
+        
+        if self.volumes:
+            for path in self.volumes.paths:
+                os.remove(path)
+        else:
+            os.remove(self.filename)
+        self._finish_progressbar("__exit__")
+
+    def close(self):
+        '''
+        Close the file, and for mode 'w', 'x' and 'a' write the ending
+        records. Journal is removed once the central directory is written
+        '''
+        if self.fp is not None and self.mode != "r" and self._manifestModified:
+            with self.stats.phase("manifest"):
+                self._write_manifest()
+
+        with self.stats.phase("close"):
+            super().close()
+
+        if getattr(self, "volumes", None):
+            self.volumes.close()
+
+        if getattr(self, "_journalFile", None):
+            self._journalFile.close()
+            self._journalFile = None
+            os.remove(self.journalPath)
+
+    def _abandon(self):
+        '''
+        Close the file without writing the ending records,
+        keeping the journal up to the last written member
+        '''
+        self.checkpoint()
+        self._journalFile.close()
+        self._journalFile = None
+
+        fp = self.fp
+        self.fp = None
+        self._fpclose(fp)
+
+    def _RealGetContents(self):
+        '''
+        Read in the table of contents for the ZIP file.
+        '''
+        #  Interrupted write, central directory is in the journal
+        if self._journalEntries is not None:
+            self._load_journal_entries()
+            return
+
+        fp = self.fp
+        try:
+            endrec = zipfile._EndRecData(fp)
+        except OSError:
+            raise zipfile.BadZipFile("File is not a zip file")
+        if not endrec:
+            raise zipfile.BadZipFile("File is not a zip file")
+        if self.debug > 1:
+            print(endrec)
+        size_cd = endrec[zipfile._ECD_SIZE]             # bytes in central directory
+        offset_cd = endrec[zipfile._ECD_OFFSET]         # offset of central directory
+        self._comment = endrec[zipfile._ECD_COMMENT]    # archive comment
+
+        # "concat" is zero, unless zip was concatenated to another file
+        concat = endrec[zipfile._ECD_LOCATION] - size_cd - offset_cd
+        if endrec[zipfile._ECD_SIGNATURE] == zipfile.stringEndArchive64:
+            # If Zip64 extension structures are present, account for them
+            concat -= (zipfile.sizeEndCentDir64 + zipfile.sizeEndCentDir64Locator)
+
+        if self.debug > 2:
+            inferred = concat + offset_cd
+            print("given, inferred, offset", offset_cd, inferred, concat)
+        # self.start_dir:  Position of start of central directory
+        self.start_dir = offset_cd + concat
+        fp.seek(self.start_dir, 0)
+        data = fp.read(size_cd)
+        fp = zipfile.io.BytesIO(data)
+        total = 0
+        while total < size_cd:
+            centdir = fp.read(zipfile.sizeCentralDir)
+            if len(centdir) != zipfile.sizeCentralDir:
+                raise zipfile.BadZipFile("Truncated central directory")
+            centdir = zipfile.struct.unpack(zipfile.structCentralDir, centdir)
+            if centdir[zipfile._CD_SIGNATURE] != zipfile.stringCentralDir:
+                raise zipfile.BadZipFile("Bad magic number for central directory")
+            if self.debug > 2:
+                print(centdir)
+            filename = fp.read(centdir[zipfile._CD_FILENAME_LENGTH])
+            flags = centdir[5]
+            if flags & 0x800:
+                # UTF-8 file names extension
+                filename = filename.decode('utf-8')
+            else:
+                #------------------------------------------------------
+                #    Fix broken filenames due to incorrect encoding    
+                #------------------------------------------------------
+                filename = self.decode_filename(filename)
+            # Create ZipInfo instance to store file information
+            x = zipfile.ZipInfo(filename)
+            x.extra = fp.read(centdir[zipfile._CD_EXTRA_FIELD_LENGTH])
+            x.comment = fp.read(centdir[zipfile._CD_COMMENT_LENGTH])
+            x.header_offset = centdir[zipfile._CD_LOCAL_HEADER_OFFSET]
+            (x.create_version, x.create_system, x.extract_version, x.reserved,
+             x.flag_bits, x.compress_type, t, d,
+             x.CRC, x.compress_size, x.file_size) = centdir[1:12]
+            if x.extract_version > zipfile.MAX_EXTRACT_VERSION:
+                raise NotImplementedError("zip file version %.1f" %
+                                          (x.extract_version / 10))
+            x.volume, x.internal_attr, x.external_attr = centdir[15:18]
+            # Convert date/time code to (year, month, day, hour, min, sec)
+            x._raw_time = t
+            x.date_time = ( (d>>9)+1980, (d>>5)&0xF, d&0x1F,
+                            t>>11, (t>>5)&0x3F, (t&0x1F) * 2 )
+
+            x._decodeExtra()
+            x.header_offset = x.header_offset + concat
+            self.filelist.append(x)
+            self.NameToInfo[x.filename] = x
+
+            # update total bytes read from central directory
+            total = (total + zipfile.sizeCentralDir + centdir[zipfile._CD_FILENAME_LENGTH]
+                     + centdir[zipfile._CD_EXTRA_FIELD_LENGTH]
+                     + centdir[zipfile._CD_COMMENT_LENGTH])
+
+            if self.debug > 2:
+                print("total", total)
+    
+    def open(self, name, mode="r", pwd=None, *, force_zip64=False):
+        '''
+        Return file-like object for 'name'.
+
+        name is a string for the file name within the ZIP file, or a ZipInfo
+        object.
+
+        mode should be 'r' to read a file already in the ZIP file, or 'w' to
+        write to a file newly added to the archive.
+
+        pwd is the password to decrypt files (only used for reading).
+
+        When writing, if the file size is not known in advance but may exceed
+        2 GiB, pass force_zip64 to use the ZIP64 format, which can handle large
+        files.  If the size is known in advance, it is best to pass a ZipInfo
+        instance for name, with zinfo.file_size set.
+        '''
+        if mode not in {"r", "w"}:
+            raise ValueError('open() requires mode "r" or "w"')
+        if pwd and not isinstance(pwd, bytes):
+            raise TypeError("pwd: expected bytes, got %s" % type(pwd).__name__)
+        if pwd and (mode == "w"):
+            raise ValueError("pwd is only supported for reading files")
+        if not self.fp:
+            raise ValueError(
+                "Attempt to use ZIP archive that was already closed")
+
+        # Make sure we have an info object
+        if isinstance(name, zipfile.ZipInfo):
+            # 'name' is already an info object
+            zinfo = name
+        elif mode == 'w':
+            zinfo = zipfile.ZipInfo(name)
+            zinfo.compress_type = self.compression
+            zinfo._compresslevel = self.compresslevel
+        else:
+            # Get info object for name
+            zinfo = self.getinfo(name)
+
+        if mode == 'w':
+            self._release_manifest()
+            return self._open_to_write(zinfo, force_zip64=force_zip64)
+
+        if self._writing:
+            raise ValueError("Can't read from the ZIP file while there "
+                    "is an open writing handle on it. "
+                    "Close the writing handle before trying to read.")
+
+        # Open for reading:
+        self._fileRefCnt += 1
+        zef_file = zipfile._SharedFile(
+            self.fp,
+            zinfo.header_offset,
+            self._fpclose,
+            self._lock,
+            lambda: self._writing
+        )
+
+        try:
+            # Skip the file header:
+            fheader = zef_file.read(zipfile.sizeFileHeader)
+            if len(fheader) != zipfile.sizeFileHeader:
+                raise zipfile.BadZipFile("Truncated file header")
+            fheader = zipfile.struct.unpack(zipfile.structFileHeader, fheader)
+            if fheader[zipfile._FH_SIGNATURE] != zipfile.stringFileHeader:
+                raise zipfile.BadZipFile("Bad magic number for file header")
+
+            fname = zef_file.read(fheader[zipfile._FH_FILENAME_LENGTH])
+            if fheader[zipfile._FH_EXTRA_FIELD_LENGTH]:
+                zef_file.read(fheader[zipfile._FH_EXTRA_FIELD_LENGTH])
+
+            if zinfo.flag_bits & 0x20:
+                # Zip 2.7: compressed patched data
+                raise NotImplementedError("compressed patched data (flag bit 5)")
+
+            if zinfo.flag_bits & 0x40:
+                # strong encryption
+                raise NotImplementedError("strong encryption (flag bit 6)")
+
+            if fheader[zipfile._FH_GENERAL_PURPOSE_FLAG_BITS] & 0x800:
+                # UTF-8 filename
+                fname_str = fname.decode("utf-8")
+            else:
+                #------------------------------------------------------
+                #    Fix broken filenames due to incorrect encoding    
+                #------------------------------------------------------
+                fname_str = self.decode_filename(fname)
+
+            if fname_str != zinfo.orig_filename:
+                raise zipfile.BadZipFile(
+                    'File name in directory %r and header %r differ.'
+                    % (zinfo.orig_filename, fname))
+
+            # check for encrypted flag & handle password
+            is_encrypted = zinfo.flag_bits & 0x1
+            if is_encrypted:
+                if not pwd:
+                    pwd = self.pwd
+                if not pwd:
+                    raise RuntimeError("File %r is encrypted, password "
+                                       "required for extraction" % name)
+            else:
+                pwd = None
+
+            return SeekableZipExtFile(
+                zef_file,
+                mode,
+                zinfo,
+                pwd,
+                True,
+                checkpoints=self.seekIndexes.setdefault(zinfo.filename, []),
+                interval=self.seekInterval
+            )
+        except:
+            zef_file.close()
+            raise
+    
+    def extract(self, member, path=None, pwd=None) -> str:
+        '''
+        Extract a member from the archive to the current working directory,
+        using its full name. Its file information is extracted as accurately
+        as possible. `member' may be a filename or a ZipInfo object. You can
+        specify a different directory using `path'.
+        '''
+        if isinstance(member, zipfile.ZipInfo):
+            member = member.filename
+
+        if path is None:
+            path = os.getcwd()
+        else:
+            path = os.fspath(path)
+
+        if self.is_ignored(member):
+            return path
+
+        if self.progressbar and not self.renderingProcess.is_alive():
+            if self.useBarPrefix:
+                filename = os.path.basename(member.rstrip("/"))
+                self.prefix.value = f"Extracting \"{filename}\" : ".encode()
+            if not member.endswith("/"):
+                self.counter.value = -1
+                self.unit.value = b""
+            self._start_progressbar("extract")
+
+        targetpath = self._extract_member(member, path, pwd, "extract")
+        #  extract directory contents
+        if targetpath != path and os.path.isdir(targetpath):
+            members = [ name for name in self.namelist() if member in name ][1:]
+            self.extractall(path, members)
+
+        self._finish_progressbar("extract")
+
+        return targetpath
+
+    def extractall(self, path=None, members=None, pwd=None):
+        '''
+        Extract all members from the archive to the current working
+        directory. `path' specifies a different directory to extract to.
+        `members' is optional and must be a subset of the list returned
+        by namelist().
+        '''
+        if self.progressbar and not self.renderingProcess.is_alive():
+            if self.useBarPrefix:
+                self.prefix.value = f"Extracting \"{self.arcname}\" : ".encode()
+            self._start_progressbar("extractall")
+        
+        if members is None:
+            members = self.namelist()
+
+        if path is None:
+            path = os.getcwd()
+        else:
+            path = os.fspath(path)
+
+        skip = ""
+        for zipinfo in members:
+            #  skip nested files if any
+            if skip:
+                if zipinfo.startswith(skip):
+                    continue
+                else:
+                    skip = ""
+            targetpath = self._extract_member(zipinfo, path, pwd, "extractall")
+            #  dir was found in ignore, add path to skip
+            if targetpath == path and zipinfo.endswith("/"):
+                skip = zipinfo
+        
+        self._finish_progressbar("extractall")
+
+    def _extract_member(self, member, targetpath, pwd, callerName="") -> str:
+        '''
+        Extract the ZipInfo object 'member' to a physical
+        file on the path targetpath.
+        '''
+        if not isinstance(member, zipfile.ZipInfo):
+            member = self.getinfo(member)
+        
+        arcname = member.filename
+
+        #  Prune ignored dirs before reading anything
+        if self.is_ignored(arcname) or arcname == self.MANIFEST_NAME:
+            return targetpath
+
+        #  Symlinks and duplicates real name handling
+        arcname, symlink, contentMember = self.resolve_member(member, pwd)
+
+        if symlink:
+            symlink, isdir = symlink
+
+        original = contentMember.filename if contentMember is not member else None
+        
+        if self.is_ignored(arcname):
+            return targetpath
+        
+        #  Original _extract_member() code
+
+        # build the destination pathname, replacing
+        # forward slashes to platform specific separators.
+        arcname = arcname.replace('/', os.path.sep)
+
+        if os.path.altsep:
+            arcname = arcname.replace(os.path.altsep, os.path.sep)
+        # interpret absolute pathname as relative, remove drive letter or
+        # UNC path, redundant separators, "." and ".." components.
+        arcname = os.path.splitdrive(arcname)[1]
+        invalid_path_parts = ('', os.path.curdir, os.path.pardir)
+        arcname = os.path.sep.join(x for x in arcname.split(os.path.sep)
+                                   if x not in invalid_path_parts)
+        if os.path.sep == '\\':
+            # filter illegal characters on Windows
+            arcname = self._sanitize_windows_name(arcname, os.path.sep)
+
+        targetpath = os.path.join(targetpath, arcname)
+        targetpath = os.path.normpath(targetpath)
+
+        #  Same file is already on disk
+        unchanged = False
+        if self.sync:
+            with self.stats.phase("sync"):
+                unchanged = self._is_unchanged(contentMember, targetpath, symlink)
+
+        if unchanged:
+            self.stats.add("files_unchanged")
+            self._extract_original(member.filename, targetpath)
+            self._update_progressbar(callerName)
+            return targetpath
+        
+        #  Deal with duplicates
+        targetpath = self._deal_with_duplicates(targetpath, member.is_dir())
+
+        # Create all upper directories if necessary.
+        upperdirs = os.path.dirname(targetpath)
+        if upperdirs and not os.path.exists(upperdirs):
+            os.makedirs(upperdirs)
+
+        if member.is_dir():
+            if not os.path.isdir(targetpath):
+                os.mkdir(targetpath)
+            return targetpath
+
+        if symlink:
+            os.symlink(symlink, targetpath, isdir)
+            self.stats.add("symlinks_extracted")
+        else:
+            source = self._extractedOriginals.get(original)
+            #  Local copy instead of decompression
+            if source and os.path.isfile(source):
+                with self.stats.phase("copy"):
+                    shutil.copyfile(source, targetpath)
+            else:
+                with self.stats.phase("extract"), \
+                    self.open(contentMember, pwd=pwd) as source, \
+                    open(targetpath, "wb") as target:
+                    shutil.copyfileobj(source, target)
+            self.stats.add("files_extracted")
+            self.stats.add("bytes_extracted", contentMember.file_size)
+            if self.sync:
+                mtime = time.mktime(contentMember.date_time + (0, 0, -1))
+                os.utime(targetpath, (time.time(), mtime))
+            self._extract_original(member.filename, targetpath)
+        
+        self._update_progressbar(callerName)
+        
+        return targetpath
+
+    def resolve_member(
+        self,
+        member: zipfile.ZipInfo,
+        pwd: bytes | None=None
+    ) -> tuple[str, tuple[str, bool] | None, zipfile.ZipInfo]:
+        '''
+        Get the real name of symlink and duplicate members,
+        other members are returned as they are
+
+        Args:
+            member (zipfile.ZipInfo): Member
+            pwd (bytes | None, optional): Password to decrypt files.
+                Defaults to None.
+
+        Returns:
+            tuple[str, tuple[str, bool] | None, zipfile.ZipInfo]: Real
+                arcname, symlink target and whether it's a dir or None,
+                member with the content of the file
+        '''
+        arcname = member.filename
+        basename = os.path.basename(arcname)
+
+        if basename.startswith("__symlink__"):
+            with self.open(member, pwd=pwd) as source:
+                filename, symlink, isdir = source.readline().decode().split(",")
+            #  convert to boolean
+            return f"{os.path.dirname(arcname)}/{filename}", (symlink, isdir == "True"), member
+
+        if basename.startswith("__duplicate__"):
+            with self.open(member, pwd=pwd) as source:
+                filename, original = source.read().decode().split("\n")
+            #  the content is in the original
+            return f"{os.path.dirname(arcname)}/{filename}", None, self.getinfo(original)
+
+        return arcname, None, member
+
+    def _extract_original(self, arcname: str, targetpath: str):
+        '''
+        Remember where member is extracted, if
+        it's the original of some duplicates
+
+        Args:
+            arcname (str): Member name
+            targetpath (str): Path on disk
+        '''
+        entry = self.manifest.get(arcname)
+        if entry and entry.get("hash") in self._contents:
+            if self._contents[entry["hash"]] == arcname:
+                self._extractedOriginals[arcname] = targetpath
+
+    def _is_unchanged(self, member: zipfile.ZipInfo, targetpath: str, symlink: str | None) -> bool:
+        '''
+        Check if member is already extracted to targetpath
+
+        Args:
+            member (zipfile.ZipInfo): Member
+            targetpath (str): Path on disk
+            symlink (str | None): Symlink target if member is a symlink
+
+        Returns:
+            bool: Same file on disk or not
+        '''
+        try:
+            stats = os.lstat(targetpath)
+        except OSError:
+            return False
+
+        if member.is_dir():
+            return stat.S_ISDIR(stats.st_mode)
+
+        if symlink is not None:
+            return stat.S_ISLNK(stats.st_mode) and os.readlink(targetpath) == symlink
+
+        if not stat.S_ISREG(stats.st_mode) or stats.st_size != member.file_size:
+            return False
+
+        #  DOS time has 2 seconds precision
+        mtime = time.mktime(member.date_time + (0, 0, -1))
+        if abs(stats.st_mtime - mtime) <= 2:
+            return True
+
+        if file_crc32(targetpath) != member.CRC:
+            return False
+
+        #  Next time stat is enough
+        os.utime(targetpath, (stats.st_atime, mtime))
+        return True
+
+    def write(
+        self,
+        filename,
+        arcname=None,
+        compress_type=None,
+        compresslevel=None
+    ):
+        '''
+        Better zipfile.write which supports writing
+        symlinks and directories
+
+        Put the bytes from filename into the archive under the name
+        arcname.
+        '''
+        if arcname is None:
+            arcname = "{}/{}".format(
+                split_archive_extension(self.arcname)[0],
+                os.path.basename(filename.rstrip("/"))
+            )
+
+        if os.path.isdir(filename):
+            if self.is_ignored(f"{arcname.rstrip('/')}/"):
+                return
+        elif self.is_ignored(arcname):
+            return
+
+        if self.progressbar and not self.renderingProcess.is_alive():
+            if self.useBarPrefix:
+                member = os.path.basename(filename.rstrip("/"))
+                self.prefix.value = f"Writing \"{member}\" : ".encode()
+            if os.path.isfile(filename):
+                self.counter.value = -1
+                self.unit.value = b""
+            self._start_progressbar("write")
+        
+        self._write(filename, arcname, compress_type, compresslevel)
+
+        self._finish_progressbar("write")
+
+    def _write(
+        self,
+        filename,
+        arcname,
+        compress_type=None,
+        compresslevel=None
+    ):
+        '''
+        Real zipfile.write, recursive
+
+        Ignored dirs are pruned here, so their
+        contents are never listed
+        '''
+        with self.stats.phase("walk"):
+            isdir = os.path.isdir(filename)
+            islink = os.path.islink(filename)
+        self.stats.add("stat_calls", 2)
+
+        if self.is_ignored(f"{arcname.rstrip('/')}/" if isdir else arcname):
+            return
+
+        symlink = None
+
+        #  Check if file is a symlink
+        if islink:
+            #  Try to get real file if needed
+            if self.symlinksToFiles:
+                try:
+                    filename = os.path.realpath(filename, strict=True)
+                    arcname = os.path.dirname(arcname)
+                    arcname = f"{arcname}/{os.path.basename(filename)}"
+                except OSError:
+                    #  failed to follow the link
+                    #  file doesn't exist or a symbolic link loop was found
+                    #  so write link as it is
+                    symlink = True
+
+            if not self.symlinksToFiles or symlink:
+                #  symlink file content
+                symlink = "{},{},{}".format(
+                    os.path.basename(filename),
+                    os.readlink(filename),
+                    os.path.isdir(filename)
+                )
+                #  generate new arcname
+                arcname = os.path.dirname(arcname)
+                arcname = f"{arcname}/__symlink__{hashlib.md5(symlink.encode()).hexdigest()}"
+        
+        #  Check for dir trailing slash
+        if isdir and symlink is None:
+            if not arcname.endswith("/"):
+                arcname += "/"
+
+        duplicate = digest = None
+
+        #  Same content is already written
+        if self.deduplicate and symlink is None and not isdir:
+            duplicate, digest = self._find_duplicate(filename)
+            #  The original itself is replaced with the file
+            if duplicate == arcname:
+                duplicate = None
+            if duplicate is not None:
+                #  reference file content
+                duplicate = "{}\n{}".format(os.path.basename(filename), duplicate)
+                #  generate new arcname
+                arcname = os.path.dirname(arcname)
+                arcname = f"{arcname}/__duplicate__{hashlib.md5(duplicate.encode()).hexdigest()}"
+
+        #  Is it need to create a file?
+        create = True
+
+        #  Written before the interruption
+        if self.journal and arcname in self._resumedNames:
+            create = False
+
+        #  Deal with duplicates
+        elif arcname in self.namelist():
+            if self.overwriteDuplicates:
+                #  If member cannot be removed, create = False
+                create = self.remove(arcname)
+            else:
+                #  Don't rename dirs, only files
+                if not arcname.endswith("/"):
+                    arcname, name = os.path.split(arcname)
+                    for name in self.get_unique_filename(name):
+                        name = f"{arcname}/{name}"
+                        if name not in self.namelist():
+                            arcname = name
+                            break
+                else:
+                    #  Dir already exist
+                    create = False
+
+        if not arcname.endswith("/"):
+            if create:
+                with self.stats.phase("compress"):
+                    if duplicate is not None:
+                        self._write_duplicate(filename, arcname, duplicate, compress_type, compresslevel)
+                        self.stats.add("duplicates_written")
+                    elif symlink is None and self.hashAlgorithm:
+                        self._write_hashed(filename, arcname, compress_type, compresslevel, digest)
+                        self.stats.add("files_written")
+                    elif symlink is None:
+                        super().write(filename, arcname, compress_type, compresslevel)
+                        self.stats.add("files_written")
+                    else:
+                        super().writestr(arcname, symlink, compress_type, compresslevel)
+                        self.stats.add("symlinks_written")
+                self.stats.add("bytes_in", self.filelist[-1].file_size)
+                self.stats.add("bytes_out", self.filelist[-1].compress_size)
+                self._journal_member(self.filelist[-1])
+
+            self._update_progressbar("write")
+        
+        else:
+            if create:
+                super().write(filename, arcname, compress_type, compresslevel)
+                self.stats.add("dirs_written")
+                self._journal_member(self.filelist[-1])
+
+            with self.stats.phase("walk"):
+                files = sorted(os.listdir(filename))
+            self.stats.add("listdir_calls")
+            
+            for file in files:
+                self._write(
+                    filename=os.path.join(filename, file),
+                    arcname=os.path.join(arcname, file),
+                    compress_type=compress_type,
+                    compresslevel=compresslevel
+                )
+    
+    def _write_hashed(
+        self,
+        filename,
+        arcname,
+        compress_type=None,
+        compresslevel=None,
+        digest=None
+    ):
+        '''
+        zipfile.write for regular files, which hashes the data
+        while compressing it and adds the hash to the manifest.
+        Digest already computed by _find_duplicate is used as is
+        '''
+        zinfo = zipfile.ZipInfo.from_file(
+            filename,
+            arcname,
+            strict_timestamps=self._strict_timestamps
+        )
+
+        if compress_type is not None:
+            zinfo.compress_type = compress_type
+        else:
+            zinfo.compress_type = self.compression
+
+        if compresslevel is not None:
+            zinfo._compresslevel = compresslevel
+        else:
+            zinfo._compresslevel = self.compresslevel
+
+        stats = os.stat(filename)
+        hasher = hashlib.new(self.hashAlgorithm) if digest is None else None
+
+        with open(filename, "rb") as source, self.open(zinfo, "w") as target:
+            while chunk := source.read(CHUNK_SIZE):
+                if hasher is not None:
+                    hasher.update(chunk)
+                target.write(chunk)
+
+        self.manifest[zinfo.filename] = {
+            "size": stats.st_size,
+            "mtime": stats.st_mtime,
+            "hash": digest if hasher is None else hasher.hexdigest()
+        }
+        self._manifestModified = True
+        self._add_content(zinfo.filename)
+
+    def _add_content(self, arcname: str):
+        '''
+        Make member with a hash in manifest
+        an original for deduplication
+
+        Args:
+            arcname (str): Member name
+        '''
+        entry = self.manifest[arcname]
+        if "duplicate" not in entry:
+            self._contents.setdefault(entry["hash"], arcname)
+            self._contentSizes.add(entry["size"])
+
+    def _find_duplicate(self, filename: str) -> tuple[str | None, str | None]:
+        '''
+        Find member with the same content as the file
+
+        Args:
+            filename (str): Path to the file
+
+        Returns:
+            tuple[str | None, str | None]: Name of the original
+                member and hash of the file, if it was computed
+        '''
+        size = os.path.getsize(filename)
+
+        #  Different size means different content,
+        #  so only size collisions are hashed
+        if not size or size not in self._contentSizes:
+            return None, None
+
+        self.stats.add("files_prehashed")
+
+        with self.stats.phase("hash"):
+            hasher = hashlib.new(self.hashAlgorithm)
+            with open(filename, "rb") as source:
+                while chunk := source.read(CHUNK_SIZE):
+                    hasher.update(chunk)
+
+        digest = hasher.hexdigest()
+        return self._contents.get(digest), digest
+
+    def _write_duplicate(
+        self,
+        filename,
+        arcname,
+        duplicate,
+        compress_type=None,
+        compresslevel=None
+    ):
+        '''
+        Write reference to the original member
+        instead of the file content
+        '''
+        super().writestr(arcname, duplicate, compress_type, compresslevel)
+
+        stats = os.stat(filename)
+        original = duplicate.split("\n")[1]
+
+        self.manifest[arcname] = {
+            "size": stats.st_size,
+            "mtime": stats.st_mtime,
+            "hash": self.manifest[original]["hash"],
+            "duplicate": original
+        }
+        self._manifestModified = True
+
+    def _load_manifest(self):
+        '''
+        Read manifest member of the archive
+        '''
+        with self.open(self.MANIFEST_NAME) as source:
+            manifest = json.load(source)
+
+        if self.hashAlgorithm is None:
+            self.hashAlgorithm = manifest["algorithm"]
+        elif self.hashAlgorithm != manifest["algorithm"] and self.mode != "r":
+            raise ValueError(
+                f"Archive manifest uses {manifest['algorithm']}, "
+                f"can't append {self.hashAlgorithm} hashes"
+            )
+
+        #  Hashes of members recovered from the journal are newer
+        self.manifest = {
+            **{
+                arcname: entry for arcname, entry in manifest["members"].items()
+                if arcname in self.NameToInfo
+            },
+            **self.manifest
+        }
+
+        for arcname in self.manifest:
+            self._add_content(arcname)
+
+    def _write_manifest(self):
+        '''
+        Replace manifest member of the archive
+        with the current one
+        '''
+        if self.MANIFEST_NAME in self.NameToInfo:
+            self._drop_manifest()
+
+        manifest = {
+            "algorithm": self.hashAlgorithm,
+            "members": self.manifest
+        }
+
+        if self.manifest:
+            super().writestr(
+                self.MANIFEST_NAME,
+                json.dumps(manifest, ensure_ascii=False),
+                zipfile.ZIP_DEFLATED
+            )
+
+        self._manifestModified = False
+
+    def _drop_manifest(self):
+        '''
+        Drop manifest member from the central directory only,
+        so nothing is moved. If it's the last member, its
+        bytes are reused, otherwise they are left unreferenced
+        '''
+        member = self.NameToInfo.pop(self.MANIFEST_NAME)
+        self.filelist.remove(member)
+
+        if all(info.header_offset < member.header_offset for info in self.filelist):
+            self.start_dir = member.header_offset
+
+        self._didModify = True
+
+    def _release_manifest(self):
+        '''
+        Drop manifest before the first change of the archive,
+        changed members overwrite it and it's rewritten on close.
+        Archive that is only read stays untouched
+        '''
+        if self.mode != "a" or self.MANIFEST_NAME not in self.NameToInfo:
+            return
+
+        self._drop_manifest()
+        self._manifestModified = True
+
+        #  Journal must not have manifest, its bytes are reused
+        if self.journal:
+            self._open_journal()
+
+    def remove(self, member: zipfile.ZipInfo | str, pwd: bytes | None=None) -> bool:
+        '''
+        Remove a file or folder from the archive.
+        The archive must be open with mode 'a'
+        
+        CPython commit 659eb048cc9cac73c46349eb29845bc5cd630f09
+
+        Args:
+            member (zipfile.ZipInfo | str): Member
+            pwd (bytes | None): Password to decrypt files
+
+        Raises:
+            RuntimeError: remove() requires mode 'a'
+            ValueError: Attempt to write to ZIP archive that was already closed
+            ValueError: Can't write to ZIP archive while an open writing handle exists.
+
+        Returns:
+            bool: Whether it was removed or not. False means the file was in ignore.
+            For a folder, this means that there are files left inside it that are in ignore.
+        '''
+        if self.mode != 'a':
+            raise RuntimeError("remove() requires mode 'a'")
+        if not self.fp:
+            raise ValueError(
+                "Attempt to write to ZIP archive that was already closed")
+        if self._writing:
+            raise ValueError(
+                "Can't write to ZIP archive while an open writing handle exists."
+            )
+
+        # Make sure we have an info object
+        if isinstance(member, str):
+            # get the info object
+            member = self.getinfo(member)
+
+        if self.is_ignored(member.filename):
+            return False
+
+        self._release_manifest()
+
+        if self.progressbar and not self.renderingProcess.is_alive():
+            if self.useBarPrefix:
+                filename = os.path.basename(member.filename.rstrip("/"))
+                self.prefix.value = f"Removing \"{filename}\" : ".encode()
+            if not member.is_dir():
+                self.counter.value = -1
+                self.unit.value = b""
+            self._start_progressbar("remove")
+
+        removed = True
+
+        if member.is_dir():
+            names = [ name for name in self.namelist() if member.filename in name ]
+            #  inverse to remove members from subdirectories first
+            dirs = []
+            files = []
+            for name in names:
+                if name.endswith("/"):
+                    dirs.insert(0, name)
+                else:
+                    files.insert(0, name)
+            #  duplicate files list
+            names = files.copy()
+            #  remove files first, then subdirectories
+            for file in files:
+                file = self.getinfo(file)
+                removedFile = self._remove_member(file, pwd)
+                #  if file in ignore, ignore whole subdirectory
+                if not removedFile:
+                    subdir = os.path.dirname(file.filename) + "/"
+                    if subdir in dirs:
+                        dirs.remove(subdir)
                 else:
-                    #  First attempt can't decode with last
-                    #  Use preferred filename encoding
-                    if attempt == 0 and self.latestCharset != self.preferredEncoding:
-                        self.latestCharset = self.preferredEncoding
-                    #  Second attempt can't decode with preferred
-                    #  Try to guess
-                    else:
-                        self.latestCharset = None
+                    names.remove(file.filename)
+                removed &= removedFile
+            #  clean up empty subdirs
+            for subdir in dirs:
+                files = [ file for file in names if subdir in file ]
+                if not files:
+                    subdir = self.getinfo(subdir)
+                    self._remove_member(subdir, pwd)
+        else:
+            removed &= self._remove_member(member, pwd)
+
+        #  Offsets have changed, so old journal is useless
+        if self.journal:
+            self._open_journal()
+
+        self._finish_progressbar("remove")
+        return removed
+
+    def _remove_member(self, member: zipfile.ZipInfo, pwd: bytes | None=None) -> bool:
+        '''
+        Remove member from archive
+
+        Args:
+            member (zipfile.ZipInfo): Member
+            pwd (bytes | None): Password to decrypt files
+
+        Returns:
+            bool: Whether it was removed or not. False means the file was in ignore.
+        '''
+        #  Symlinks and duplicates real name handling
+        arcname = self.resolve_member(member, pwd)[0]
         
-        return encoding, text
+        if self.is_ignored(arcname):
+            return False
+
+        #  Duplicates lose their content with the original
+        restored = self._restore_duplicates(member)
+
+        # get a sorted filelist by header offset, in case the dir order
+        # doesn't match the actual entry order
+        fp = self.fp
+        entry_offset = 0
+        filelist = sorted(self.filelist, key=attrgetter('header_offset'))
+        for i in range(len(filelist)):
+            info = filelist[i]
+            # find the target member
+            if info.header_offset < member.header_offset:
+                continue
+
+            # get the total size of the entry
+            entry_size = None
+            if i == len(filelist) - 1:
+                entry_size = self.start_dir - info.header_offset
+            else:
+                entry_size = filelist[i + 1].header_offset - info.header_offset
+
+            # found the member, set the entry offset
+            if member == info:
+                entry_offset = entry_size
+                continue
+
+            # Move entry
+            with self.stats.phase("remove"):
+                # read the actual entry data
+                fp.seek(info.header_offset)
+                entry_data = fp.read(entry_size)
+
+                # update the header
+                info.header_offset -= entry_offset
+
+                # write the entry to the new position
+                fp.seek(info.header_offset)
+                fp.write(entry_data)
+                fp.flush()
+            self.stats.add("bytes_moved", entry_size)
+
+        # update state
+        self.start_dir -= entry_offset
+        self.filelist.remove(member)
+        del self.NameToInfo[member.filename]
+        self._didModify = True
+
+        self.stats.add("members_removed")
+
+        if self.manifest.pop(member.filename, None):
+            self._manifestModified = True
+            self._contents = {
+                contentHash: original for contentHash, original in self._contents.items()
+                if original != member.filename
+            }
+            for arcname in restored:
+                self._add_content(arcname)
+        self.seekIndexes.pop(member.filename, None)
+
+        # seek to the start of the central dir
+        fp.seek(self.start_dir)
+
+        if not member.is_dir():
+            self._update_progressbar("remove")
+        
+        return True
+
+    def _restore_duplicates(self, member: zipfile.ZipInfo) -> list[str]:
+        '''
+        Turn duplicates of the member into real members
+        with its content, so it can be removed
+
+        Args:
+            member (zipfile.ZipInfo): Original member
+
+        Returns:
+            list[str]: Names of restored members
+        '''
+        duplicates = [
+            arcname for arcname, entry in self.manifest.items()
+            if entry.get("duplicate") == member.filename
+        ]
+        restored = []
+
+        if not duplicates:
+            return restored
+
+        #  Members can't be read while another one is written
+        with tempfile.TemporaryFile() as content:
+            with self.open(member) as source:
+                shutil.copyfileobj(source, content, CHUNK_SIZE)
+
+            for arcname in duplicates:
+                duplicate = self.NameToInfo[arcname]
+                name = self.resolve_member(duplicate)[0].lstrip("/")
+                entry = self.manifest[arcname]
+                self._remove_member(duplicate)
+
+                zinfo = zipfile.ZipInfo(name, time.localtime(entry["mtime"])[:6])
+                zinfo.external_attr = member.external_attr
+                zinfo.compress_type = member.compress_type
+                zinfo.file_size = member.file_size
+
+                content.seek(0)
+                with self.stats.phase("compress"), self.open(zinfo, "w") as target:
+                    shutil.copyfileobj(content, target, CHUNK_SIZE)
+
+                self.manifest[name] = {
+                    key: value for key, value in entry.items() if key != "duplicate"
+                }
+                self._manifestModified = True
+                self.stats.add("duplicates_restored")
+                restored.append(name)
+
+        return restored
+
+    def checkpoint(self):
+        '''
+        Sync written members to disk and record them in the journal.
+        After an interruption the archive is recovered up to here
+        '''
+        if self._journalPending:
+            with self.stats.phase("checkpoint"):
+                self.fp.flush()
+                os.fsync(self.fp.fileno())
+
+                for info, end in self._journalPending:
+                    self._journalFile.write(self._journal_entry(info, end))
+
+                self._journalFile.flush()
+                os.fsync(self._journalFile.fileno())
+            self.stats.add("fsync_calls", 2)
+            self._journalPending = []
+
+        self._checkpointTime = time.monotonic()
+
+    def _journal_member(self, member: zipfile.ZipInfo):
+        '''
+        Add just written member to the journal,
+        make a checkpoint if it's time to
+
+        Args:
+            member (zipfile.ZipInfo): Member
+        '''
+        if not self.journal:
+            return
+
+        self._journalPending.append((member, self.start_dir))
+        self._writtenNames.add(member.filename)
+
+        if time.monotonic() - self._checkpointTime >= self.checkpointInterval:
+            self.checkpoint()
+
+    def _journal_entry(self, member: zipfile.ZipInfo, end: int) -> str:
+        '''
+        Serialize member to the journal line
+
+        Args:
+            member (zipfile.ZipInfo): Member
+            end (int): Offset where member data ends
+
+        Returns:
+            str: JSON line
+        '''
+        entry = { field: getattr(member, field) for field in self.JOURNAL_FIELDS }
+        entry["filename"] = member.filename
+        entry["date_time"] = member.date_time
+        entry["extra"] = member.extra.hex()
+        entry["comment"] = member.comment.hex()
+        entry["end"] = end
+        #  Written by this write, not before it
+        entry["written"] = member.filename in self._writtenNames
+        if member.filename in self.manifest:
+            entry["manifest"] = [self.hashAlgorithm, self.manifest[member.filename]]
+        return json.dumps(entry, ensure_ascii=False) + "\n"
+
+    def _open_journal(self):
+        '''
+        Create the journal with all current members and
+        open it for appending. Replaces the old one atomically
+        '''
+        if getattr(self, "_journalFile", None):
+            self._journalFile.close()
+
+        self.fp.flush()
+        os.fsync(self.fp.fileno())
+
+        filelist = sorted(self.filelist, key=attrgetter("header_offset"))
+        ends = [ info.header_offset for info in filelist[1:] ] + [self.start_dir]
+
+        tempPath = f"{self.journalPath}.tmp"
+        with open(tempPath, "w", encoding="utf-8") as journalFile:
+            for info, end in zip(filelist, ends):
+                journalFile.write(self._journal_entry(info, end))
+            journalFile.flush()
+            os.fsync(journalFile.fileno())
+        os.replace(tempPath, self.journalPath)
+
+        self._journalFile = open(self.journalPath, "a", encoding="utf-8")
+        self._journalPending = []
+        self._checkpointTime = time.monotonic()
+
+    def _recover_from_journal(self, file: str) -> list[dict]:
+        '''
+        Read the journal left by interrupted write and
+        truncate archive to the last good member
+
+        Args:
+            file (str): Path to the archive
+
+        Returns:
+            list[dict]: Journal entries
+        '''
+        entries = []
+
+        with open(self.journalPath, "r", encoding="utf-8") as journalFile:
+            for line in journalFile:
+                try:
+                    entries.append(json.loads(line))
+                except json.JSONDecodeError:
+                    #  Torn write of the last line
+                    break
+
+        size = os.path.getsize(file) if os.path.exists(file) else 0
+
+        #  Members that didn't reach the disk
+        while entries and entries[-1]["end"] > size:
+            entries.pop()
+
+        if size:
+            with open(file, "r+b") as archive:
+                archive.truncate(entries[-1]["end"] if entries else 0)
+
+        return entries
+
+    def _load_journal_entries(self):
+        '''
+        Rebuild the table of contents from the journal entries
+        '''
+        for entry in self._journalEntries:
+            x = zipfile.ZipInfo(entry["filename"], tuple(entry["date_time"]))
+            for field in self.JOURNAL_FIELDS:
+                setattr(x, field, entry[field])
+            x.extra = bytes.fromhex(entry["extra"])
+            x.comment = bytes.fromhex(entry["comment"])
+            self.filelist.append(x)
+            self.NameToInfo[x.filename] = x
+
+            if entry.get("written"):
+                self._resumedNames.add(x.filename)
+
+            if "manifest" in entry:
+                self.hashAlgorithm = self.hashAlgorithm or entry["manifest"][0]
+                self.manifest[x.filename] = entry["manifest"][1]
+                self._manifestModified = True
+
+        self.start_dir = self._journalEntries[-1]["end"] if self._journalEntries else 0
+        self._journalEntries = None
+        self._writtenNames = set(self._resumedNames)
+        #  Central directory must be written even if nothing is added
+        self._didModify = True
+
+
+
+class TarFile(Archive):
+
+    #  Extension : compression
+    EXTENSIONS = {
+        ".tar": "",
+        ".tar.gz": "gz",
+        ".tgz": "gz",
+        ".tar.xz": "xz",
+        ".txz": "xz",
+        ".tar.bz2": "bz2",
+        ".tbz2": "bz2"
+    }
+
+    def __init__(
+        self,
+        file: str | IO,
+        mode: str="r",
+        compression: str | None=None,
+        compresslevel: int | None=None,
+        *,
+        preferredEncoding: str="cp866",
+        ignore: list[str]=[],
+        overwriteDuplicates: bool=False,
+        symlinksToFiles: bool=False,
+        progressbar: bool=False,
+        useBarPrefix: bool=True,
+        clearBarAfterFinished: bool=False,
+        sync: bool=False,
+        stats: bool=False
+    ):
+        '''
+        Tar archive with the same interface as ZipFile. Members are
+        written and extracted sequentially, and the compression is
+        solid, so many small files compress better than in .zip
+
+        Args:
+            file (str | IO): Either the path to the file,
+                or a file-like object
+            mode (str, optional): File mode, 'a' is only supported
+                by uncompressed archives or when file doesn't exist.
+                Defaults to "r".
+            compression (str | None, optional): "" (no compression),
+                "gz", "xz" or "bz2". None to choose by the file
+                extension. Defaults to None.
+            compresslevel (int | None, optional): None (default for the
+                given compression type) or an integer from 0 through 9
+                specifying the level or preset. Defaults to None.
+
+        The rest of arguments are the same as for ZipFile. Symbolic
+        links and hard links are stored as tar links, file names are
+        always written in UTF-8
+        '''
+        self.latestCharset = None
+        self.preferredEncoding = preferredEncoding
+
+        self.stats = Stats(stats)
+
+        filename = file if isinstance(file, str) else getattr(file, "name", "")
+
+        if compression is None:
+            compression = self.EXTENSIONS.get(split_archive_extension(filename)[1].lower(), "")
+
+        if mode == "a":
+            if not isinstance(file, str) or os.path.exists(file):
+                if compression:
+                    raise ValueError("Can't append to compressed tar archive")
+            else:
+                mode = "w"
+
+        if mode not in ("r", "w", "a"):
+            raise ValueError("TarFile requires mode 'r', 'w' or 'a'")
+
+        kwargs = {}
+        if mode == "w" and compresslevel is not None:
+            if compression == "xz":
+                kwargs["preset"] = compresslevel
+            elif compression:
+                kwargs["compresslevel"] = compresslevel
+
+        with self.stats.phase("open"):
+            self.tar = tarfile.open(
+                name=file if isinstance(file, str) else None,
+                mode=f"{mode}:{'*' if mode == 'r' else compression}",
+                fileobj=None if isinstance(file, str) else file,
+                format=tarfile.PAX_FORMAT,
+                encoding="utf-8",
+                errors="surrogateescape",
+                **kwargs
+            )
+
+        self.filename = self.tar.name
+        self.mode = mode
+        self.compression = compression
+        #  Names written, to deal with duplicates
+        self._names = set(self.tar.getnames()) if mode == "a" else set()
+
+        self._init_archive(
+            ignore=ignore,
+            overwriteDuplicates=overwriteDuplicates,
+            symlinksToFiles=symlinksToFiles,
+            progressbar=progressbar,
+            useBarPrefix=useBarPrefix,
+            clearBarAfterFinished=clearBarAfterFinished,
+            sync=sync
+        )
 
-    def decode_filename(self, filename: bytes) -> str:
-        '''
-        Decodes a filename, splitting it into parts.
-        This is necessary in order to reduce the number 
-        of charset_normalizer errors
+    def __enter__(self) -> "TarFile":
+        return self
 
-        Args:
-            filename (bytes): Encoded filename
+    def __exit__(self, type, value, traceback):
+        self.close()
 
-        Returns:
-            str: Decoded filename
-        '''
-        filenames = []
-        for filename in filename.split(b"/"):
-            filename = self.guess_encoding(filename)[1]
-            filenames.append(filename)
-        
-        filename = "/".join(filenames)
-        return filename
+        #  Delete archive if nothing was written
+        if self.mode != "w" or self._names or not os.path.isfile(self.filename):
+            return
 
-    def get_unique_filename(self, filename: str) -> Iterator[str]:
-        '''
-        Unique name generator: adds a number to the filename
-        
-        Used to rename duplicates if the overwriteDuplicates
-        parameter is disabled
+        if self.progressbar:
+            if self.useBarPrefix:
+                self.prefix.value = f"Removing \"{self.arcname}\" : ".encode()
+            self.counter.value = -1
+            self.unit.value = b""
+            self._start_progressbar("__exit__")
 
-        Args:
-            filename (str): Filename
+        os.remove(self.filename)
+        self._finish_progressbar("__exit__")
 
-        Yields:
-            Iterator[str]: filename (1), filename (2) ...
+    def __repr__(self) -> str:
+        return f"<TarFile filename={self.filename!r} mode={self.mode!r}>"
+
+    def close(self):
         '''
-        filename, extension = os.path.splitext(filename)
-        number = itertools.count(1)
-        
-        while True:
-            yield f"{filename} ({next(number)}){extension}"
+        Close the archive, for mode 'w' and 'a'
+        write the end of archive blocks
+        '''
+        with self.stats.phase("close"):
+            self.tar.close()
 
-    def open(self, name, mode="r", pwd=None, *, force_zip64=False):
+    def _members(self) -> Iterator[tarfile.TarInfo]:
         '''
-        Return file-like object for 'name'.
+        Iterate over members reading the archive sequentially,
+        names with broken encoding are decoded on the way
 
-        name is a string for the file name within the ZIP file, or a ZipInfo
-        object.
+        Yields:
+            Iterator[tarfile.TarInfo]: Members
+        '''
+        for tarinfo in self.tar:
+            #  Not UTF-8 name from other archivers
+            try:
+                tarinfo.name.encode("utf-8")
+            except UnicodeEncodeError:
+                tarinfo.name = self.decode_filename(
+                    tarinfo.name.encode("utf-8", "surrogateescape")
+                )
+            yield tarinfo
 
-        mode should be 'r' to read a file already in the ZIP file, or 'w' to
-        write to a file newly added to the archive.
+    @staticmethod
+    def _member_name(tarinfo: tarfile.TarInfo) -> str:
+        '''
+        Member name in ZipFile format, dirs end with slash
 
-        pwd is the password to decrypt files (only used for reading).
+        Args:
+            tarinfo (tarfile.TarInfo): Member
 
-        When writing, if the file size is not known in advance but may exceed
-        2 GiB, pass force_zip64 to use the ZIP64 format, which can handle large
-        files.  If the size is known in advance, it is best to pass a ZipInfo
-        instance for name, with zinfo.file_size set.
+        Returns:
+            str: Name
         '''
-        if mode not in {"r", "w"}:
-            raise ValueError('open() requires mode "r" or "w"')
-        if pwd and not isinstance(pwd, bytes):
-            raise TypeError("pwd: expected bytes, got %s" % type(pwd).__name__)
-        if pwd and (mode == "w"):
-            raise ValueError("pwd is only supported for reading files")
-        if not self.fp:
-            raise ValueError(
-                "Attempt to use ZIP archive that was already closed")
-
-        # Make sure we have an info object
-        if isinstance(name, zipfile.ZipInfo):
-            # 'name' is already an info object
-            zinfo = name
-        elif mode == 'w':
-            zinfo = zipfile.ZipInfo(name)
-            zinfo.compress_type = self.compression
-            zinfo._compresslevel = self.compresslevel
-        else:
-            # Get info object for name
-            zinfo = self.getinfo(name)
+        return f"{tarinfo.name}/" if tarinfo.isdir() else tarinfo.name
 
-        if mode == 'w':
-            return self._open_to_write(zinfo, force_zip64=force_zip64)
+    def getmembers(self) -> list[tarfile.TarInfo]:
+        '''
+        Return a list of members, reads the whole archive
+        if it's not loaded yet
+        '''
+        for _ in self._members():
+            pass
+        return self.tar.getmembers()
 
-        if self._writing:
-            raise ValueError("Can't read from the ZIP file while there "
-                    "is an open writing handle on it. "
-                    "Close the writing handle before trying to read.")
+    def infolist(self) -> list[tarfile.TarInfo]:
+        '''
+        Same as getmembers, for ZipFile compatibility
+        '''
+        return self.getmembers()
 
-        # Open for reading:
-        self._fileRefCnt += 1
-        zef_file = zipfile._SharedFile(
-            self.fp,
-            zinfo.header_offset,
-            self._fpclose,
-            self._lock,
-            lambda: self._writing
-        )
+    def namelist(self) -> list[str]:
+        '''
+        Return a list of member names, dirs end with slash
+        '''
+        return [ self._member_name(tarinfo) for tarinfo in self.getmembers() ]
 
+    def getinfo(self, name: str) -> tarfile.TarInfo:
+        '''
+        Return the member for name, the last one if
+        there are duplicates. Raises KeyError if not found
+        '''
+        self.getmembers()
         try:
-            # Skip the file header:
-            fheader = zef_file.read(zipfile.sizeFileHeader)
-            if len(fheader) != zipfile.sizeFileHeader:
-                raise zipfile.BadZipFile("Truncated file header")
-            fheader = zipfile.struct.unpack(zipfile.structFileHeader, fheader)
-            if fheader[zipfile._FH_SIGNATURE] != zipfile.stringFileHeader:
-                raise zipfile.BadZipFile("Bad magic number for file header")
+            return self.tar.getmember(name.rstrip("/"))
+        except KeyError:
+            raise KeyError(f"There is no item named {name!r} in the archive")
 
-            fname = zef_file.read(fheader[zipfile._FH_FILENAME_LENGTH])
-            if fheader[zipfile._FH_EXTRA_FIELD_LENGTH]:
-                zef_file.read(fheader[zipfile._FH_EXTRA_FIELD_LENGTH])
+    def open(self, name: str | tarfile.TarInfo, mode: str="r") -> IO[bytes]:
+        '''
+        Return file-like object for reading 'name'
+        '''
+        if mode != "r":
+            raise ValueError('open() requires mode "r"')
 
-            if zinfo.flag_bits & 0x20:
-                # Zip 2.7: compressed patched data
-                raise NotImplementedError("compressed patched data (flag bit 5)")
+        if not isinstance(name, tarfile.TarInfo):
+            name = self.getinfo(name)
 
-            if zinfo.flag_bits & 0x40:
-                # strong encryption
-                raise NotImplementedError("strong encryption (flag bit 6)")
+        source = self.tar.extractfile(name)
+        if source is None:
+            raise KeyError(f"Member {name.name!r} is not a file")
 
-            if fheader[zipfile._FH_GENERAL_PURPOSE_FLAG_BITS] & 0x800:
-                # UTF-8 filename
-                fname_str = fname.decode("utf-8")
-            else:
-                #------------------------------------------------------
-                #    Fix broken filenames due to incorrect encoding    
-                #------------------------------------------------------
-                fname_str = self.decode_filename(fname)
+        return source
 
-            if fname_str != zinfo.orig_filename:
-                raise zipfile.BadZipFile(
-                    'File name in directory %r and header %r differ.'
-                    % (zinfo.orig_filename, fname))
+    def printdir(self, file: IO | None=None):
+        '''
+        Print a table of contents for the tar file
+        '''
+        print("%-46s %19s %12s" % ("File Name", "Modified    ", "Size"), file=file)
+        for tarinfo in self.getmembers():
+            date = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(tarinfo.mtime))
+            print("%-46s %s %12d" % (self._member_name(tarinfo), date, tarinfo.size), file=file)
 
-            # check for encrypted flag & handle password
-            is_encrypted = zinfo.flag_bits & 0x1
-            if is_encrypted:
-                if not pwd:
-                    pwd = self.pwd
-                if not pwd:
-                    raise RuntimeError("File %r is encrypted, password "
-                                       "required for extraction" % name)
-            else:
-                pwd = None
+    def testzip(self) -> str | None:
+        '''
+        Read all the files and check the archive isn't broken.
+        Return the name of the first bad file, or else return None
+        '''
+        for tarinfo in self._members():
+            if not tarinfo.isreg():
+                continue
+            try:
+                with self.tar.extractfile(tarinfo) as source:
+                    while source.read(CHUNK_SIZE):
+                        pass
+            except (tarfile.TarError, OSError, EOFError):
+                return tarinfo.name
 
-            return zipfile.ZipExtFile(zef_file, mode, zinfo, pwd, True)
-        except:
-            zef_file.close()
-            raise
-    
-    def extract(self, member, path=None, pwd=None) -> str:
+    def extract(self, member, path=None) -> str:
         '''
         Extract a member from the archive to the current working directory,
-        using its full name. Its file information is extracted as accurately
-        as possible. `member' may be a filename or a ZipInfo object. You can
-        specify a different directory using `path'.
+        using its full name. `member' may be a filename or a TarInfo object.
+        You can specify a different directory using `path'.
         '''
-        if isinstance(member, zipfile.ZipInfo):
-            member = member.filename
+        if not isinstance(member, tarfile.TarInfo):
+            member = self.getinfo(member)
 
         if path is None:
             path = os.getcwd()
         else:
             path = os.fspath(path)
 
-        if self.is_ignored(member):
+        name = self._member_name(member)
+
+        if self.is_ignored(name):
             return path
 
         if self.progressbar and not self.renderingProcess.is_alive():
             if self.useBarPrefix:
-                filename = os.path.basename(member.rstrip("/"))
+                filename = os.path.basename(member.name)
                 self.prefix.value = f"Extracting \"{filename}\" : ".encode()
-            if not member.endswith("/"):
+            if not member.isdir():
                 self.counter.value = -1
                 self.unit.value = b""
             self._start_progressbar("extract")
 
-        targetpath = self._extract_member(member, path, pwd, "extract")
+        targetpath = self._extract_member(member, path, "extract")
         #  extract directory contents
-        if targetpath != path and os.path.isdir(targetpath):
-            members = [ name for name in self.namelist() if member in name ][1:]
+        if member.isdir():
+            members = [
+                tarinfo for tarinfo in self.getmembers()
+                if tarinfo.name.startswith(name)
+            ]
             self.extractall(path, members)
 
         self._finish_progressbar("extract")
 
         return targetpath
 
-    def extractall(self, path=None, members=None, pwd=None):
+    def extractall(self, path=None, members=None):
         '''
         Extract all members from the archive to the current working
         directory. `path' specifies a different directory to extract to.
         `members' is optional and must be a subset of the list returned
-        by namelist().
+        by namelist() or getmembers().
+
+        Archive is read only once, from the beginning to the end
         '''
         if self.progressbar and not self.renderingProcess.is_alive():
             if self.useBarPrefix:
                 self.prefix.value = f"Extracting \"{self.arcname}\" : ".encode()
             self._start_progressbar("extractall")
-        
-        if members is None:
-            members = self.namelist()
 
         if path is None:
             path = os.getcwd()
         else:
             path = os.fspath(path)
 
-        skip = ""
-        for zipinfo in members:
-            #  skip nested files if any
-            if skip:
-                if skip in zipinfo:
-                    continue
-                else:
-                    skip = ""
-            targetpath = self._extract_member(zipinfo, path, pwd, "extractall")
-            #  name was found in ignore, add path to skip
-            if targetpath == path:
-                skip = zipinfo
-        
+        if members is None:
+            members = self._members()
+        else:
+            members = [
+                member if isinstance(member, tarfile.TarInfo) else self.getinfo(member)
+                for member in members
+            ]
+
+        for tarinfo in members:
+            self._extract_member(tarinfo, path, "extractall")
+
         self._finish_progressbar("extractall")
 
-    def _extract_member(self, member, targetpath, pwd, callerName="") -> str:
+    def _extract_member(self, member: tarfile.TarInfo, targetpath: str, callerName="") -> str:
         '''
-        Extract the ZipInfo object 'member' to a physical
+        Extract the TarInfo object 'member' to a physical
         file on the path targetpath.
         '''
-        if not isinstance(member, zipfile.ZipInfo):
-            member = self.getinfo(member)
-        
-        arcname = member.filename
+        if self.is_ignored(self._member_name(member)):
+            return targetpath
 
-        #  Symlinks real name handling
-        if os.path.basename(arcname).startswith("__symlink__"):
-            with self.open(member, pwd=pwd) as source:
-                symlink = source.readline().decode()
-                filename, symlink, isdir = symlink.split(",")
-                #  convert to boolean
-                isdir = isdir == "True"
-            arcname = os.path.dirname(arcname)
-            arcname = f"{arcname}/{filename}"
-        else:
-            symlink = None
-        
-        if self.is_ignored(arcname):
+        # build the destination pathname, dropping drive letter,
+        # redundant separators, "." and ".." components.
+        arcname = os.path.splitdrive(member.name.replace("\\", "/"))[1]
+        arcname = os.path.sep.join(
+            part for part in arcname.split("/")
+            if part not in ("", os.path.curdir, os.path.pardir)
+        )
+        if os.path.sep == "\\":
+            # filter illegal characters on Windows
+            arcname = zipfile.ZipFile._sanitize_windows_name(arcname, os.path.sep)
+
+        if not arcname:
             return targetpath
-        
-        #  Original _extract_member() code
 
-        # build the destination pathname, replacing
-        # forward slashes to platform specific separators.
-        arcname = arcname.replace('/', os.path.sep)
+        targetpath = os.path.normpath(os.path.join(targetpath, arcname))
 
-        if os.path.altsep:
-            arcname = arcname.replace(os.path.altsep, os.path.sep)
-        # interpret absolute pathname as relative, remove drive letter or
-        # UNC path, redundant separators, "." and ".." components.
-        arcname = os.path.splitdrive(arcname)[1]
-        invalid_path_parts = ('', os.path.curdir, os.path.pardir)
-        arcname = os.path.sep.join(x for x in arcname.split(os.path.sep)
-                                   if x not in invalid_path_parts)
-        if os.path.sep == '\\':
-            # filter illegal characters on Windows
-            arcname = self._sanitize_windows_name(arcname, os.path.sep)
+        #  Same file is already on disk
+        unchanged = False
+        if self.sync:
+            with self.stats.phase("sync"):
+                unchanged = self._is_unchanged(member, targetpath)
+
+        if unchanged:
+            self.stats.add("files_unchanged")
+            self._update_progressbar(callerName)
+            return targetpath
 
-        targetpath = os.path.join(targetpath, arcname)
-        targetpath = os.path.normpath(targetpath)
-        
         #  Deal with duplicates
-        if os.path.exists(targetpath):
-            if self.overwriteDuplicates:
-                if member.is_dir():
-                    shutil.rmtree(targetpath)
-                else:
-                    os.remove(targetpath)
-            else:
-                #  Don't rename dirs, only files
-                if not member.is_dir():
-                    targetpath, name = os.path.split(targetpath)
-                    for name in self.get_unique_filename(name):
-                        name = os.path.join(targetpath, name)
-                        if not os.path.exists(name):
-                            targetpath = name
-                            break
+        targetpath = self._deal_with_duplicates(targetpath, member.isdir())
 
         # Create all upper directories if necessary.
         upperdirs = os.path.dirname(targetpath)
         if upperdirs and not os.path.exists(upperdirs):
             os.makedirs(upperdirs)
 
-        if member.is_dir():
+        if member.isdir():
             if not os.path.isdir(targetpath):
                 os.mkdir(targetpath)
             return targetpath
 
-        if symlink:
-            os.symlink(symlink, targetpath, isdir)
-        else:
-            with self.open(member, pwd=pwd) as source, \
+        if member.issym():
+            isdir = os.path.isdir(os.path.join(upperdirs, member.linkname))
+            os.symlink(member.linkname, targetpath, isdir)
+            self.stats.add("symlinks_extracted")
+        elif member.isreg() or member.islnk():
+            with self.stats.phase("extract"), \
+                self.tar.extractfile(member) as source, \
                 open(targetpath, "wb") as target:
-                shutil.copyfileobj(source, target)
-        
+                shutil.copyfileobj(source, target, CHUNK_SIZE)
+            self.stats.add("files_extracted")
+            self.stats.add("bytes_extracted", member.size)
+            os.chmod(targetpath, member.mode & 0o7777)
+            os.utime(targetpath, (member.mtime, member.mtime))
+        else:
+            #  Devices and fifos are not restored
+            return targetpath
+
         self._update_progressbar(callerName)
-        
+
         return targetpath
 
-    def write(
-        self,
-        filename,
-        arcname=None,
-        compress_type=None,
-        compresslevel=None
-    ):
+    def _is_unchanged(self, member: tarfile.TarInfo, targetpath: str) -> bool:
         '''
-        Better zipfile.write which supports writing
-        symlinks and directories
+        Check if member is already extracted to targetpath
 
-        Put the bytes from filename into the archive under the name
-        arcname.
+        Args:
+            member (tarfile.TarInfo): Member
+            targetpath (str): Path on disk
+
+        Returns:
+            bool: Same file on disk or not
         '''
-        if self.is_ignored(filename):
-            return
+        try:
+            stats = os.lstat(targetpath)
+        except OSError:
+            return False
+
+        if member.isdir():
+            return stat.S_ISDIR(stats.st_mode)
+
+        if member.issym():
+            return stat.S_ISLNK(stats.st_mode) and os.readlink(targetpath) == member.linkname
+
+        if not stat.S_ISREG(stats.st_mode) or stats.st_size != member.size:
+            return False
+
+        if int(stats.st_mtime) == int(member.mtime):
+            return True
+
+        #  No checksums in tar, compare contents
+        with self.tar.extractfile(member) as source, open(targetpath, "rb") as target:
+            while True:
+                chunk = source.read(CHUNK_SIZE)
+                if chunk != target.read(CHUNK_SIZE):
+                    return False
+                if not chunk:
+                    break
+
+        #  Next time stat is enough
+        os.utime(targetpath, (stats.st_atime, member.mtime))
+        return True
 
+    def write(self, filename, arcname=None):
+        '''
+        Put the file, symlink or directory with its contents
+        into the archive under the name arcname.
+        '''
         if arcname is None:
             arcname = "{}/{}".format(
-                os.path.splitext(self.arcname)[0],
+                split_archive_extension(self.arcname)[0],
                 os.path.basename(filename.rstrip("/"))
             )
 
+        if os.path.isdir(filename):
+            if self.is_ignored(f"{arcname.rstrip('/')}/"):
+                return
+        elif self.is_ignored(arcname):
+            return
+
         if self.progressbar and not self.renderingProcess.is_alive():
             if self.useBarPrefix:
                 member = os.path.basename(filename.rstrip("/"))
@@ -896,264 +3250,179 @@ class ZipFile(zipfile.ZipFile):
                 self.counter.value = -1
                 self.unit.value = b""
             self._start_progressbar("write")
-        
-        self._write(filename, arcname, compress_type, compresslevel)
+
+        self._write(filename, arcname)
 
         self._finish_progressbar("write")
 
-    def _write(
-        self,
-        filename,
-        arcname,
-        compress_type=None,
-        compresslevel=None
-    ):
+    def _write(self, filename, arcname):
         '''
-        Real zipfile.write, recursive
+        Real tarfile.add, recursive
+
+        Ignored dirs are pruned here, so their
+        contents are never listed
         '''
-        if self.is_ignored(filename):
+        with self.stats.phase("walk"):
+            isdir = os.path.isdir(filename)
+        self.stats.add("stat_calls")
+
+        if self.is_ignored(f"{arcname.rstrip('/')}/" if isdir else arcname):
             return
 
-        symlink = None
+        #  Try to get real file if needed
+        if self.symlinksToFiles and os.path.islink(filename):
+            try:
+                filename = os.path.realpath(filename, strict=True)
+                arcname = os.path.dirname(arcname)
+                arcname = f"{arcname}/{os.path.basename(filename)}"
+            except OSError:
+                #  failed to follow the link, write link as it is
+                pass
 
-        #  Check if file is a symlink
-        if os.path.islink(filename):
-            #  Try to get real file if needed
-            if self.symlinksToFiles:
-                try:
-                    filename = os.path.realpath(filename, strict=True)
-                    arcname = os.path.dirname(arcname)
-                    arcname = f"{arcname}/{os.path.basename(filename)}"
-                except OSError:
-                    #  failed to follow the link
-                    #  file doesn't exist or a symbolic link loop was found
-                    #  so write link as it is
-                    symlink = True
+        with self.stats.phase("walk"):
+            tarinfo = self.tar.gettarinfo(filename, arcname.replace(os.sep, "/").rstrip("/"))
+        self.stats.add("stat_calls")
 
-            if not self.symlinksToFiles or symlink:
-                #  symlink file content
-                symlink = "{},{},{}".format(
-                    os.path.basename(filename),
-                    os.readlink(filename),
-                    os.path.isdir(filename)
-                )
-                #  generate new arcname
-                arcname = os.path.dirname(arcname)
-                arcname = f"{arcname}/__symlink__{hashlib.md5(symlink.encode()).hexdigest()}"
-        
-        #  Check for dir trailing slash
-        if os.path.isdir(filename) and symlink is None:
-            if not arcname.endswith("/"):
-                arcname += "/"
+        #  Sockets and other unsupported types
+        if tarinfo is None:
+            return
 
         #  Is it need to create a file?
         create = True
 
-        #  Deal with duplicates
-        if arcname in self.namelist():
-            if self.overwriteDuplicates:
-                #  If member cannot be removed, create = False
-                create = self.remove(arcname)
-            else:
-                #  Don't rename dirs, only files
-                if not arcname.endswith("/"):
-                    arcname, name = os.path.split(arcname)
-                    for name in self.get_unique_filename(name):
-                        name = f"{arcname}/{name}"
-                        if name not in self.namelist():
-                            arcname = name
-                            break
-                else:
-                    #  Dir already exist
-                    create = False
-
-        if not arcname.endswith("/"):
-            if create:
-                if symlink is None:
-                    super().write(filename, arcname, compress_type, compresslevel)
+        #  Deal with duplicates, the last one wins
+        #  on extraction, so it's overwritten
+        if tarinfo.name in self._names:
+            if tarinfo.isdir():
+                create = False
+            elif not self.overwriteDuplicates:
+                dirname, name = os.path.split(tarinfo.name)
+                for name in self.get_unique_filename(name):
+                    name = f"{dirname}/{name}" if dirname else name
+                    if name not in self._names:
+                        tarinfo.name = name
+                        break
+
+        if create:
+            with self.stats.phase("compress"):
+                if tarinfo.isreg():
+                    with open(filename, "rb") as source:
+                        self.tar.addfile(tarinfo, source)
                 else:
-                    super().writestr(arcname, symlink, compress_type, compresslevel)
+                    self.tar.addfile(tarinfo)
+            self.stats.add("dirs_written" if tarinfo.isdir() else "files_written")
+            self.stats.add("bytes_in", tarinfo.size)
+            self._names.add(tarinfo.name)
 
+        if not tarinfo.isdir():
             self._update_progressbar("write")
-        
-        else:
-            if create:
-                super().write(filename, arcname, compress_type, compresslevel)
-            
-            for file in sorted(os.listdir(filename)):
-                self._write(
-                    filename=os.path.join(filename, file),
-                    arcname=os.path.join(arcname, file),
-                    compress_type=compress_type,
-                    compresslevel=compresslevel
-                )
-    
-    def remove(self, member: zipfile.ZipInfo | str, pwd: bytes | None=None) -> bool:
-        '''
-        Remove a file or folder from the archive.
-        The archive must be open with mode 'a'
-        
-        CPython commit 659eb048cc9cac73c46349eb29845bc5cd630f09
+            return
 
-        Args:
-            member (zipfile.ZipInfo | str): Member
-            pwd (bytes | None): Password to decrypt files
+        with self.stats.phase("walk"):
+            files = sorted(os.listdir(filename))
+        self.stats.add("listdir_calls")
 
-        Raises:
-            RuntimeError: remove() requires mode 'a'
-            ValueError: Attempt to write to ZIP archive that was already closed
-            ValueError: Can't write to ZIP archive while an open writing handle exists.
+        for file in files:
+            self._write(
+                filename=os.path.join(filename, file),
+                arcname=f"{tarinfo.name}/{file}"
+            )
 
-        Returns:
-            bool: Whether it was removed or not. False means the file was in ignore.
-            For a folder, this means that there are files left inside it that are in ignore.
+    def remove(self, member, pwd=None) -> bool:
         '''
-        if self.mode != 'a':
-            raise RuntimeError("remove() requires mode 'a'")
-        if not self.fp:
-            raise ValueError(
-                "Attempt to write to ZIP archive that was already closed")
-        if self._writing:
-            raise ValueError(
-                "Can't write to ZIP archive while an open writing handle exists."
-            )
+        Tar archives can't be changed in place
+        '''
+        raise RuntimeError("remove() is not supported by tar archives")
 
-        # Make sure we have an info object
-        if isinstance(member, str):
-            # get the info object
-            member = self.getinfo(member)
 
-        if self.is_ignored(member.filename):
-            return False
+def file_crc32(filepath: str) -> int:
+    '''
+    Calculate CRC32 of a file, the same as zip uses
 
-        if self.progressbar and not self.renderingProcess.is_alive():
-            if self.useBarPrefix:
-                filename = os.path.basename(member.filename.rstrip("/"))
-                self.prefix.value = f"Removing \"{filename}\" : ".encode()
-            if not member.is_dir():
-                self.counter.value = -1
-                self.unit.value = b""
-            self._start_progressbar("remove")
+    Args:
+        filepath (str): Path to the file
 
-        removed = True
+    Returns:
+        int: CRC32
+    '''
+    crc = 0
 
-        if member.is_dir():
-            names = [ name for name in self.namelist() if member.filename in name ]
-            #  inverse to remove members from subdirectories first
-            dirs = []
-            files = []
-            for name in names:
-                if name.endswith("/"):
-                    dirs.insert(0, name)
-                else:
-                    files.insert(0, name)
-            #  duplicate files list
-            names = files.copy()
-            #  remove files first, then subdirectories
-            for file in files:
-                file = self.getinfo(file)
-                removedFile = self._remove_member(file, pwd)
-                #  if file in ignore, ignore whole subdirectory
-                if not removedFile:
-                    subdir = os.path.dirname(file.filename) + "/"
-                    if subdir in dirs:
-                        dirs.remove(subdir)
-                else:
-                    names.remove(file.filename)
-                removed &= removedFile
-            #  clean up empty subdirs
-            for subdir in dirs:
-                files = [ file for file in names if subdir in file ]
-                if not files:
-                    subdir = self.getinfo(subdir)
-                    self._remove_member(subdir, pwd)
-        else:
-            removed &= self._remove_member(member, pwd)
+    with open(filepath, "rb") as file:
+        while chunk := file.read(CHUNK_SIZE):
+            crc = zlib.crc32(chunk, crc)
 
-        self._finish_progressbar("remove")
-        return removed
+    return crc
 
-    def _remove_member(self, member: zipfile.ZipInfo, pwd: bytes | None=None) -> bool:
-        '''
-        Remove member from archive
 
-        Args:
-            member (zipfile.ZipInfo): Member
-            pwd (bytes | None): Password to decrypt files
+def parse_size(size: str) -> int:
+    '''
+    Parse size with optional K, M, G or T suffix
 
-        Returns:
-            bool: Whether it was removed or not. False means the file was in ignore.
-        '''
-        arcname = member.filename
+    Args:
+        size (str): Size, like 700M or 4G
 
-        #  Symlinks real name handling
-        if os.path.basename(arcname).startswith("__symlink__"):
-            with self.open(member, pwd=pwd) as source:
-                symlink = source.readline().decode()
-                filename = symlink.split(",")[0]
-            arcname = os.path.dirname(arcname)
-            arcname = f"{arcname}/{filename}"
-        
-        if self.is_ignored(arcname):
-            return False
+    Returns:
+        int: Size in bytes
+    '''
+    units = "KMGT"
+    size = size.strip().upper().removesuffix("B")
 
-        # get a sorted filelist by header offset, in case the dir order
-        # doesn't match the actual entry order
-        fp = self.fp
-        entry_offset = 0
-        filelist = sorted(self.filelist, key=attrgetter('header_offset'))
-        for i in range(len(filelist)):
-            info = filelist[i]
-            # find the target member
-            if info.header_offset < member.header_offset:
-                continue
+    if size and size[-1] in units:
+        return int(float(size[:-1]) * 1024 ** (units.index(size[-1]) + 1))
 
-            # get the total size of the entry
-            entry_size = None
-            if i == len(filelist) - 1:
-                entry_size = self.start_dir - info.header_offset
-            else:
-                entry_size = filelist[i + 1].header_offset - info.header_offset
+    return int(size)
 
-            # found the member, set the entry offset
-            if member == info:
-                entry_offset = entry_size
-                continue
 
-            # Move entry
-            # read the actual entry data
-            fp.seek(info.header_offset)
-            entry_data = fp.read(entry_size)
+def split_archive_extension(filename: str) -> tuple[str, str]:
+    '''
+    os.path.splitext that knows about .tar.gz and such
 
-            # update the header
-            info.header_offset -= entry_offset
+    Args:
+        filename (str): Filename
 
-            # write the entry to the new position
-            fp.seek(info.header_offset)
-            fp.write(entry_data)
-            fp.flush()
+    Returns:
+        tuple[str, str]: Name and extension
+    '''
+    lowered = filename.lower()
 
-        # update state
-        self.start_dir -= entry_offset
-        self.filelist.remove(member)
-        del self.NameToInfo[member.filename]
-        self._didModify = True
+    for extension in TarFile.EXTENSIONS:
+        if extension.count(".") > 1 and lowered.endswith(extension):
+            return filename[:-len(extension)], filename[-len(extension):]
 
-        # seek to the start of the central dir
-        fp.seek(self.start_dir)
+    return os.path.splitext(filename)
 
-        if not member.is_dir():
-            self._update_progressbar("remove")
-        
-        return True
 
+def open_archive(file: str | IO, mode: str="r", **kwargs) -> ZipFile | TarFile:
+    '''
+    Open ZipFile or TarFile depending on the extension
+
+    Args:
+        file (str | IO): Either the path to the file,
+            or a file-like object
+        mode (str, optional): File mode. Defaults to "r".
+        kwargs: Arguments of the archive class
+
+    Returns:
+        ZipFile | TarFile: Archive
+    '''
+    filename = file if isinstance(file, str) else getattr(file, "name", "")
+    extension = split_archive_extension(filename)[1].lower()
+
+    if extension in TarFile.EXTENSIONS:
+        return TarFile(file, mode, **kwargs)
+
+    return ZipFile(file, mode, **kwargs)
 
 if __name__ == "__main__":
-    import argparse    
+    import argparse
+    import cProfile
     parser = argparse.ArgumentParser(description="Zip File Archiver")
     parser.add_argument(
         "filepath",
-        help="path to zip, if file doesn't exist it will be created"
+        help=(
+            "path to zip or tar (.tar, .tar.gz, .tar.xz, .tar.bz2), "
+            "if file doesn't exist it will be created"
+        )
     )
     parser.add_argument(
         "-e",
@@ -1191,18 +3460,62 @@ if __name__ == "__main__":
         "--ignore",
         nargs="*",
         default=[],
-        help="filenames to ignore"
+        help="filenames or glob patterns to ignore: .git *.tmp build/ **/__pycache__"
     )
     parser.add_argument(
         "--overwrite-duplicates",
         action="store_true",
         help="overwrite file if it exists, when writing or extracting"
     )
+    parser.add_argument(
+        "--sync",
+        action="store_true",
+        help="when extracting, skip files identical to the ones on disk and overwrite the rest"
+    )
     parser.add_argument(
         "--symlinks-to-files",
         action="store_true",
         help="replace symbolic links with the files they point"
     )
+    parser.add_argument(
+        "--hash",
+        choices=sorted(
+            algorithm for algorithm in hashlib.algorithms_guaranteed
+            if not algorithm.startswith("shake")
+        ),
+        help="hash files while writing and store the hashes in the zip manifest"
+    )
+    parser.add_argument(
+        "--volume-size",
+        type=parse_size,
+        help=(
+            "split zip into volumes name.zip.001, name.zip.002 ... of this size (700M, 4000M) "
+            "when writing a new one, join them to open with other tools"
+        )
+    )
+    parser.add_argument(
+        "--deduplicate",
+        action="store_true",
+        help="write files with repeated content as references to the first copy in zip"
+    )
+    parser.add_argument(
+        "--journal",
+        action="store_true",
+        help="keep a journal while writing, rerun with it to resume an interrupted write"
+    )
+    parser.add_argument(
+        "--stats",
+        action="store_true",
+        help="print time of phases and counters of files, bytes and system calls"
+    )
+    parser.add_argument(
+        "--stats-json",
+        help="write stats to the json file"
+    )
+    parser.add_argument(
+        "--profile",
+        help="run under cProfile and write its stats to the file, view with pstats"
+    )
     parser.add_argument(
         "-v",
         "--verbose",
@@ -1225,15 +3538,48 @@ if __name__ == "__main__":
 
     if args.write or os.path.exists(args.filepath):
 
-        with ZipFile(
+        options = {}
+        mode = "a"
+
+        #  Compressed tar can only be read or written from scratch
+        extension = split_archive_extension(args.filepath)[1].lower()
+        if extension in TarFile.EXTENSIONS:
+            if args.journal:
+                print("journal: Only supported for .zip")
+            if args.hash or args.deduplicate:
+                print("hash, deduplicate: Only supported for .zip")
+            if args.volume_size:
+                print("volume-size: Only supported for .zip")
+            if args.remove:
+                print("remove: Only supported for .zip")
+                args.remove = None
+            if args.write and TarFile.EXTENSIONS[extension] and os.path.exists(args.filepath):
+                print(f"write: Can't append to compressed tar, only to .tar or a new {extension}")
+                args.write = None
+            if not args.write:
+                mode = "r"
+        else:
+            options["journal"] = args.journal
+            options["hashAlgorithm"] = args.hash
+            options["deduplicate"] = args.deduplicate
+            options["volumeSize"] = args.volume_size
+
+        if args.profile:
+            profiler = cProfile.Profile()
+            profiler.enable()
+
+        with open_archive(
             file=args.filepath,
-            mode="a",
+            mode=mode,
             preferredEncoding=args.preferred_encoding,
             ignore=args.ignore,
             overwriteDuplicates=args.overwrite_duplicates,
             symlinksToFiles=args.symlinks_to_files,
             progressbar=True,
-            clearBarAfterFinished=args.verbose
+            clearBarAfterFinished=args.verbose,
+            sync=args.sync,
+            stats=bool(args.stats or args.stats_json),
+            **options
         ) as zip:
 
             if args.extract:
@@ -1276,6 +3622,17 @@ if __name__ == "__main__":
                 if badfile:
                     print("The following enclosed file is corrupted: {!r}".format(badfile))
                 print("Done testing")
+
+        if args.profile:
+            profiler.disable()
+            profiler.dump_stats(args.profile)
+
+        if args.stats:
+            print(zip.stats.report())
+
+        if args.stats_json:
+            with open(args.stats_json, "w") as file:
+                json.dump(zip.stats.as_dict(), file, indent=4)
     
     else:
         print(f"open: File \"{args.filepath}\" doesn't exist")
@@ -0,0 +1,431 @@
+#!/usr/bin/env python3
+
+'''
+This file is part of 2trvl/2trvl
+Personal repository with scripts and configs
+Which is released under MIT License
+Copyright (c) 2022 Andrew Shteren
+---------------------------------------------
+             Archiver Benchmark
+---------------------------------------------
+Times archiver.ZipFile operations on synthetic
+trees under each compression and compares the
+results with a stored baseline
+
+'''
+import json
+import os
+import platform
+import random
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+import zipfile
+from typing import Callable
+
+from archiver import ZipFile
+
+#  Name : zipfile compression
+COMPRESSIONS = {
+    "stored": zipfile.ZIP_STORED,
+    "deflated": zipfile.ZIP_DEFLATED,
+    "bzip2": zipfile.ZIP_BZIP2,
+    "lzma": zipfile.ZIP_LZMA
+}
+#  Operations timed for every tree and compression
+OPERATIONS = ("write", "open", "list", "test", "extract", "remove")
+
+#  Names in legacy encodings, written without UTF-8 flag
+LEGACY_NAMES = {
+    "cp866": ("Документы", "отчёт", "Фото", "письмо", "счёт-фактура"),
+    "cp437": ("Ünterlagen", "café", "Größe", "señal", "naïve")
+}
+
+
+class LegacyZipInfo(zipfile.ZipInfo):
+    '''
+    ZipInfo that encodes the name with the given
+    encoding and doesn't set the UTF-8 flag, like
+    old archivers do
+    '''
+
+    def __init__(self, filename: str, encoding: str):
+        super().__init__(filename, time.localtime()[:6])
+        self.encoding = encoding
+
+    def _encodeFilenameFlags(self):
+        return self.filename.encode(self.encoding), self.flag_bits & ~0x800
+
+
+def random_bytes(rand: random.Random, size: int, compressible: bool) -> bytes:
+    '''
+    Generate file content
+
+    Args:
+        rand (random.Random): Seeded generator
+        size (int): Content size
+        compressible (bool): Text-like content or random bytes
+
+    Returns:
+        bytes: Content
+    '''
+    if not compressible:
+        return rand.randbytes(size)
+
+    words = [ rand.randbytes(rand.randint(2, 10)).hex().encode() for _ in range(256) ]
+    content = bytearray()
+    while len(content) < size:
+        content += b" ".join(rand.choices(words, k=64)) + b"\n"
+    return bytes(content[:size])
+
+
+def make_tiny_files(root: str, rand: random.Random, scale: float):
+    '''
+    Many small files in a few dirs
+    '''
+    for i in range(int(5000 * scale)):
+        dirname = os.path.join(root, f"dir{i % 50:02d}")
+        os.makedirs(dirname, exist_ok=True)
+        with open(os.path.join(dirname, f"file{i:05d}.txt"), "wb") as file:
+            file.write(random_bytes(rand, rand.randint(0, 4096), i % 2 == 0))
+
+
+def make_huge_files(root: str, rand: random.Random, scale: float):
+    '''
+    A few big files, half of them are incompressible
+    '''
+    os.makedirs(root)
+    size = int(64 * 1024 * 1024 * scale)
+    chunk = 1024 * 1024
+
+    for i in range(4):
+        with open(os.path.join(root, f"huge{i}.bin"), "wb") as file:
+            for offset in range(0, size, chunk):
+                file.write(random_bytes(rand, min(chunk, size - offset), i % 2 == 0))
+
+
+def make_deep_tree(root: str, rand: random.Random, scale: float):
+    '''
+    Long chains of nested dirs with a file on each level
+    '''
+    for branch in range(int(20 * scale) or 1):
+        dirname = os.path.join(root, f"branch{branch}")
+        for level in range(40):
+            dirname = os.path.join(dirname, f"level{level}")
+            os.makedirs(dirname)
+            with open(os.path.join(dirname, "file.txt"), "wb") as file:
+                file.write(random_bytes(rand, 256, True))
+
+
+def make_symlinks(root: str, rand: random.Random, scale: float):
+    '''
+    Files and dirs with many symlinks to them, some are broken
+    '''
+    targets = os.path.join(root, "targets")
+    links = os.path.join(root, "links")
+    os.makedirs(targets)
+    os.makedirs(links)
+
+    count = int(200 * scale) or 1
+    for i in range(count):
+        with open(os.path.join(targets, f"target{i}.txt"), "wb") as file:
+            file.write(random_bytes(rand, 1024, True))
+
+    for i in range(count * 5):
+        target = os.path.join(os.pardir, "targets", f"target{i % (count + count // 10)}.txt")
+        os.symlink(target, os.path.join(links, f"link{i}.txt"))
+    os.symlink(os.path.join(os.pardir, "targets"), os.path.join(links, "dir"), True)
+
+
+def make_legacy_archive(path: str, rand: random.Random, scale: float, compression: int):
+    '''
+    Archive with cp866 and cp437 names without UTF-8 flag,
+    these names go through the encoding guessing
+    '''
+    with zipfile.ZipFile(path, "w", compression) as archive:
+        for i in range(int(2000 * scale)):
+            encoding = "cp866" if i % 2 == 0 else "cp437"
+            dirname, filename = rand.sample(LEGACY_NAMES[encoding], 2)
+            zinfo = LegacyZipInfo(f"legacy/{dirname}/{filename} {i}.txt", encoding)
+            zinfo.compress_type = compression
+            archive.writestr(zinfo, random_bytes(rand, rand.randint(0, 2048), True))
+
+
+#  Tree name : generator, None means archive fixture
+TREES = {
+    "tiny": make_tiny_files,
+    "huge": make_huge_files,
+    "deep": make_deep_tree,
+    "symlinks": make_symlinks,
+    "legacy": None
+}
+
+
+def measure(function: Callable, repeat: int, setup: Callable | None=None) -> float:
+    '''
+    Median time of the function
+
+    Args:
+        function (Callable): Timed function
+        repeat (int): Number of runs
+        setup (Callable | None, optional): Untimed function
+            called before every run. Defaults to None.
+
+    Returns:
+        float: Median time in seconds
+    '''
+    times = []
+
+    for _ in range(repeat):
+        if setup:
+            setup()
+        start = time.perf_counter()
+        function()
+        times.append(time.perf_counter() - start)
+
+    return statistics.median(times)
+
+
+def benchmark_tree(
+    workdir: str,
+    tree: str,
+    compression: str,
+    repeat: int,
+    scale: float,
+    seed: int
+) -> dict[str, float]:
+    '''
+    Time operations on one tree with one compression
+
+    Args:
+        workdir (str): Temporary directory
+        tree (str): Name of tree from TREES
+        compression (str): Name of compression from COMPRESSIONS
+        repeat (int): Number of runs of each operation
+        scale (float): Multiplier of files count and sizes
+        seed (int): Seed of content generator
+
+    Returns:
+        dict[str, float]: Operation : median time in seconds
+    '''
+    results = {}
+    source = os.path.join(workdir, tree)
+    archivePath = os.path.join(workdir, f"{tree}.zip")
+    copyPath = os.path.join(workdir, f"{tree}.copy.zip")
+    extractPath = os.path.join(workdir, f"{tree}.extracted")
+    rand = random.Random(seed)
+
+    def clean(*paths: str):
+        for path in paths:
+            if os.path.isdir(path):
+                shutil.rmtree(path)
+            elif os.path.lexists(path):
+                os.remove(path)
+
+    def write():
+        with ZipFile(archivePath, "w", COMPRESSIONS[compression]) as archive:
+            archive.write(source, tree)
+
+    if TREES[tree]:
+        if not os.path.exists(source):
+            TREES[tree](source, rand, scale)
+        results["write"] = measure(write, repeat, lambda: clean(archivePath))
+    else:
+        make_legacy_archive(archivePath, rand, scale, COMPRESSIONS[compression])
+
+    def open_archive():
+        with ZipFile(archivePath, "r"):
+            pass
+
+    def list_archive():
+        with ZipFile(archivePath, "r") as archive:
+            with open(os.devnull, "w") as devnull:
+                archive.printdir(devnull)
+
+    def test():
+        with ZipFile(archivePath, "r") as archive:
+            archive.testzip()
+
+    def extract():
+        with ZipFile(archivePath, "r") as archive:
+            archive.extractall(extractPath)
+
+    def prepare_copy():
+        clean(copyPath)
+        shutil.copyfile(archivePath, copyPath)
+
+    def remove():
+        with ZipFile(copyPath, "a") as archive:
+            files = [ name for name in archive.namelist() if not name.endswith("/") ]
+            #  every 10th file, spread over the archive
+            for name in files[::10]:
+                archive.remove(name)
+
+    results["open"] = measure(open_archive, repeat)
+    results["list"] = measure(list_archive, repeat)
+    results["test"] = measure(test, repeat)
+    results["extract"] = measure(extract, repeat, lambda: clean(extractPath))
+    results["remove"] = measure(remove, repeat, prepare_copy)
+
+    clean(archivePath, copyPath, extractPath)
+    return results
+
+
+def run_benchmarks(
+    trees: list[str],
+    compressions: list[str],
+    repeat: int=3,
+    scale: float=1.0,
+    seed: int=0
+) -> dict:
+    '''
+    Run benchmarks, trees are generated once
+    in a temporary directory
+
+    Args:
+        trees (list[str]): Names of trees from TREES
+        compressions (list[str]): Names of compressions from COMPRESSIONS
+        repeat (int, optional): Number of runs of each operation,
+            median is taken. Defaults to 3.
+        scale (float, optional): Multiplier of files count and sizes.
+            Defaults to 1.0.
+        seed (int, optional): Seed of content generator, same seed
+            gives same trees. Defaults to 0.
+
+    Returns:
+        dict: Environment, parameters and {"tree/compression/operation": seconds}
+    '''
+    results = {}
+
+    with tempfile.TemporaryDirectory(prefix="archiver_benchmark_") as workdir:
+        for tree in trees:
+            for compression in compressions:
+                try:
+                    times = benchmark_tree(workdir, tree, compression, repeat, scale, seed)
+                except OSError as error:
+                    #  Symlinks require privileges on Windows
+                    print(f"{tree}: Skipped, {error}")
+                    break
+
+                for operation, seconds in times.items():
+                    key = f"{tree}/{compression}/{operation}"
+                    results[key] = seconds
+                    print(f"{key:<32} {seconds:>10.4f} s")
+
+            shutil.rmtree(os.path.join(workdir, tree), ignore_errors=True)
+
+    return {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "repeat": repeat,
+        "scale": scale,
+        "seed": seed,
+        "results": results
+    }
+
+
+def compare_results(current: dict, baseline: dict, threshold: float) -> list[str]:
+    '''
+    Compare results with baseline and print the ratios
+
+    Args:
+        current (dict): Result of run_benchmarks()
+        baseline (dict): Stored result of run_benchmarks()
+        threshold (float): Ratio to baseline considered a regression
+
+    Returns:
+        list[str]: Keys of regressed benchmarks
+    '''
+    regressions = []
+
+    if (current["scale"], current["seed"]) != (baseline["scale"], baseline["seed"]):
+        print("compare: Baseline was run with another scale or seed")
+
+    for key, seconds in current["results"].items():
+        if key not in baseline["results"]:
+            continue
+
+        ratio = seconds / max(baseline["results"][key], 1e-9)
+        mark = ""
+        if ratio > threshold:
+            mark = "  REGRESSION"
+            regressions.append(key)
+        elif ratio < 1 / threshold:
+            mark = "  faster"
+
+        print(f"{key:<32} {baseline['results'][key]:>10.4f} -> {seconds:>10.4f} s  x{ratio:.2f}{mark}")
+
+    return regressions
+
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="Archiver Benchmark")
+    parser.add_argument(
+        "--trees",
+        nargs="*",
+        choices=TREES,
+        default=list(TREES),
+        help="synthetic trees to benchmark"
+    )
+    parser.add_argument(
+        "--compressions",
+        nargs="*",
+        choices=COMPRESSIONS,
+        default=list(COMPRESSIONS),
+        help="compression methods to benchmark"
+    )
+    parser.add_argument(
+        "--repeat",
+        type=int,
+        default=3,
+        help="runs of each operation, median is taken"
+    )
+    parser.add_argument(
+        "--scale",
+        type=float,
+        default=1.0,
+        help="multiplier of files count and sizes, 0.1 for a quick run"
+    )
+    parser.add_argument(
+        "--seed",
+        type=int,
+        default=0,
+        help="seed of files content"
+    )
+    parser.add_argument(
+        "-o",
+        "--output",
+        help="write results to the json file"
+    )
+    parser.add_argument(
+        "-b",
+        "--baseline",
+        help="json file with results to compare with"
+    )
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=1.2,
+        help="slowdown ratio considered a regression"
+    )
+    args = parser.parse_args()
+
+    current = run_benchmarks(args.trees, args.compressions, args.repeat, args.scale, args.seed)
+
+    if args.output:
+        with open(args.output, "w") as file:
+            json.dump(current, file, indent=4)
+
+    if args.baseline:
+        with open(args.baseline, "r") as file:
+            baseline = json.load(file)
+
+        print()
+        regressions = compare_results(current, baseline, args.threshold)
+
+        if regressions:
+            print(f"{len(regressions)} regressions over x{args.threshold}")
+            sys.exit(1)
@@ -0,0 +1,380 @@
+#!/usr/bin/env python3
+
+'''
+This file is part of 2trvl/2trvl
+Personal repository with scripts and configs
+Which is released under MIT License
+Copyright (c) 2022 Andrew Shteren
+---------------------------------------------
+               Backup Catalog
+---------------------------------------------
+Indexes contents of many backup archives into
+one SQLite database to quickly find which of
+them contains the file and extract it
+
+'''
+import os
+import sqlite3
+import time
+import zipfile
+
+from archiver import TarFile, VolumeFile, open_archive, split_archive_extension
+
+#  Older catalogs are dropped and indexed again
+SCHEMA_VERSION = 2
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS archives (
+    id INTEGER PRIMARY KEY,
+    path TEXT NOT NULL UNIQUE,
+    size INTEGER NOT NULL,
+    mtime INTEGER NOT NULL,
+    indexed REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS members (
+    archive INTEGER NOT NULL REFERENCES archives(id) ON DELETE CASCADE,
+    name TEXT NOT NULL,
+    basename TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    crc INTEGER,
+    mtime TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS members_name ON members(name);
+CREATE INDEX IF NOT EXISTS members_basename ON members(basename);
+CREATE INDEX IF NOT EXISTS members_crc ON members(crc);
+CREATE INDEX IF NOT EXISTS members_archive ON members(archive);
+'''
+
+#  Extensions of archives to look for in dirs
+ARCHIVE_EXTENSIONS = { ".zip", *TarFile.EXTENSIONS }
+
+
+class Catalog():
+
+    def __init__(self, database: str="catalog.db", preferredEncoding: str="cp866"):
+        '''
+        Catalog of archives contents
+
+        Only central directories of zip archives are read,
+        tar archives have no index and are read completely
+
+        Args:
+            database (str, optional): Path to SQLite database.
+                Defaults to "catalog.db".
+            preferredEncoding (str, optional): Encoding to use
+                when guessing filenames original. Defaults to "cp866".
+        '''
+        self.database = database
+        self.preferredEncoding = preferredEncoding
+        self.connection = sqlite3.connect(database)
+        self.connection.execute("PRAGMA foreign_keys = ON")
+
+        version, = self.connection.execute("PRAGMA user_version").fetchone()
+        if version < SCHEMA_VERSION:
+            self.connection.executescript(
+                "DROP TABLE IF EXISTS members; DROP TABLE IF EXISTS archives;"
+            )
+        self.connection.executescript(SCHEMA)
+        self.connection.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+
+    def __enter__(self) -> "Catalog":
+        return self
+
+    def __exit__(self, excType, excValue, traceback):
+        self.close()
+
+    def __repr__(self) -> str:
+        return f"Catalog(database=\"{self.database}\")"
+
+    def close(self):
+        '''
+        Close the database
+        '''
+        self.connection.close()
+
+    @staticmethod
+    def find_archives(paths: list[str]) -> list[str]:
+        '''
+        Find archives among paths and in dirs recursively
+
+        Args:
+            paths (list[str]): Archives and dirs with them
+
+        Returns:
+            list[str]: Absolute paths of archives
+        '''
+        archives = []
+
+        for path in paths:
+            if os.path.isdir(path):
+                for root, dirs, files in os.walk(path):
+                    for file in files:
+                        #  Split zip is found by its first volume
+                        if file.endswith(".001"):
+                            file = file[:-4]
+                        if split_archive_extension(file)[1].lower() in ARCHIVE_EXTENSIONS:
+                            archives.append(os.path.abspath(os.path.join(root, file)))
+            elif os.path.isfile(path) or VolumeFile.find_volumes(path):
+                archives.append(os.path.abspath(path))
+
+        return archives
+
+    def update(self, paths: list[str]) -> tuple[int, int]:
+        '''
+        Index archives that are new or changed since last update
+
+        Args:
+            paths (list[str]): Archives and dirs with them
+
+        Returns:
+            tuple[int, int]: Number of indexed and skipped archives
+        '''
+        indexed = 0
+        skipped = 0
+
+        for path in self.find_archives(paths):
+            #  Last volume of split zip changes with it
+            stats = os.stat((VolumeFile.find_volumes(path) or [path])[-1])
+            row = self.connection.execute(
+                "SELECT size, mtime FROM archives WHERE path = ?",
+                (path,)
+            ).fetchone()
+
+            if row == (stats.st_size, stats.st_mtime_ns):
+                skipped += 1
+                continue
+
+            try:
+                members = list(self._read_members(path))
+            except (zipfile.BadZipFile, OSError, EOFError) as error:
+                print(f"update: Can't read \"{path}\": {error}")
+                continue
+
+            with self.connection:
+                self.connection.execute("DELETE FROM archives WHERE path = ?", (path,))
+                archive = self.connection.execute(
+                    "INSERT INTO archives (path, size, mtime, indexed) VALUES (?, ?, ?, ?)",
+                    (path, stats.st_size, stats.st_mtime_ns, time.time())
+                ).lastrowid
+                self.connection.executemany(
+                    "INSERT INTO members VALUES (?, ?, ?, ?, ?, ?)",
+                    ( (archive, *member) for member in members )
+                )
+
+            indexed += 1
+
+        return indexed, skipped
+
+    def _read_members(self, path: str):
+        '''
+        Read members of the archive
+
+        Args:
+            path (str): Path to the archive
+
+        Symlinks and duplicates of zip are indexed under
+        their real names, duplicates with size and CRC32
+        of the original
+
+        Yields:
+            tuple: name, basename, size, crc, mtime
+        '''
+        with open_archive(path, "r", preferredEncoding=self.preferredEncoding) as archive:
+            if isinstance(archive, TarFile):
+                for member in archive.getmembers():
+                    name = archive._member_name(member)
+                    yield (
+                        name,
+                        os.path.basename(name.rstrip("/")),
+                        member.size,
+                        None,
+                        time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(member.mtime))
+                    )
+                return
+
+            for member in archive.infolist():
+                if member.filename == archive.MANIFEST_NAME:
+                    continue
+
+                name, symlink, content = archive.resolve_member(member)
+                name = name.lstrip("/")
+
+                #  Duplicates are written later than their files
+                if member.filename in archive.manifest:
+                    mtime = time.localtime(archive.manifest[member.filename]["mtime"])
+                    mtime = time.strftime("%Y-%m-%d %H:%M:%S", mtime)
+                else:
+                    mtime = "%d-%02d-%02d %02d:%02d:%02d" % member.date_time
+
+                yield (
+                    name,
+                    os.path.basename(name.rstrip("/")),
+                    0 if symlink else content.file_size,
+                    None if symlink else content.CRC,
+                    mtime
+                )
+
+    def prune(self) -> int:
+        '''
+        Forget archives that no longer exist
+
+        Returns:
+            int: Number of removed archives
+        '''
+        paths = [
+            path for path, in self.connection.execute("SELECT path FROM archives")
+            if not (os.path.isfile(path) or VolumeFile.find_volumes(path))
+        ]
+
+        with self.connection:
+            self.connection.executemany(
+                "DELETE FROM archives WHERE path = ?",
+                ( (path,) for path in paths )
+            )
+
+        return len(paths)
+
+    def find(self, pattern: str | None=None, crc: int | None=None) -> list[tuple]:
+        '''
+        Find members by name and checksum
+
+        Args:
+            pattern (str | None, optional): Glob pattern (*, ?, [])
+                or path. A name without slashes is matched against
+                member basenames, a path against the end of member
+                names. Defaults to None.
+            crc (int | None, optional): CRC32 of the file.
+                Defaults to None.
+
+        Returns:
+            list[tuple]: archive, name, size, crc, mtime
+        '''
+        conditions = []
+        params = []
+
+        if pattern:
+            column = "basename" if "/" not in pattern.rstrip("/") else "name"
+
+            if any(char in pattern for char in "*?["):
+                conditions.append(f"{column} GLOB ?")
+                params.append(pattern)
+            elif column == "basename":
+                conditions.append("basename = ?")
+                params.append(pattern.rstrip("/"))
+            else:
+                escaped = pattern.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+                conditions.append("(name = ? OR name LIKE ? ESCAPE '\\')")
+                params.extend((pattern, f"%/{escaped}"))
+
+        if crc is not None:
+            conditions.append("crc = ?")
+            params.append(crc)
+
+        query = (
+            "SELECT archives.path, name, members.size, crc, members.mtime "
+            "FROM members JOIN archives ON archives.id = members.archive"
+        )
+        if conditions:
+            query += " WHERE " + " AND ".join(conditions)
+        query += " ORDER BY archives.path, name"
+
+        return self.connection.execute(query, params).fetchall()
+
+    def extract(self, results: list[tuple], path: str | None=None) -> list[str]:
+        '''
+        Extract found members from their archives,
+        each archive is opened once
+
+        Args:
+            results (list[tuple]): Result of find()
+            path (str | None, optional): Directory to extract to.
+                Defaults to the current working directory.
+
+        Returns:
+            list[str]: Extracted paths
+        '''
+        archives = {}
+        for archivePath, name, *_ in results:
+            archives.setdefault(archivePath, []).append(name)
+
+        extracted = []
+
+        for archivePath, names in archives.items():
+            with open_archive(archivePath, "r", preferredEncoding=self.preferredEncoding) as archive:
+                #  Zip members of symlinks and duplicates have other names
+                if not isinstance(archive, TarFile):
+                    names = set(names)
+                    names = [
+                        member.filename for member in archive.infolist()
+                        if archive.resolve_member(member)[0].lstrip("/") in names
+                    ]
+                for name in names:
+                    extracted.append(archive.extract(name, path))
+
+        return extracted
+
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="Backup Catalog")
+    parser.add_argument(
+        "-d",
+        "--database",
+        default="catalog.db",
+        help="path of catalog database"
+    )
+    parser.add_argument(
+        "-u",
+        "--update",
+        nargs="*",
+        help="archives or dirs with archives to index, unchanged ones are skipped"
+    )
+    parser.add_argument(
+        "--prune",
+        action="store_true",
+        help="forget archives that no longer exist"
+    )
+    parser.add_argument(
+        "-f",
+        "--find",
+        help="name, path or glob pattern of files to find"
+    )
+    parser.add_argument(
+        "--crc",
+        help="crc32 of files to find, in hex"
+    )
+    parser.add_argument(
+        "-x",
+        "--extract",
+        nargs="?",
+        const=os.curdir,
+        help="extract found files to the directory, the current one by default"
+    )
+    parser.add_argument(
+        "--preferred-encoding",
+        default="cp866",
+        help="encoding to use when guessing zip filenames original"
+    )
+    args = parser.parse_args()
+
+    with Catalog(args.database, args.preferred_encoding) as catalog:
+
+        if args.update:
+            indexed, skipped = catalog.update(args.update)
+            print(f"( indexed: {indexed}, unchanged: {skipped} )")
+
+        if args.prune:
+            print(f"( pruned: {catalog.prune()} )")
+
+        if args.find or args.crc:
+            crc = int(args.crc, 16) if args.crc else None
+            results = catalog.find(args.find, crc)
+
+            for archivePath, name, size, crc, mtime in results:
+                crc = f"{crc:08x}" if crc is not None else "-" * 8
+                print(f"{archivePath} : {name}  {size}  {mtime}  {crc}")
+
+            if not results:
+                print("No files found")
+            elif args.extract:
+                for filepath in catalog.extract(results, args.extract):
+                    print(f"Extracted {filepath}")
@@ -13,537 +13,2683 @@ compares them with the current state located
 at BACKUP_DESTINATION
 
 '''
+import abc
+import array
+import bisect
+import contextlib
+import csv
+import ctypes
+import ctypes.util
+import errno
 import filecmp
+import hashlib
+import json
 import multiprocessing
 import os
+import select
 import shutil
-import tempfile
-from itertools import filterfalse
-from typing import IO
+import sqlite3
+import stat
+import struct
+import threading
+import time
+import zipfile
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from typing import IO, Callable, Iterable, Iterator
+
+from widgets import clear_terminal
+from archiver import (
+    CHUNK_SIZE,
+    IOScheduler,
+    IgnorePatterns,
+    ProgressBar,
+    TarFile,
+    VolumeFile,
+    ZipFile,
+    file_crc32,
+    open_archive,
+    split_archive_extension
+)
+
+HASH_CACHE_SCHEMA = '''
+CREATE TABLE IF NOT EXISTS hashes (
+    device INTEGER NOT NULL,
+    inode INTEGER NOT NULL,
+    size INTEGER NOT NULL,
+    mtime INTEGER NOT NULL,
+    ctime INTEGER NOT NULL,
+    crc INTEGER NOT NULL,
+    path TEXT NOT NULL,
+    PRIMARY KEY (device, inode)
+);
+'''
+
+#  Files compared by cmpfiles threads between waits
+CMPFILES_BATCH = 4096
+
+#  Tiers of files comparison, from the fastest
+COMPARISON_MODES = ("stat", "sample", "full", "verify")
+#  Bytes of head, middle and tail read in sample mode
+SAMPLE_SIZE = 64 * 1024
+#  Files compared in blocks of LARGE_BLOCK_SIZE
+LARGE_FILE_SIZE = 64 * 1024 * 1024
+LARGE_BLOCK_SIZE = 8 * 1024 * 1024
+#  Granularity of changed ranges of modified files
+RANGES_BLOCK_SIZE = 64 * 1024
+#  Bytes of changed range searched byte by byte
+#  for moved data, then the search goes by blocks
+RANGES_MAX_ROLL = 16 * RANGES_BLOCK_SIZE
+#  Member of delta archive with removed paths and state
+DELTA_INFO_NAME = "__delta__"
+#  Deltas are named backup.delta-YYYYmmdd-HHMMSS.zip
+DELTA_SUFFIX = ".delta-"
+#  Seconds of mtime precision, FAT has 2
+MTIME_PRECISION = 2
+
+CHANGE_JOURNAL_SCHEMA = '''
+CREATE TABLE IF NOT EXISTS changes (
+    path TEXT PRIMARY KEY,
+    time REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS journal (
+    key TEXT PRIMARY KEY,
+    value
+);
+'''
+
+
+class HashCache():
+
+    def __init__(self, database: str):
+        '''
+        Persistent CRC32 of files keyed by (device, inode, size,
+        mtime_ns, ctime_ns), so unchanged files are not read again.
+        Can be shared by comparisons running in threads
+
+        Args:
+            database (str): Path to SQLite database
+        '''
+        self.database = database
+        self.connection = sqlite3.connect(database, check_same_thread=False)
+        self.connection.executescript(HASH_CACHE_SCHEMA)
+        self.lock = threading.Lock()
+        #  (device, inode) looked up or stored in this session
+        self.seen = set()
+        self.hits = 0
+        self.misses = 0
+
+    def __enter__(self) -> "HashCache":
+        return self
+
+    def __exit__(self, excType, excValue, traceback):
+        self.close()
+
+    def __repr__(self) -> str:
+        return f"HashCache(database=\"{self.database}\")"
+
+    def close(self):
+        '''
+        Save changes and close the database
+        '''
+        with self.lock:
+            self.connection.commit()
+            self.connection.close()
+
+    @staticmethod
+    def key(path: str, stats: os.stat_result | None=None) -> tuple[int, ...]:
+        '''
+        Cache key of the file
+
+        Args:
+            path (str): Path to the file
+            stats (os.stat_result | None, optional): Stats of the
+                file, if already known. Defaults to None.
+
+        Returns:
+            tuple[int, ...]: device, inode, size, mtime_ns, ctime_ns
+        '''
+        #  DirEntry.stat() on Windows has no inode
+        if stats is None or not stats.st_ino:
+            stats = os.stat(path)
+        return stats.st_dev, stats.st_ino, stats.st_size, stats.st_mtime_ns, stats.st_ctime_ns
+
+    def lookup(self, key: tuple[int, ...]) -> int | None:
+        '''
+        Get CRC32 of the file if it hasn't changed
+
+        Args:
+            key (tuple[int, ...]): Result of key()
+
+        Returns:
+            int | None: CRC32 or None if unknown
+        '''
+        with self.lock:
+            self.seen.add(key[:2])
+            row = self.connection.execute(
+                "SELECT size, mtime, ctime, crc FROM hashes WHERE device = ? AND inode = ?",
+                key[:2]
+            ).fetchone()
+
+            if row and row[:3] == key[2:]:
+                self.hits += 1
+                return row[3]
+
+            self.misses += 1
+            return None
+
+    def store(self, path: str, key: tuple[int, ...], crc: int):
+        '''
+        Remember CRC32 of the file
+
+        Args:
+            path (str): Path to the file
+            key (tuple[int, ...]): Result of key()
+            crc (int): CRC32
+        '''
+        with self.lock:
+            self.seen.add(key[:2])
+            self.connection.execute(
+                "INSERT OR REPLACE INTO hashes VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (*key, crc, os.path.abspath(path))
+            )
+
+    def crc32(self, path: str, stats: os.stat_result | None=None) -> int:
+        '''
+        CRC32 of the file, read only if it's not in cache
+
+        Args:
+            path (str): Path to the file
+            stats (os.stat_result | None, optional): Stats of the
+                file, if already known. Defaults to None.
+
+        Returns:
+            int: CRC32
+        '''
+        key = self.key(path, stats)
+        crc = self.lookup(key)
+
+        if crc is None:
+            crc = file_crc32(path)
+            self.store(path, key, crc)
+
+        return crc
+
+    def prune(self, root: str) -> int:
+        '''
+        Forget files in root that were not used in this
+        session and no longer exist or were replaced
+
+        Args:
+            root (str): Directory path
+
+        Returns:
+            int: Number of removed entries
+        '''
+        root = os.path.join(os.path.abspath(root), "")
+        removed = []
+
+        with self.lock:
+            rows = self.connection.execute(
+                "SELECT device, inode, path FROM hashes"
+            ).fetchall()
+
+        for device, inode, path in rows:
+            if (device, inode) in self.seen or not path.startswith(root):
+                continue
+            try:
+                stats = os.stat(path)
+                if (stats.st_dev, stats.st_ino) == (device, inode):
+                    continue
+            except OSError:
+                pass
+            removed.append((device, inode))
+
+        with self.lock:
+            self.connection.executemany(
+                "DELETE FROM hashes WHERE device = ? AND inode = ?",
+                removed
+            )
+            self.connection.commit()
+
+        return len(removed)
+
+
+class ChangeJournal():
+
+    #  Seconds of mtime precision, FAT has 2
+    MARGIN = 2
+
+    def __init__(self, database: str):
+        '''
+        Paths of destination changed while it is watched,
+        with time of the last change
+
+        Paths are relative and separated with "/", dirs end
+        with it. A changed dir means its whole subtree
+
+        Args:
+            database (str): Path to SQLite database
+        '''
+        self.database = database
+        self.connection = sqlite3.connect(database)
+        self.connection.executescript(CHANGE_JOURNAL_SCHEMA)
+
+    def __enter__(self) -> "ChangeJournal":
+        return self
+
+    def __exit__(self, excType, excValue, traceback):
+        self.close()
+
+    def __repr__(self) -> str:
+        return f"ChangeJournal(database=\"{self.database}\")"
+
+    def close(self):
+        '''
+        Close the database
+        '''
+        self.connection.close()
+
+    def get(self, key: str):
+        '''
+        Value of the journal state: destination,
+        since, pid or overflow
+        '''
+        row = self.connection.execute(
+            "SELECT value FROM journal WHERE key = ?",
+            (key,)
+        ).fetchone()
+        return row[0] if row else None
+
+    def set(self, key: str, value):
+        '''
+        Change value of the journal state
+        '''
+        self.connection.execute(
+            "INSERT OR REPLACE INTO journal VALUES (?, ?)",
+            (key, value)
+        )
+
+    def start(self, destination: str):
+        '''
+        Start a new journal of the destination, changes
+        made before are unknown, so old ones are dropped
+
+        Args:
+            destination (str): Watched directory
+        '''
+        with self.connection:
+            self.connection.execute("DELETE FROM changes")
+            self.connection.execute("DELETE FROM journal")
+            self.set("destination", os.path.realpath(destination))
+            self.set("since", time.time())
+            self.set("pid", os.getpid())
+
+    def record(self, changes: dict[str, float]):
+        '''
+        Save changed paths
+
+        Args:
+            changes (dict[str, float]): Path : time of change
+        '''
+        with self.connection:
+            self.connection.executemany(
+                "INSERT OR REPLACE INTO changes VALUES (?, ?)",
+                changes.items()
+            )
+
+    def overflow(self):
+        '''
+        Mark that changes were lost, the journal
+        is useless for backups made before
+        '''
+        with self.connection:
+            self.set("overflow", time.time())
+
+    def stop(self):
+        '''
+        Mark that the destination is not watched anymore
+        '''
+        with self.connection:
+            self.connection.execute("DELETE FROM journal WHERE key = 'pid'")
+
+    def is_watched(self) -> bool:
+        '''
+        Check if the watcher is still running
+
+        Returns:
+            bool: Watcher process is alive
+        '''
+        pid = self.get("pid")
+        if pid is None:
+            return False
+        try:
+            os.kill(pid, 0)
+        except ProcessLookupError:
+            return False
+        except PermissionError:
+            pass
+        return True
+
+    def touched(self, destination: str, since: float) -> list[str] | None:
+        '''
+        Paths changed since the time
+
+        Args:
+            destination (str): Compared directory
+            since (float): Time of backup
+
+        Returns:
+            list[str] | None: Changed paths or None if the
+                journal doesn't cover all changes since then
+        '''
+        since -= self.MARGIN
+
+        if self.get("destination") != os.path.realpath(destination):
+            return None
+        if self.get("since") is None or self.get("since") > since:
+            return None
+        if (self.get("overflow") or 0) >= since or not self.is_watched():
+            return None
+
+        return [
+            path for path, in self.connection.execute(
+                "SELECT path FROM changes WHERE time >= ?",
+                (since,)
+            )
+        ]
+
+
+class Inotify():
+
+    #  Constants of <sys/inotify.h>
+    IN_MODIFY = 0x00000002
+    IN_CLOSE_WRITE = 0x00000008
+    IN_MOVED_FROM = 0x00000040
+    IN_MOVED_TO = 0x00000080
+    IN_CREATE = 0x00000100
+    IN_DELETE = 0x00000200
+    IN_DELETE_SELF = 0x00000400
+    IN_MOVE_SELF = 0x00000800
+    IN_Q_OVERFLOW = 0x00004000
+    IN_IGNORED = 0x00008000
+    IN_ONLYDIR = 0x01000000
+    IN_DONT_FOLLOW = 0x02000000
+    IN_ISDIR = 0x40000000
+    IN_CLOEXEC = 0o2000000
+
+    #  Events changing names or content
+    MASK = (
+        IN_MODIFY | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE
+        | IN_DELETE | IN_DELETE_SELF | IN_MOVE_SELF | IN_ONLYDIR | IN_DONT_FOLLOW
+    )
+
+    #  struct inotify_event without name
+    EVENT = struct.Struct("iIII")
+
+    def __init__(self):
+        '''
+        Linux inotify instance called through libc
+        '''
+        self.libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+        self.fd = self._check(self.libc.inotify_init1(self.IN_CLOEXEC))
+
+    def __enter__(self) -> "Inotify":
+        return self
+
+    def __exit__(self, excType, excValue, traceback):
+        self.close()
+
+    @staticmethod
+    def _check(result: int, path: str | None=None) -> int:
+        if result < 0:
+            error = ctypes.get_errno()
+            raise OSError(error, os.strerror(error), path)
+        return result
+
+    def close(self):
+        '''
+        Close the instance with all its watches
+        '''
+        os.close(self.fd)
+
+    def add_watch(self, path: str) -> int:
+        '''
+        Watch the directory
+
+        Args:
+            path (str): Directory path
+
+        Returns:
+            int: Watch descriptor
+        '''
+        return self._check(
+            self.libc.inotify_add_watch(self.fd, os.fsencode(path), self.MASK),
+            path
+        )
+
+    def rm_watch(self, wd: int):
+        '''
+        Stop watching, the descriptor gets IN_IGNORED
+        '''
+        self.libc.inotify_rm_watch(self.fd, wd)
+
+    def read(self, timeout: float) -> list[tuple[int, int, str]]:
+        '''
+        Read events waiting for them up to timeout
+
+        Args:
+            timeout (float): Seconds to wait
+
+        Returns:
+            list[tuple[int, int, str]]: Watch descriptor,
+                mask and filename of events
+        '''
+        if not select.select([self.fd], [], [], timeout)[0]:
+            return []
+
+        data = os.read(self.fd, 64 * 1024)
+        events = []
+        offset = 0
+
+        while offset < len(data):
+            wd, mask, cookie, length = self.EVENT.unpack_from(data, offset)
+            offset += self.EVENT.size
+            name = os.fsdecode(data[offset:offset + length].rstrip(b"\0"))
+            offset += length
+            events.append((wd, mask, name))
+
+        return events
+
+
+class DestinationWatcher():
+
+    def __init__(
+        self,
+        destination: str,
+        journal: ChangeJournal,
+        ignore: list[str]=[],
+        interval: float=1.0
+    ):
+        '''
+        Keeps the change journal of destination
+        using inotify watches on all its dirs
+
+        Args:
+            destination (str): Directory to watch
+            journal (ChangeJournal): Where to save changes
+            ignore (list[str], optional): Names or glob
+                patterns to ignore. Defaults to [].
+            interval (float, optional): Seconds between
+                journal writes. Defaults to 1.0.
+        '''
+        self.destination = destination
+        self.journal = journal
+        self.ignore = IgnorePatterns(ignore)
+        self.interval = interval
+        self.inotify = Inotify()
+        #  {wd: "dir name/"}, root is ""
+        self.watches = {}
+        self.pending = {}
+
+    def __repr__(self) -> str:
+        return (
+            "DestinationWatcher("
+            f"destination=\"{self.destination}\", "
+            f"journal={self.journal}, "
+            f"ignore={self.ignore.patterns}"
+            ")"
+        )
+
+    def add_tree(self, name: str):
+        '''
+        Watch the dir and its subdirs
+
+        Args:
+            name (str): Dir name relative to destination
+        '''
+        stack = [name]
+
+        while stack:
+            name = stack.pop()
+            try:
+                self.watches[self.inotify.add_watch(os.path.join(self.destination, name))] = name
+                with os.scandir(os.path.join(self.destination, name)) as scanner:
+                    for entry in scanner:
+                        if entry.is_dir(follow_symlinks=False) and not self.ignore.match(f"{name}{entry.name}/"):
+                            stack.append(f"{name}{entry.name}/")
+            except OSError as error:
+                if error.errno == errno.ENOSPC:
+                    raise OSError(
+                        error.errno,
+                        "Out of inotify watches, increase fs.inotify.max_user_watches",
+                        error.filename
+                    )
+                #  Removed while scanning, its parent has the event
+                if error.errno not in (errno.ENOENT, errno.ENOTDIR):
+                    raise
+
+    def remove_tree(self, name: str):
+        '''
+        Stop watching the dir and its subdirs
+
+        Args:
+            name (str): Dir name relative to destination
+        '''
+        for wd, watched in list(self.watches.items()):
+            if watched.startswith(name):
+                self.inotify.rm_watch(wd)
+                del self.watches[wd]
+
+    def handle(self, wd: int, mask: int, filename: str):
+        '''
+        Record the event into pending changes
+        '''
+        if mask & Inotify.IN_Q_OVERFLOW:
+            self.journal.overflow()
+            return
+
+        if wd not in self.watches:
+            return
+
+        parent = self.watches[wd]
+
+        if mask & Inotify.IN_IGNORED:
+            del self.watches[wd]
+            return
+
+        #  Event of the entry is in its parent, except the root
+        if mask & (Inotify.IN_DELETE_SELF | Inotify.IN_MOVE_SELF):
+            if not parent:
+                self.journal.overflow()
+            return
+
+        isDir = mask & Inotify.IN_ISDIR
+        name = f"{parent}{filename}{'/' if isDir else ''}"
+
+        if self.ignore.match(name):
+            return
+
+        self.pending[name] = time.time()
+
+        if isDir and mask & Inotify.IN_MOVED_FROM:
+            self.remove_tree(name)
+        elif isDir and mask & (Inotify.IN_CREATE | Inotify.IN_MOVED_TO):
+            self.add_tree(name)
+
+    def flush(self):
+        '''
+        Write pending changes to the journal
+        '''
+        if self.pending:
+            self.journal.record(self.pending)
+            self.pending = {}
+
+    def run(self):
+        '''
+        Watch the destination until interrupted
+        '''
+        self.add_tree("")
+        #  Journal covers changes after all dirs are watched
+        self.journal.start(self.destination)
+        flushed = time.monotonic()
+
+        try:
+            while True:
+                for event in self.inotify.read(self.interval):
+                    self.handle(*event)
+                if time.monotonic() - flushed >= self.interval:
+                    self.flush()
+                    flushed = time.monotonic()
+        finally:
+            self.flush()
+            self.journal.stop()
+            self.inotify.close()
+
+
+def scan_tree(
+    root: str,
+    ignore: IgnorePatterns,
+    names: list[str] | None=None
+) -> Iterator[tuple[str, str, os.DirEntry]]:
+    '''
+    Scan the directory recursively with os.scandir,
+    ignored dirs are pruned. Entries are yielded while
+    scanning, each dir before its contents
+
+    Args:
+        root (str): Directory path
+        ignore (IgnorePatterns): Patterns to ignore
+        names (list[str] | None, optional): Scan only these
+            names and subtrees of dirs among them, missing
+            ones are skipped. Defaults to None.
+
+    Yields:
+        tuple[str, str, os.DirEntry]: name, kind, entry. Names are
+            relative and separated with "/", dirs end with it. Kind
+            is "file", "dir", "link" or "other"
+    '''
+    stack = [""]
+    #  {"dir/": {"filename"}} of names to pick from dirs
+    wanted = None
+
+    if names is not None:
+        names = set(names)
+        stack = []
+        wanted = {}
+        for name in names:
+            if in_dirs(name, names, strict=True):
+                continue
+            parent, _, filename = name.rstrip("/").rpartition("/")
+            wanted.setdefault(f"{parent}/" if parent else "", set()).add(filename)
+
+    for prefix in [None] if wanted is None else wanted:
+        if prefix is not None:
+            stack = [prefix]
+
+        while stack:
+            prefix = stack.pop()
+            try:
+                scanner = os.scandir(os.path.join(root, prefix))
+            except (FileNotFoundError, NotADirectoryError):
+                if wanted is None:
+                    raise
+                continue
+
+            with scanner:
+                for entry in scanner:
+                    if wanted is not None and prefix in wanted and entry.name not in wanted[prefix]:
+                        continue
+                    if entry.is_symlink():
+                        kind, name = "link", f"{prefix}{entry.name}"
+                    elif entry.is_dir():
+                        kind, name = "dir", f"{prefix}{entry.name}/"
+                    elif entry.is_file():
+                        kind, name = "file", f"{prefix}{entry.name}"
+                    else:
+                        kind, name = "other", f"{prefix}{entry.name}"
+
+                    if ignore.match(name):
+                        continue
+
+                    yield name, kind, entry
+                    if kind == "dir":
+                        stack.append(name)
+
+
+def in_dirs(name: str, names: set[str], strict: bool=False) -> bool:
+    '''
+    Check if the name or one of its parent dirs is among names
+
+    Args:
+        name (str): Name separated with "/"
+        names (set[str]): Names, dirs end with "/"
+        strict (bool, optional): Check only parents.
+            Defaults to False.
+
+    Returns:
+        bool: Name is selected by names
+    '''
+    if not strict and name in names:
+        return True
+
+    parent = name.rstrip("/").rpartition("/")[0]
+    while parent:
+        if f"{parent}/" in names:
+            return True
+        parent = parent.rpartition("/")[0]
+
+    return False
+
+
+class PathTable():
+
+    #  Sides of entries
+    LEFT = 1
+    RIGHT = 2
+    #  Kinds of entries, 2 bits for each side
+    KINDS = ("file", "dir", "link", "other")
+    #  Results of comparison
+    SAME = 1
+    DIFF = 2
+    FUNNY = 3
+    MOVED = 4
+
+    def __init__(self):
+        '''
+        Compact store of compared names
+
+        Name components are interned in one list, entries
+        are indexes of parent entry and component in integer
+        arrays, sides and kinds of entries are bit flags in
+        a bytearray and results are in another one. Lookup
+        tables are only kept while adding, until freeze()
+
+        Entry 0 is the root. Names are separated with "/",
+        dir components end with it, so a dir and a file with
+        the same name are different entries
+        '''
+        self.components = [""]
+        self.parents = array.array("i", [-1])
+        self.entryComponents = array.array("i", [0])
+        #  Bits 0-1 are sides, 2-3 kind on left, 4-5 on right
+        self.flags = bytearray(1)
+        self.results = bytearray(1)
+        #  {left entry: right entry}
+        self.moves = {}
+
+        self._componentIds = {"": 0}
+        #  {parent << 32 | component: entry}
+        self._index = {}
+        #  {"dir/": entry}
+        self._dirs = {"": 0}
+
+    def __len__(self) -> int:
+        return len(self.flags) - 1
+
+    def __repr__(self) -> str:
+        return f"PathTable(entries={len(self)}, components={len(self.components)})"
+
+    def add(self, name: str) -> int:
+        '''
+        Find the entry or add it without sides,
+        missing parents are added too
+
+        Args:
+            name (str): Name separated with "/"
+
+        Returns:
+            int: Entry
+        '''
+        if name in self._dirs:
+            return self._dirs[name]
+
+        parentName, _, component = name.rstrip("/").rpartition("/")
+        parent = self.add(f"{parentName}/" if parentName else "")
+        if name.endswith("/"):
+            component += "/"
+
+        componentId = self._componentIds.setdefault(component, len(self.components))
+        if componentId == len(self.components):
+            self.components.append(component)
+
+        key = parent << 32 | componentId
+        entry = self._index.get(key)
+
+        if entry is None:
+            entry = self._index[key] = len(self.flags)
+            self.parents.append(parent)
+            self.entryComponents.append(componentId)
+            self.flags.append(0)
+            self.results.append(0)
+            if name.endswith("/"):
+                self._dirs[name] = entry
+
+        return entry
+
+    def set_side(self, entry: int, side: int, kind: str):
+        '''
+        Mark that the entry exists on the side
+
+        Args:
+            entry (int): Entry
+            side (int): LEFT or RIGHT
+            kind (str): One of KINDS
+        '''
+        self.flags[entry] |= side | self.KINDS.index(kind) << (2 if side == self.LEFT else 4)
+
+    def freeze(self):
+        '''
+        Drop lookup tables, entries can't be added anymore
+        '''
+        self._componentIds = None
+        self._index = None
+        self._dirs = None
+
+    def kind(self, entry: int, side: int) -> str | None:
+        '''
+        Kind of the entry on the side
+
+        Returns:
+            str | None: One of KINDS or None if it's missing
+        '''
+        flags = self.flags[entry]
+        if not flags & side:
+            return None
+        return self.KINDS[flags >> (2 if side == self.LEFT else 4) & 3]
+
+    def basename(self, entry: int) -> str:
+        '''
+        Last component of the entry name without slash
+        '''
+        return self.components[self.entryComponents[entry]].rstrip("/")
+
+    def name(self, entry: int) -> str:
+        '''
+        Full name of the entry
+
+        Args:
+            entry (int): Entry
+
+        Returns:
+            str: Name separated with "/"
+        '''
+        components = []
+        while entry > 0:
+            components.append(self.components[self.entryComponents[entry]])
+            entry = self.parents[entry]
+        return "".join(reversed(components))
+
+    def names(self, entries: Iterable[int]) -> list[str]:
+        '''
+        Full names of entries, names of parents are built once
+
+        Args:
+            entries (Iterable[int]): Entries
+
+        Returns:
+            list[str]: Names separated with "/"
+        '''
+        prefixes = { 0: "" }
+        names = []
+
+        for entry in entries:
+            parent = self.parents[entry]
+            if parent not in prefixes:
+                prefixes[parent] = self.name(parent)
+            names.append(prefixes[parent] + self.components[self.entryComponents[entry]])
+
+        return names
+
+    def entries(self, match: Callable[[int, int], bool]) -> Iterator[int]:
+        '''
+        Entries with matching flags and result
+
+        Args:
+            match (Callable[[int, int], bool]): Called with
+                flags and result of each entry
+
+        Yields:
+            int: Entry
+        '''
+        for entry, flags, result in zip(range(len(self.flags)), self.flags, self.results):
+            if entry and match(flags, result):
+                yield entry
+
+    def only(self, side: int) -> Iterator[int]:
+        '''
+        Entries only on the side, except moved
+
+        Args:
+            side (int): LEFT or RIGHT
+
+        Yields:
+            int: Entry
+        '''
+        return self.entries(lambda flags, result: flags & 3 == side and result != self.MOVED)
+
+
+class TreeComparison(abc.ABC):
+    '''
+    Common part of comparisons: results, progress bar
+    and names conversion
+
+    Results have the format of filecmp.dircmp, but recursive:
+    left_only and right_only are {"name": "path"}, diff_files,
+    same_files and funny_files are lists. Names are relative,
+    dirs end with os.sep. Files and dirs moved or renamed are
+    taken out of left_only and right_only into moved, which is
+    {"left name": "right name"}
+
+    Results are kept in a PathTable and built on access
+    '''
+
+    def _init_comparison(
+        self,
+        leftPath: str,
+        ignore: list[str],
+        progressbar: bool | ProgressBar,
+        hashCache: HashCache | None,
+        scheduler: IOScheduler | None,
+        names: list[str] | None,
+        mode: str
+    ):
+        '''
+        Set the options shared by all comparisons
+        and start progress bar if needed
+        '''
+        if mode not in COMPARISON_MODES:
+            raise ValueError(f"Comparison mode must be one of {', '.join(COMPARISON_MODES)}")
+
+        self.left = leftPath
+        self.mode = mode
+        self.ignore = IgnorePatterns(ignore)
+        self.progressbar = progressbar
+        self.hashCache = hashCache
+        self.scheduler = scheduler
+        self.names = set(names) if names is not None else None
+        self.table = PathTable()
+        #  {"name": offset} of first different byte, if known
+        self.diff_offsets = {}
+        #  {"name": (size, ranges)} of diff files, see find_ranges
+        self.diff_ranges = {}
+
+        #  Bar rendered by the caller
+        if isinstance(progressbar, ProgressBar):
+            pass
+        elif progressbar:
+            prefix = multiprocessing.Array("c", 1)
+            prefix.value = b""
+            self.counter = multiprocessing.Value("i", 0)
+            unit = multiprocessing.Array("c", 6)
+            unit.value = b"files"
+            self.finished = multiprocessing.Value("b", False)
+            self.renderingProcess = multiprocessing.Process(
+                target=ProgressBar(size=40, clearMode=True).start_rendering_mp,
+                args=(prefix, self.counter, unit, self.finished),
+                daemon=True
+            )
+            self.renderingProcess.start()
+
+    def __enter__(self) -> "TreeComparison":
+        return self
+
+    def __exit__(self, excType, excValue, traceback):
+        self.finish_progressbar()
+
+    @property
+    def left_only(self) -> dict[str, str]:
+        return {
+            self.to_name(name): os.path.join(self.left, self.to_name(name.rstrip("/")))
+            for name in self.table.names(self.table.only(PathTable.LEFT))
+        }
+
+    @property
+    def right_only(self) -> dict[str, str]:
+        return {
+            self.to_name(name): self.right_path(name)
+            for name in self.table.names(self.table.only(PathTable.RIGHT))
+        }
+
+    @property
+    def same_files(self) -> list[str]:
+        return self.results(PathTable.SAME)
+
+    @property
+    def diff_files(self) -> list[str]:
+        return self.results(PathTable.DIFF)
+
+    @property
+    def funny_files(self) -> list[str]:
+        return self.results(PathTable.FUNNY)
+
+    @property
+    def moved(self) -> dict[str, str]:
+        return dict(zip(
+            map(self.to_name, self.table.names(self.table.moves.keys())),
+            map(self.to_name, self.table.names(self.table.moves.values()))
+        ))
+
+    def results(self, result: int) -> list[str]:
+        '''
+        Names of entries with the result
+
+        Args:
+            result (int): PathTable.SAME, DIFF or FUNNY
+
+        Returns:
+            list[str]: Names
+        '''
+        return [
+            self.to_name(name)
+            for name in self.table.names(self.table.entries(lambda flags, entryResult: entryResult == result))
+        ]
+
+    @abc.abstractmethod
+    def right_path(self, name: str) -> str:
+        '''
+        Path of the right side with the name
+
+        Args:
+            name (str): Name separated with "/"
+
+        Returns:
+            str: Path
+        '''
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def right_files(self, names: list[str]) -> Iterator[tuple[str, IO[bytes]]]:
+        '''
+        Open files of the right side, unreadable are skipped
+
+        Args:
+            names (list[str]): Names of files
+
+        Yields:
+            tuple[str, IO[bytes]]: Name and file, closed
+                when the next one is opened
+        '''
+        raise NotImplementedError
+
+    def find_ranges(self, blockSize: int=RANGES_BLOCK_SIZE):
+        '''
+        Find byte ranges of diff files changed on the right
+        side and save them into diff_ranges, see changed_ranges
+
+        Args:
+            blockSize (int, optional): Granularity of ranges.
+                Defaults to RANGES_BLOCK_SIZE.
+        '''
+        for name, file in self.right_files(self.diff_files):
+            path = os.path.join(self.left, name)
+            with self.scheduler.reading(self.left, self.right_path("")) if self.scheduler else contextlib.nullcontext():
+                try:
+                    self.diff_ranges[name] = changed_ranges(path, file, blockSize)
+                except (zipfile.BadZipFile, OSError, EOFError):
+                    pass
+
+    def finish_progressbar(self):
+        '''
+        Finish progressbar if it exists
+        '''
+        if hasattr(self, "renderingProcess") and self.renderingProcess.is_alive():
+            with self.finished.get_lock():
+                self.finished.value = True
+            self.renderingProcess.join()
+
+    def update_progressbar(self):
+        '''
+        Increment compared files counter
+        '''
+        if isinstance(self.progressbar, ProgressBar):
+            self.progressbar.counter += 1
+        elif self.progressbar:
+            with self.counter.get_lock():
+                self.counter.value += 1
+
+    def path_crc32(self, root: str, path: str) -> int:
+        '''
+        CRC32 of the file from cache or read
+        with a slot of its device
+
+        Args:
+            root (str): Root of the tree with the file
+            path (str): File path
+
+        Returns:
+            int: CRC32
+        '''
+        with self.scheduler.reading(root) if self.scheduler else contextlib.nullcontext():
+            if self.hashCache:
+                return self.hashCache.crc32(path, os.stat(path))
+            return file_crc32(path)
+
+    def left_files(self) -> dict[int, tuple[int, Callable[[], int]]]:
+        '''
+        Left only files for move detection
+
+        Returns:
+            dict[int, tuple[int, Callable[[], int]]]: Entry :
+                size and CRC32 getter
+        '''
+        entries = [
+            entry for entry in self.table.only(PathTable.LEFT)
+            if self.table.kind(entry, PathTable.LEFT) == "file"
+        ]
+        files = {}
+
+        for entry, name in zip(entries, self.table.names(entries)):
+            path = os.path.join(self.left, self.to_name(name))
+            try:
+                files[entry] = os.stat(path).st_size, lambda path=path: self.path_crc32(self.left, path)
+            except OSError:
+                pass
+
+        return files
+
+    def detect_moves(
+        self,
+        leftFiles: dict[int, tuple[int, Callable[[], int]]],
+        rightFiles: dict[int, tuple[int, Callable[[], int]]]
+    ):
+        '''
+        Match left only and right only files by size and CRC32,
+        only files of colliding sizes are hashed. A dir is moved
+        if all its contents are moved into one dir, then its
+        contents are not listed separately
+
+        Args:
+            leftFiles (dict[int, tuple[int, Callable[[], int]]]):
+                Entries of left only files : size and CRC32 getter
+            rightFiles (dict[int, tuple[int, Callable[[], int]]]):
+                The same for right only files
+        '''
+        table = self.table
+
+        bySize = {}
+        for entry, (size, crc32) in rightFiles.items():
+            #  Empty files are all the same
+            if size:
+                bySize.setdefault(size, ([], []))[1].append(entry)
+        for entry, (size, crc32) in leftFiles.items():
+            if size in bySize:
+                bySize[size][0].append(entry)
+
+        def crc32s(entries: list[int], files: dict) -> dict[int, list[int]]:
+            buckets = {}
+            for entry in entries:
+                try:
+                    buckets.setdefault(files[entry][1](), []).append(entry)
+                except OSError:
+                    pass
+            return buckets
+
+        def by_basename(entries: list[int]) -> list[int]:
+            return sorted(entries, key=lambda entry: (table.basename(entry), table.name(entry)))
+
+        #  {left entry: right entry}
+        fileMoves = {}
+
+        for size, (lefts, rights) in bySize.items():
+            if not lefts:
+                continue
+            rightCrc32s = crc32s(rights, rightFiles)
+            for crc, entries in crc32s(lefts, leftFiles).items():
+                if crc in rightCrc32s:
+                    #  Copies are paired by basename first
+                    fileMoves.update(zip(by_basename(entries), by_basename(rightCrc32s[crc])))
+
+        if not fileMoves:
+            return
+
+        leftEntries = list(table.only(PathTable.LEFT))
+        leftOnly = dict(zip(table.names(leftEntries), leftEntries))
+        rightEntries = list(table.only(PathTable.RIGHT))
+        rightOnly = dict(zip(table.names(rightEntries), rightEntries))
+        leftNames = sorted(leftOnly)
+        rightNames = sorted(rightOnly)
+
+        def contents(names: list[str], directory: str) -> list[str]:
+            #  Names with the prefix are contiguous when sorted
+            start = bisect.bisect_right(names, directory)
+            end = bisect.bisect_left(names, directory[:-1] + chr(ord("/") + 1))
+            return names[start:end]
+
+        dirMoves = {}
+
+        for directory in leftNames:
+            if not directory.endswith("/"):
+                continue
+            if any(directory.startswith(moved) for moved in dirMoves):
+                continue
+
+            inside = contents(leftNames, directory)
+            files = [ name for name in inside if not name.endswith("/") ]
+            if not files or not all(leftOnly[name] in fileMoves for name in files):
+                continue
+
+            relative = files[0][len(directory):]
+            target = table.name(fileMoves[leftOnly[files[0]]])
+            if not target.endswith(f"/{relative}"):
+                continue
+            target = target[:-len(relative)]
+            if target not in rightOnly:
+                continue
+
+            expected = [ target + name[len(directory):] for name in inside ]
+            if all(table.name(fileMoves[leftOnly[name]]) == target + name[len(directory):] for name in files) \
+                    and sorted(expected) == contents(rightNames, target):
+                dirMoves[directory] = target
+
+        for directory, target in dirMoves.items():
+            table.moves[leftOnly[directory]] = rightOnly[target]
+            for name in [ directory, *contents(leftNames, directory) ]:
+                table.results[leftOnly[name]] = PathTable.MOVED
+            for name in [ target, *contents(rightNames, target) ]:
+                table.results[rightOnly[name]] = PathTable.MOVED
+
+        for entry, target in fileMoves.items():
+            if table.results[entry] != PathTable.MOVED and table.results[target] != PathTable.MOVED:
+                table.moves[entry] = target
+                table.results[entry] = table.results[target] = PathTable.MOVED
+
+    @staticmethod
+    def to_name(name: str) -> str:
+        '''
+        Convert name separated with "/" to os.sep
+
+        Args:
+            name (str): Name
+
+        Returns:
+            str: Converted name
+        '''
+        return name.replace("/", os.sep)
+
+
+class dircmp(TreeComparison):
+
+    def __init__(
+        self,
+        leftPath: str,
+        rightPath: str,
+        ignore: list[str]=None,
+        hide: list[str]=None,
+        progressbar: bool | ProgressBar=False,
+        workers: int | None=None,
+        hashCache: HashCache | None=None,
+        scheduler: IOScheduler | None=None,
+        names: list[str] | None=None,
+        mode: str="full"
+    ):
+        '''
+        Recursive directories comparison. Both trees are scanned
+        once into a PathTable, entries of the same name are joined
+        and files of the same size are compared by content
+
+        Args:
+            leftPath (str): Left directory path
+            rightPath (str): Right directory path
+            ignore (list[str], optional): Names or glob patterns
+                to ignore. Defaults to filecmp.DEFAULT_IGNORES.
+            hide (list[str], optional): Names to hide, the same
+                as ignore. Defaults to [os.curdir, os.pardir].
+            progressbar (bool | ProgressBar, optional): Render progress
+                bar with number of compared files, or count them in the
+                counter of ProgressBar rendered by the caller.
+                Defaults to False.
+            workers (int | None, optional): Number of threads comparing
+                files content. Defaults to ThreadPoolExecutor default.
+            hashCache (HashCache | None, optional): Compare files of the
+                same size by cached CRC32 instead of reading them.
+                Defaults to None.
+            scheduler (IOScheduler | None, optional): Limit concurrent
+                reads per device and read rotational disks in order of
+                inodes. Defaults to None.
+            names (list[str] | None, optional): Compare only these
+                names separated with "/" and subtrees of dirs among
+                them, e.g. from ChangeJournal. Defaults to None.
+            mode (str, optional): Files comparison tier, "stat",
+                "sample", "full" or "verify", see cmpfiles.
+                Defaults to "full".
+
+        If you use progressbar option on Windows - run your code in the
+        "if __name__ == '__main__'" statement
+        '''
+        if ignore is None:
+            ignore = filecmp.DEFAULT_IGNORES
+        if hide is None:
+            hide = [os.curdir, os.pardir]
+
+        self.right = rightPath
+        self.hide = hide
+        self.workers = workers
+
+        self._init_comparison(leftPath, [*ignore, *hide], progressbar, hashCache, scheduler, names, mode)
+
+        try:
+            self.compare()
+        except:
+            self.finish_progressbar()
+            raise
+
+    def __repr__(self) -> str:
+        return (
+            "dircmp("
+            f"leftPath=\"{self.left}\", "
+            f"rightPath=\"{self.right}\", "
+            f"ignore={self.ignore.patterns}, "
+            f"progressbar={self.progressbar}"
+            ")"
+        )
+
+    @property
+    def left_list(self) -> list[str]:
+        return self.filtered(lambda flags, result: flags & PathTable.LEFT)
+
+    @property
+    def right_list(self) -> list[str]:
+        return self.filtered(lambda flags, result: flags & PathTable.RIGHT)
+
+    @property
+    def left_only_dirs(self) -> dict[str, str]:
+        return { name: path for name, path in self.left_only.items() if name.endswith(os.sep) }
+
+    @property
+    def right_only_dirs(self) -> dict[str, str]:
+        return { name: path for name, path in self.right_only.items() if name.endswith(os.sep) }
+
+    @property
+    def common(self) -> list[str]:
+        return self.filtered(lambda flags, result: flags & 3 == 3)
+
+    @property
+    def common_dirs(self) -> list[str]:
+        return self.common_kinds(lambda left, right: left == right == "dir")
+
+    @property
+    def common_files(self) -> list[str]:
+        return self.common_kinds(lambda left, right: left == right == "file")
+
+    @property
+    def common_funny(self) -> list[str]:
+        return self.common_kinds(lambda left, right: left != right or left == "other")
+
+    def filtered(self, match: Callable[[int, int], bool]) -> list[str]:
+        '''
+        Names of entries with matching flags and result
+        '''
+        return [ self.to_name(name) for name in self.table.names(self.table.entries(match)) ]
+
+    def common_kinds(self, match: Callable[[str, str], bool]) -> list[str]:
+        '''
+        Names of common entries with matching kinds
+        '''
+        table = self.table
+        return self.filtered(
+            lambda flags, result: flags & 3 == 3 and match(
+                table.KINDS[flags >> 2 & 3],
+                table.KINDS[flags >> 4 & 3]
+            )
+        )
+
+    def right_path(self, name: str) -> str:
+        return os.path.join(self.right, self.to_name(name.rstrip("/")))
+
+    def right_files(self, names: list[str]) -> Iterator[tuple[str, IO[bytes]]]:
+        for name in names:
+            try:
+                file = open(os.path.join(self.right, name), "rb")
+            except OSError:
+                continue
+            with file:
+                yield name, file
+
+    def compare(self):
+        '''
+        Scan both trees into the table and compare
+        entries found on both sides
+        '''
+        table = self.table
+
+        for side, root in ((PathTable.LEFT, self.left), (PathTable.RIGHT, self.right)):
+            for name, kind, entry in scan_tree(root, self.ignore, self.names):
+                table.set_side(table.add(name), side, kind)
+
+        table.freeze()
+        commonFiles = []
+
+        for entry in table.entries(lambda flags, result: flags & 3 == 3):
+            leftKind = table.kind(entry, PathTable.LEFT)
+            rightKind = table.kind(entry, PathTable.RIGHT)
+
+            if leftKind != rightKind:
+                table.results[entry] = PathTable.DIFF
+            elif leftKind == "file":
+                commonFiles.append(entry)
+            elif leftKind == "link":
+                name = self.to_name(table.name(entry))
+                try:
+                    if os.readlink(os.path.join(self.left, name)) == os.readlink(os.path.join(self.right, name)):
+                        table.results[entry] = PathTable.SAME
+                    else:
+                        table.results[entry] = PathTable.DIFF
+                except OSError:
+                    table.results[entry] = PathTable.FUNNY
+            elif leftKind == "other":
+                table.results[entry] = PathTable.FUNNY
+
+        names = [ self.to_name(name) for name in table.names(commonFiles) ]
+        outcomes = cmpfiles(
+            a=self.left,
+            b=self.right,
+            common=names,
+            workers=self.workers,
+            hashCache=self.hashCache,
+            scheduler=self.scheduler,
+            callback=self.update_progressbar,
+            mode=self.mode,
+            offsets=self.diff_offsets
+        )
+        entries = dict(zip(names, commonFiles))
+        for result, files in zip((PathTable.SAME, PathTable.DIFF, PathTable.FUNNY), outcomes):
+            for name in files:
+                table.results[entries[name]] = result
+        del names, entries, outcomes
+
+        rightFiles = {}
+        entries = [
+            entry for entry in table.only(PathTable.RIGHT)
+            if table.kind(entry, PathTable.RIGHT) == "file"
+        ]
+        for entry, name in zip(entries, table.names(entries)):
+            path = self.right_path(name)
+            try:
+                rightFiles[entry] = os.stat(path).st_size, lambda path=path: self.path_crc32(self.right, path)
+            except OSError:
+                pass
+
+        self.detect_moves(self.left_files(), rightFiles)
+
+
+class archivecmp(TreeComparison):
+
+    def __init__(
+        self,
+        leftPath: str,
+        archivePath: str,
+        root: str | None=None,
+        preferredEncoding: str="cp866",
+        ignore: list[str]=[],
+        progressbar: bool | ProgressBar=False,
+        hashCache: HashCache | None=None,
+        scheduler: IOScheduler | None=None,
+        names: list[str] | None=None,
+        mode: str="full"
+    ):
+        '''
+        Compare directory with a zip or tar backup without
+        extracting it. Names, sizes and CRC32 of zip members
+        are taken from the central directory, files of the same
+        size are compared by CRC32 streamed from the directory.
+        Tar has no checksums, so its members are streamed too
+
+        Args:
+            leftPath (str): Directory path
+            archivePath (str): Zip or tar path
+            root (str | None, optional): Dir in the archive to compare
+                with leftPath. Defaults to the archive name without
+                extension if all members are in it, otherwise the
+                whole archive is compared.
+            preferredEncoding (str, optional): Encoding to use
+                when guessing archive filenames original.
+                Defaults to "cp866".
+            ignore (list[str], optional): Names or glob patterns
+                to ignore on both sides. Defaults to [].
+            progressbar (bool | ProgressBar, optional): Render progress
+                bar with number of compared files, or count them in the
+                counter of ProgressBar rendered by the caller.
+                Defaults to False.
+            hashCache (HashCache | None, optional): Take CRC32 of
+                unchanged directory files from cache. Defaults to None.
+            scheduler (IOScheduler | None, optional): Limit concurrent
+                reads of directory files per device. Defaults to None.
+            names (list[str] | None, optional): Compare only these
+                names separated with "/" and subtrees of dirs among
+                them, e.g. from ChangeJournal. Defaults to None.
+            mode (str, optional): "stat" compares sizes and mtimes
+                of members, other modes compare CRC32, members can't
+                be sampled without decompressing. Defaults to "full".
+
+        If you use progressbar option on Windows - run your code in the
+        "if __name__ == '__main__'" statement
+        '''
+        self.archivePath = archivePath
+        self.root = root
+        self.preferredEncoding = preferredEncoding
+
+        self._init_comparison(leftPath, ignore, progressbar, hashCache, scheduler, names, mode)
+
+        try:
+            self.compare()
+        except:
+            self.finish_progressbar()
+            raise
+
+    def __repr__(self) -> str:
+        return (
+            "archivecmp("
+            f"leftPath=\"{self.left}\", "
+            f"archivePath=\"{self.archivePath}\", "
+            f"ignore={self.ignore.patterns}, "
+            f"progressbar={self.progressbar}"
+            ")"
+        )
+
+    def right_path(self, name: str) -> str:
+        return self.archivePath
+
+    def right_files(self, names: list[str]) -> Iterator[tuple[str, IO[bytes]]]:
+        names = set(names)
+
+        #  Members are opened in the archive order, tar is a stream
+        with open_archive(self.archivePath, "r", preferredEncoding=self.preferredEncoding) as archive:
+            if isinstance(archive, TarFile):
+                members = self.tar_members(archive)
+            else:
+                members = self.zip_members(archive)
+
+            for name, kind, size, crc, mtime, link, read, member in members:
+                name = self.to_name(name)
+                if kind != "file" or name not in names:
+                    continue
+                try:
+                    file = archive.open(member)
+                except (OSError, KeyError):
+                    continue
+                with file:
+                    yield name, file
+
+    def compare(self):
+        '''
+        Read archive members one by one and compare
+        them with the directory entries
+        '''
+        table = self.table
+
+        for name, kind, entry in scan_tree(self.left, self.ignore, self.names):
+            table.set_side(table.add(name), PathTable.LEFT, kind)
+
+        #  {entry: (size, CRC32 getter)} of right only files
+        rightFiles = {}
+
+        with open_archive(self.archivePath, "r", preferredEncoding=self.preferredEncoding) as archive:
+            if isinstance(archive, TarFile):
+                members = self.tar_members(archive)
+            else:
+                members = self.zip_members(archive)
+
+            for name, kind, size, crc, mtime, link, read, member in members:
+                if self.ignore.match(name):
+                    continue
+                if self.names is not None and not in_dirs(name, self.names):
+                    continue
+
+                entry = table.add(name)
+                if table.flags[entry] & PathTable.RIGHT:
+                    continue
+
+                table.set_side(entry, PathTable.RIGHT, kind)
+
+                #  Archives may have no entries for dirs
+                parent = name.rstrip("/").rpartition("/")[0]
+                while parent:
+                    parentEntry = table.add(f"{parent}/")
+                    if table.flags[parentEntry] & PathTable.RIGHT:
+                        break
+                    if self.names is not None and not in_dirs(f"{parent}/", self.names):
+                        break
+                    table.set_side(parentEntry, PathTable.RIGHT, "dir")
+                    parent = parent.rpartition("/")[0]
+
+                leftKind = table.kind(entry, PathTable.LEFT)
+
+                if leftKind is None:
+                    if kind == "file":
+                        rightFiles[entry] = size, read if crc is None else lambda crc=crc: crc
+                    continue
+
+                if leftKind == "dir" and kind == "dir":
+                    continue
+
+                self.compare_entry(entry, name, leftKind, kind, size, crc, mtime, link, read)
+                self.update_progressbar()
+
+            table.freeze()
+
+            #  Tar members of colliding sizes are read from the archive
+            self.detect_moves(self.left_files(), rightFiles)
+
+    def compare_entry(
+        self,
+        entry: int,
+        name: str,
+        leftKind: str,
+        kind: str,
+        size: int,
+        crc: int | None,
+        mtime: float,
+        link: str | None,
+        read
+    ):
+        '''
+        Compare the directory entry with the archive member
+        and save the result into the table
+        '''
+        path = os.path.join(self.left, self.to_name(name))
+
+        if leftKind != kind:
+            self.table.results[entry] = PathTable.DIFF
+            return
+
+        try:
+            if kind == "link":
+                same = os.readlink(path) == link
+            elif kind == "file":
+                stats = os.stat(path)
+                same = stats.st_size == size
+                if same and self.mode == "stat":
+                    same = abs(stats.st_mtime - mtime) <= MTIME_PRECISION
+                elif same:
+                    #  Tar member is streamed only if needed
+                    if crc is None:
+                        crc = read()
+                    same = self.path_crc32(self.left, path) == crc
+            else:
+                self.table.results[entry] = PathTable.FUNNY
+                return
+        except OSError:
+            self.table.results[entry] = PathTable.FUNNY
+            return
+
+        self.table.results[entry] = PathTable.SAME if same else PathTable.DIFF
+
+    def zip_members(self, archive):
+        '''
+        Members of zip from the central directory
+
+        Yields:
+            tuple: name, kind, size, crc, mtime, link target,
+                None, ZipInfo of the content
+        '''
+        prefix = self.archive_root(archive.namelist())
+
+        for member in archive.infolist():
+            if member.filename == archive.MANIFEST_NAME or not member.filename.startswith(prefix):
+                continue
+
+            #  Symlinks and duplicates real name handling
+            name, symlink, member = archive.resolve_member(member)
+            name = name[len(prefix):]
+            #  Zip keeps local time
+            mtime = time.mktime(member.date_time + (0, 0, -1))
+
+            if not name.strip("/"):
+                continue
+            elif symlink:
+                yield name, "link", 0, None, mtime, symlink[0], None, member
+            elif name.endswith("/"):
+                yield name, "dir", 0, None, mtime, None, None, member
+            else:
+                yield name, "file", member.file_size, member.CRC, mtime, None, None, member
+
+    def tar_members(self, archive):
+        '''
+        Members of tar, read sequentially
+
+        Yields:
+            tuple: name, kind, size, None, mtime, link target,
+                function returning CRC32 of the member content,
+                TarInfo
+        '''
+        prefix = self.archive_root(archive.namelist())
+
+        def read(member):
+            crc = 0
+            with archive.tar.extractfile(member) as source:
+                while chunk := source.read(CHUNK_SIZE):
+                    crc = zlib.crc32(chunk, crc)
+            return crc
+
+        for member in archive.getmembers():
+            name = archive._member_name(member)
+            if not name.startswith(prefix) or not name[len(prefix):].strip("/"):
+                continue
+            name = name[len(prefix):]
+
+            if member.issym():
+                yield name, "link", 0, None, member.mtime, member.linkname, None, member
+            elif member.isdir():
+                yield name, "dir", 0, None, member.mtime, None, None, member
+            elif member.isreg() or member.islnk():
+                yield name, "file", member.size, None, member.mtime, None, lambda member=member: read(member), member
+            else:
+                yield name, "other", 0, None, member.mtime, None, None, member
+
+    def archive_root(self, names: list[str]) -> str:
+        '''
+        Prefix of the compared dir in archive
+
+        Args:
+            names (list[str]): Archive members names
+
+        Returns:
+            str: Prefix with trailing slash or empty string
+        '''
+        if self.root is not None:
+            return f"{self.root.strip('/')}/" if self.root.strip("/") else ""
+
+        return self.default_root(self.archivePath, names)
+
+    @staticmethod
+    def default_root(archivePath: str, names: list[str]) -> str:
+        '''
+        Prefix of the dir named as the archive
+        without extension, if all members are in it
+
+        Args:
+            archivePath (str): Zip or tar path
+            names (list[str]): Archive members names
+
+        Returns:
+            str: Prefix with trailing slash or empty string
+        '''
+        root = split_archive_extension(os.path.basename(archivePath))[0]
+        prefix = f"{root}/"
+
+        if all(name.startswith(prefix) for name in names if name != ZipFile.MANIFEST_NAME):
+            return prefix
+
+        return ""
+
+
+def cmpfiles(
+    a: str,
+    b: str,
+    common: list[str],
+    workers: int | None=None,
+    hashCache: HashCache | None=None,
+    scheduler: IOScheduler | None=None,
+    callback: Callable[[], None] | None=None,
+    mode: str="full",
+    offsets: dict[str, int] | None=None
+) -> tuple[list[str], list[str], list[str]]:
+    '''
+    filecmp.cmpfiles with shallow=False, but files of the same
+    size are compared in a thread pool with large reads,
+    biggest first, so the disks are kept busy
+
+    Modes of comparison of files with the same size:
+        stat: Same mtime, nothing is read
+        sample: Same head, middle and tail blocks
+        full: Same content, by CRC32 with hashCache
+        verify: Same samples, files with different
+            mtimes are compared by content then
+
+    Args:
+        a (str): Left directory path
+        b (str): Right directory path
+        common (list[str]): Names of files in both directories
+        workers (int | None, optional): Number of threads.
+            Defaults to ThreadPoolExecutor default.
+        hashCache (HashCache | None, optional): Compare by CRC32,
+            only files missing in cache are read. Defaults to None.
+        scheduler (IOScheduler | None, optional): Limit concurrent
+            reads per device, rotational disks are read in order
+            of inodes instead of biggest first. Defaults to None.
+        callback (Callable[[], None] | None, optional): Called
+            after each file is compared. Defaults to None.
+        mode (str, optional): One of COMPARISON_MODES.
+            Defaults to "full".
+        offsets (dict[str, int] | None, optional): Filled with
+            {"name": offset} of the first different byte of files
+            compared by content. Defaults to None.
+
+    Returns:
+        tuple[list[str], list[str], list[str]]: Same, different
+            and funny files, in the order of common
+    '''
+    if mode not in COMPARISON_MODES:
+        raise ValueError(f"Comparison mode must be one of {', '.join(COMPARISON_MODES)}")
+
+    outcomes = {}
+    jobs = []
+    #  {"name": (keys, crcs)} of files partially in cache
+    cached = {}
+    #  Names of files with different mtimes for verify mode
+    uncertain = set()
+
+    for name in common:
+        paths = os.path.join(a, name), os.path.join(b, name)
+        try:
+            stats = os.stat(paths[0]), os.stat(paths[1])
+        except OSError:
+            outcomes[name] = 2
+            continue
+
+        if not all(stat.S_ISREG(fileStats.st_mode) for fileStats in stats):
+            outcomes[name] = 1
+        elif stats[0].st_size != stats[1].st_size:
+            outcomes[name] = 1
+        elif mode == "stat":
+            outcomes[name] = int(abs(stats[0].st_mtime - stats[1].st_mtime) > MTIME_PRECISION)
+            if callback:
+                callback()
+        elif mode in ("sample", "verify"):
+            jobs.append((stats[0].st_size, (stats[0].st_ino, stats[1].st_ino), name))
+            if abs(stats[0].st_mtime - stats[1].st_mtime) > MTIME_PRECISION:
+                uncertain.add(name)
+        elif hashCache is None:
+            jobs.append((stats[0].st_size, (stats[0].st_ino, stats[1].st_ino), name))
+        else:
+            keys = [ HashCache.key(path, fileStats) for path, fileStats in zip(paths, stats) ]
+            crcs = [ hashCache.lookup(key) for key in keys ]
+            #  Both are in cache, no need to read
+            if None not in crcs:
+                outcomes[name] = int(crcs[0] != crcs[1])
+            else:
+                jobs.append((stats[0].st_size, (stats[0].st_ino, stats[1].st_ino), name))
+                cached[name] = keys, crcs
+
+    jobs.sort(reverse=True)
+    if scheduler:
+        #  Sort is stable, so the right side order wins
+        jobs = scheduler.order(a, jobs, key=lambda job: job[1][0])
+        jobs = scheduler.order(b, jobs, key=lambda job: job[1][1])
+
+    def compare_content(name: str, paths: tuple[str, str]) -> int:
+        try:
+            offset = first_difference(*paths)
+        except OSError:
+            return 2
+        if offset is None:
+            return 0
+        if offsets is not None:
+            offsets[name] = offset
+        return 1
+
+    def compare(name: str) -> int | list[int]:
+        paths = os.path.join(a, name), os.path.join(b, name)
+        with scheduler.reading(a, b) if scheduler else contextlib.nullcontext():
+            if mode in ("sample", "verify"):
+                outcome = cmpsample(*paths)
+                #  Different samples are certain, same ones are not
+                if outcome or mode == "sample" or name not in uncertain:
+                    return outcome
+                return compare_content(name, paths)
+            if hashCache is None:
+                return compare_content(name, paths)
+            #  Read only files missing in cache
+            try:
+                return [
+                    file_crc32(path) if crc is None else crc
+                    for path, crc in zip(paths, cached[name][1])
+                ]
+            except OSError:
+                return 2
+
+    with ThreadPoolExecutor(workers) as executor:
+        #  Futures are submitted in batches, a future per file is heavy
+        for start in range(0, len(jobs), CMPFILES_BATCH):
+            batch = jobs[start:start + CMPFILES_BATCH]
+            results = executor.map(compare, [ name for size, inodes, name in batch ])
+            for (size, inodes, name), outcome in zip(batch, results):
+                if isinstance(outcome, list):
+                    paths = os.path.join(a, name), os.path.join(b, name)
+                    for path, key, crc in zip(paths, cached[name][0], outcome):
+                        hashCache.store(path, key, crc)
+                    outcome = int(outcome[0] != outcome[1])
+                outcomes[name] = outcome
+                if callback:
+                    callback()
+
+    same, diff, funny = [], [], []
+    for name in common:
+        (same, diff, funny)[outcomes[name]].append(name)
+
+    return same, diff, funny
+
+
+def cmpfile(a: str, b: str) -> int:
+    '''
+    Compare content of files with the same size
+
+    Args:
+        a (str): First file path
+        b (str): Second file path
+
+    Returns:
+        int: 0 if same, 1 if different, 2 if can't be read
+    '''
+    try:
+        return int(first_difference(a, b) is not None)
+    except OSError:
+        return 2
+
+
+def first_difference(a: str, b: str) -> int | None:
+    '''
+    Find the first different byte of files with the same size
+
+    Both files are read with sequential access advice into
+    two reused buffers, large files in big aligned blocks.
+    Blocks are compared as bytearrays, which is memcmp, the
+    reading stops at the first different block
+
+    Args:
+        a (str): First file path
+        b (str): Second file path
+
+    Returns:
+        int | None: Offset of the byte or None if files are same
+    '''
+    if os.path.getsize(a) >= LARGE_FILE_SIZE:
+        blockSize = LARGE_BLOCK_SIZE
+    else:
+        blockSize = CHUNK_SIZE
+
+    first = bytearray(blockSize)
+    second = bytearray(blockSize)
+    offset = 0
+
+    with open(a, "rb", buffering=0) as fileA, open(b, "rb", buffering=0) as fileB:
+        if hasattr(os, "posix_fadvise"):
+            for file in (fileA, fileB):
+                os.posix_fadvise(file.fileno(), 0, 0, os.POSIX_FADV_SEQUENTIAL)
+
+        while True:
+            readA = readinto_full(fileA, first)
+            readB = readinto_full(fileB, second)
+
+            #  Last block
+            if readA < blockSize or readB < blockSize:
+                del first[readA:], second[readB:]
+                if first == second:
+                    return None
+                return offset + mismatch(first, second)
+
+            if first != second:
+                return offset + mismatch(first, second)
+
+            offset += blockSize
+
+
+def readinto_full(file: IO, buffer: bytearray) -> int:
+    '''
+    Fill the buffer from unbuffered file,
+    which may read less than requested
+
+    Returns:
+        int: Number of bytes read, less than
+            buffer size only at the end of file
+    '''
+    view = memoryview(buffer)
+    read = 0
+
+    while read < len(buffer):
+        size = file.readinto(view[read:])
+        if not size:
+            break
+        read += size
+
+    return read
+
+
+def mismatch(first: bytearray, second: bytearray) -> int:
+    '''
+    Index of the first different byte of buffers,
+    found by halving with slices comparison
+
+    Returns:
+        int: Index or length of the shorter buffer
+    '''
+    low, high = 0, min(len(first), len(second))
+
+    while high - low > 64:
+        middle = (low + high) // 2
+        if first[low:middle] == second[low:middle]:
+            low = middle
+        else:
+            high = middle
+
+    for index in range(low, high):
+        if first[index] != second[index]:
+            return index
+
+    return high
+
+
+def cmpsample(a: str, b: str) -> int:
+    '''
+    Compare head, middle and tail blocks of files
+    with the same size, small files are compared
+    completely
+
+    Args:
+        a (str): First file path
+        b (str): Second file path
+
+    Returns:
+        int: 0 if samples are same, 1 if different,
+            2 if can't be read
+    '''
+    try:
+        size = os.path.getsize(a)
+        if size <= 3 * SAMPLE_SIZE:
+            return cmpfile(a, b)
+
+        with open(a, "rb") as first, open(b, "rb") as second:
+            for offset in (0, (size - SAMPLE_SIZE) // 2, size - SAMPLE_SIZE):
+                first.seek(offset)
+                second.seek(offset)
+                if first.read(SAMPLE_SIZE) != second.read(SAMPLE_SIZE):
+                    return 1
+            return 0
+    except OSError:
+        return 2
+
+
+def changed_ranges(
+    basis: str,
+    target: IO[bytes],
+    blockSize: int=RANGES_BLOCK_SIZE
+) -> tuple[int, list[tuple[int, int]]]:
+    '''
+    Byte ranges of the target missing in the basis file,
+    searched like rsync does: full blocks of the basis are
+    indexed by Adler-32 and BLAKE2b, the target is read once
+
+    The block following the last found one is tried first,
+    so unchanged, appended and overwritten data costs a hash
+    per block. Otherwise the window is rolled byte by byte to
+    find data shifted by insertions, up to RANGES_MAX_ROLL
+    bytes of a range, then by blocks. So ranges of rewritten
+    files may be wider than changes, but never narrower
+
+    Args:
+        basis (str): Path of the old file
+        target (IO[bytes]): New content, read sequentially
+        blockSize (int, optional): Granularity of ranges.
+            Defaults to RANGES_BLOCK_SIZE.
+
+    Returns:
+        tuple[int, list[tuple[int, int]]]: Size of the target
+            and its (offset, length) ranges, the rest of the
+            target is found in the basis
+    '''
+    def digest(block: bytearray) -> bytes:
+        return hashlib.blake2b(block, digest_size=16).digest()
+
+    #  {Adler-32: {BLAKE2b: index}} of full blocks of the basis
+    signatures = {}
+    digests = []
+    #  Last short block, matched only at the end of the target
+    tail = b""
+
+    with open(basis, "rb") as file:
+        while block := file.read(blockSize):
+            if len(block) < blockSize:
+                tail = block
+                break
+            hashed = digest(block)
+            signatures.setdefault(zlib.adler32(block), {}).setdefault(hashed, len(digests))
+            digests.append(hashed)
+
+    readSize = max(CHUNK_SIZE, blockSize)
+    buffer = bytearray()
+    #  Offset of the buffer in the target
+    base = 0
+    position = 0
+    eof = False
+    #  Index of the basis block expected next
+    expected = 0
+    #  Offset where the current range starts
+    changed = None
+    ranges = []
+
+    while True:
+        #  Keep the window and the byte after it in the buffer
+        if len(buffer) - position <= blockSize and not eof:
+            del buffer[:position]
+            base += position
+            position = 0
+            while len(buffer) <= blockSize:
+                chunk = target.read(readSize)
+                if not chunk:
+                    eof = True
+                    break
+                buffer += chunk
+
+        if len(buffer) - position < blockSize:
+            break
+
+        window = buffer[position:position + blockSize]
+        hashed = digest(window)
+
+        if expected < len(digests) and digests[expected] == hashed:
+            match = expected
+        else:
+            weak = zlib.adler32(window)
+            match = signatures.get(weak, {}).get(hashed)
+
+        if match is None:
+            if changed is None:
+                changed = base + position
+
+            #  Rewritten data, search by blocks
+            if not signatures or base + position - changed >= RANGES_MAX_ROLL:
+                position += blockSize
+                continue
+            #  Nothing to roll in
+            if len(buffer) - position == blockSize:
+                position = len(buffer)
+                break
+
+            #  Adler-32 is sums of bytes and of their prefix sums
+            a, b = weak & 0xffff, weak >> 16
+            end = min(len(buffer) - blockSize, changed + RANGES_MAX_ROLL - base)
+
+            while position < end:
+                removed, added = buffer[position], buffer[position + blockSize]
+                a = (a - removed + added) % 65521
+                b = (b - blockSize * removed + a - 1) % 65521
+                position += 1
+
+                candidates = signatures.get(b << 16 | a)
+                if candidates:
+                    match = candidates.get(digest(buffer[position:position + blockSize]))
+                    if match is not None:
+                        break
+
+            if match is None:
+                continue
+
+        if changed is not None:
+            ranges.append((changed, base + position - changed))
+            changed = None
+
+        position += blockSize
+        expected = match + 1
+
+    size = base + len(buffer)
+    end = size
+    if tail and buffer.endswith(tail) and len(buffer) - position >= len(tail):
+        end -= len(tail)
+
+    if changed is None and base + position < end:
+        changed = base + position
+    if changed is not None and changed < end:
+        ranges.append((changed, end - changed))
+
+    return size, ranges
+
+
+def path_key(file: str) -> tuple[tuple[str, ...], str]:
+    '''
+    Sort key grouping files by dirs: files of a dir go
+    right after it and before its subdirs
+
+    Args:
+        file (str): Name, dirs end with os.sep
+
+    Returns:
+        tuple[tuple[str, ...], str]: Dir parts and filename,
+            empty for dirs
+    '''
+    dirname, filename = os.path.split(file)
+    return tuple(dirname.split(os.sep)) if dirname else (), filename
+
+
+def sorted_paths(files: list[str]) -> list[str]:
+    '''
+    Sort files by dirs
+
+    Args:
+        files (list[str]): Files to sort
 
-from archiver import ProgressBar, ZipFile
+    Returns:
+        list[str]: Sorted files
+    '''
+    return sorted(files, key=path_key)
 
-if os.name == "nt":
-    import ctypes
 
+def print_files(title: str, files: list[str] | dict[str, str], output: IO):
+    '''
+    Print files list
 
-class dircmp(filecmp.dircmp):
+    Args:
+        title (str): List title
+        files (list[str] | dict[str, str]): Files names
+            or {"old name": "new name"} of moved files
+        output (IO): Output source. Use sys.stdout for printing in terminal
+    '''
+    if not files:
+        return
 
-    def __init__(
-        self,
-        leftPath: str,
-        rightPath: str,
-        ignore: list[str]=None,
-        hide: list[str]=None,
-        subdirMode: bool=False,
-        leftBasePath: str="",
-        rightBasePath: str="",
-        progressbar: bool=False
-    ):
-        '''
-        Better dircmp with subdirs indexing
+    output.write(f"{title}:\n")
+    if isinstance(files, dict):
+        output.writelines(f"    {file} -> {files[file]}\n" for file in sorted_paths(files))
+    else:
+        output.writelines(f"    {file}\n" for file in sorted_paths(files))
 
-        Args:
-            leftPath (str): Left directory path
-            rightPath (str): Right directory path
-            ignore (list[str], optional): List of names to ignore.
-                Defaults to filecmp.DEFAULT_IGNORES.
-            hide (list[str], optional): List of names to hide.
-                Defaults to [os.curdir, os.pardir].
-            subdirMode (bool, optional): System argument indicating
-                that the current comparison is for a subdirectory.
-                Defaults to False.
-            leftBasePath (str, optional): System argument, points
-                to the root of the left directory. Needed to 
-                calculate names. Defaults to "".
-            rightBasePath (str, optional): System argument, points
-                to the root of the right directory. Needed to 
-                calculate names. Defaults to "".
-            progressbar (bool, optional): Render progress bar while
-                running or not. If True an object of type ProgressBar
-                is created, to stop it set the finished variable to True.
-                Defaults to False.
 
-        If you use progressbar option on Windows - run your code in the
-        "if __name__ == '__main__'" statement
+class ReportWriter():
+
+    #  Output formats
+    FORMATS = ("text", "jsonl", "csv")
+    #  Section title : status in jsonl and csv
+    SECTIONS = {
+        "New": "new",
+        "Modified": "modified",
+        "Removed": "removed",
+        "Moved": "moved",
+        "Error": "error"
+    }
+
+    def __init__(self, output: IO, format: str="text"):
         '''
-        super().__init__(leftPath, rightPath, ignore, hide)
-        self.subdirMode = subdirMode
-        
-        if not subdirMode:
-            self.leftBasePath = self.left
-            self.rightBasePath = self.right
-        else:
-            self.leftBasePath = leftBasePath
-            self.rightBasePath = rightBasePath
+        Report of compared backups, written section by section.
+        Each section is flushed once written, so the report can
+        be read while backups on other drives are compared
 
-        self.progressbar = progressbar
+        Text is for reading, jsonl has a record per file and a
+        summary record per backup, csv has a row per file.
+        Moved files have their old name in "source"
 
-        if progressbar:
-            prefix = multiprocessing.Array("c", 1)
-            prefix.value = b""
-            self.postfix = multiprocessing.Array("c", 11)
-            self.postfix.value = b"in process"
-            self.finished = multiprocessing.Value("b", False)
-            #  This class is designed in such way that when
-            #  accessing a variable, make multiple function
-            #  calls, so we omit counter, since it is impossible
-            #  to track number of indexed files for sure
-            self.renderingProcess = multiprocessing.Process(
-                target=ProgressBar(size=40, clearMode=True).start_rendering_mp,
-                args=(prefix, multiprocessing.Value("i", -1), self.postfix, self.finished),
-                daemon=True
-            )
-            self.renderingProcess.start()
+        Args:
+            output (IO): Text stream, open csv with newline=""
+            format (str, optional): "text", "jsonl" or "csv".
+                Defaults to "text".
+        '''
+        if format not in self.FORMATS:
+            raise ValueError(f"Report format must be one of {', '.join(self.FORMATS)}")
 
-    def __enter__(self) -> "dircmp":
-        return self
+        self.output = output
+        self.format = format
 
-    def __exit__(self, excType, excValue, traceback):
-        self.finish_progressbar()
+        if format == "csv":
+            self.csv = csv.writer(output)
+            self.csv.writerow(("destination", "backup", "status", "path", "source"))
 
     def __repr__(self) -> str:
-        return (
-            "dircmp("
-            f"leftPath=\"{self.left}\", "
-            f"rightPath=\"{self.right}\", "
-            f"ignore={self.ignore}, "
-            f"hide={self.hide}, "
-            f"progressbar={self.progressbar}"
-            ")"
-        )
-    
-    def finish_progressbar(self):
-        '''
-        Finish progressbar if it exists
-        '''
-        if hasattr(self, "renderingProcess"):
-            with (self.postfix.get_lock(), self.finished.get_lock()):
-                self.postfix.value = f"finished".encode()
-                self.finished.value = True
-            self.renderingProcess.join()
+        return f"ReportWriter(format=\"{self.format}\")"
 
-    def phase1(self):
-        '''
-        Compute common names but with subdirs
-        '''
-        left = dict(zip(map(os.path.normcase, self.left_list), self.left_list))
-        right = dict(zip(map(os.path.normcase, self.right_list), self.right_list))
-        self.common = list(map(left.__getitem__, filter(right.__contains__, left)))
-        self.left_only = list(map(left.__getitem__, filterfalse(right.__contains__, left)))
-        self.right_only = list(map(right.__getitem__, filterfalse(left.__contains__, right)))
-        
-        #  SubdirMode : Convert filenames to subdir/names
-        if self.subdirMode:
-            subdir = os.path.relpath(self.left, self.leftBasePath)
-            #  Need to access vars in this order
-            #  otherwise there will be errors
-            #  common needed for common_files
-            #  common_files needed for diff_files, funny_files
-            dircmp.join_subdir(subdir, self.left_only)
-            dircmp.join_subdir(subdir, self.right_only)
-            dircmp.join_subdir(subdir, self.left_list)
-            dircmp.join_subdir(subdir, self.right_list)
-            dircmp.join_subdir(subdir, self.diff_files)
-            dircmp.join_subdir(subdir, self.same_files)
-            dircmp.join_subdir(subdir, self.funny_files)
-            dircmp.join_subdir(subdir, self.common_files)
-            dircmp.join_subdir(subdir, self.common_funny)
-            dircmp.join_subdir(subdir, self.common)
-
-        #  Convert to format {"filename": "filepath"}
-        self.left_only = dircmp.list_to_dict(self.left_only, self.left)
-        self.right_only = dircmp.list_to_dict(self.right_only, self.right)
-
-        #  Recursively parse common dirs
-        for dir in self.common_dirs:
-            left = os.path.join(self.leftBasePath, dir)
-            right = os.path.join(self.rightBasePath, dir)
-            compared = dircmp(
-                leftPath=left,
-                rightPath=right,
-                subdirMode=True,
-                leftBasePath=self.leftBasePath,
-                rightBasePath=self.rightBasePath
-            )
-            #  Load subdirs values
-            self.left_only_dirs.update(compared.left_only_dirs)
-            self.right_only_dirs.update(compared.right_only_dirs)
-            self.left_only.update(compared.left_only)
-            self.right_only.update(compared.right_only)
-            #  Prevent adding same values when recursing
-            dircmp.update_list(compared.left_list, self.left_list)
-            dircmp.update_list(compared.right_list, self.right_list)
-            dircmp.update_list(compared.diff_files, self.diff_files)
-            dircmp.update_list(compared.same_files, self.same_files)
-            dircmp.update_list(compared.funny_files, self.funny_files)
-            dircmp.update_list(compared.common_dirs, self.common_dirs)
-            dircmp.update_list(compared.common_files, self.common_files)
-            dircmp.update_list(compared.common_funny, self.common_funny)
-            dircmp.update_list(compared.common, self.common)
-        
-        #  Force parse left_only_dirs and right_only_dirs
-        #  Cast dir names to dir/ format
-        if not self.common_dirs:
-            self.phase5()
-    
-    def phase2(self):
+    def write(
+        self,
+        destination: str,
+        backup: str,
+        sections: dict[str, list[str]],
+        details: dict[str, dict] | None=None
+    ):
         '''
-        Add conversion dir names to dir/ format
+        Write comparison of the backup
+
+        Args:
+            destination (str): Path of current state
+            backup (str): Path of backup
+            sections (dict[str, list[str] | dict[str, str]]): Title
+                from SECTIONS : files names, "Moved" is
+                {"old name": "new name"}
+            details (dict[str, dict] | None, optional): Extra
+                fields of files records in jsonl, e.g. offset
+                of the first different byte or changed ranges.
+                Defaults to None.
         '''
-        super().phase2()
-        common_dirs = {}
-        
-        dircmp.parse_dirs(
-            files=self.common_dirs,
-            rootPath=self.left,
-            dirs=common_dirs,
-            recursive=False,
-            basePath=self.leftBasePath
+        if details is None:
+            details = {}
+
+        summary = "( new: {}, modified: {}, removed: {}, moved: {} )".format(
+            len(sections["New"]),
+            len(sections["Modified"]),
+            len(sections["Removed"]),
+            len(sections["Moved"])
         )
-        
-        self.common_dirs = dircmp.dict_to_list(common_dirs)
-        
-        for dir in self.common_dirs:
-            oldDir = dir.split(os.sep)[-2]
-            self.common.remove(oldDir)
-            self.common.append(dir)
 
-            oldDir = dir[:-1]
-            self.left_list.remove(oldDir)
-            self.right_list.remove(oldDir)
-            
-            self.left_list.append(dir)
-            self.right_list.append(dir)
+        if self.format == "text":
+            self.output.write(f"( {destination}, {backup} ):\n\n")
+            for title, files in sections.items():
+                print_files(title, files, self.output)
+            self.output.write(f"\n{summary}\n\n\n")
+
+        elif self.format == "jsonl":
+            for title, files in sections.items():
+                status = self.SECTIONS[title]
+                self.output.writelines(
+                    json.dumps({
+                        "destination": destination,
+                        "backup": backup,
+                        "status": status,
+                        "path": files[file],
+                        "source": file
+                    } if isinstance(files, dict) else {
+                        "destination": destination,
+                        "backup": backup,
+                        "status": status,
+                        "path": file,
+                        **details.get(file, {})
+                    }, ensure_ascii=False) + "\n"
+                    for file in sorted_paths(files)
+                )
+            self.output.write(json.dumps({
+                "destination": destination,
+                "backup": backup,
+                "status": "summary",
+                **{ status: len(sections[title]) for title, status in self.SECTIONS.items() }
+            }, ensure_ascii=False) + "\n")
 
-    def phase3(self):
-        '''
-        Compare files content, not only os.stat attributes
-        '''
-        xx = filecmp.cmpfiles(
-            a=self.left,
-            b=self.right,
-            common=self.common_files,
-            shallow=False
-        )
-        self.same_files, self.diff_files, self.funny_files = xx
+        else:
+            for title, files in sections.items():
+                status = self.SECTIONS[title]
+                self.csv.writerows(
+                    (destination, backup, status, files[file], file)
+                    if isinstance(files, dict) else
+                    (destination, backup, status, file, "")
+                    for file in sorted_paths(files)
+                )
 
-    def phase4(self):
-        '''
-        Find out all subdirectories not only common
-        '''
-        common_dirs = dircmp.list_to_dict(
-            self.common_dirs,
-            self.left
-        )
-        self.subdirs = {
-            **common_dirs,
-            **self.left_only_dirs,
-            **self.right_only_dirs
-        }
+        self.output.flush()
 
-    def phase5(self):
-        '''
-        left_only_dirs and right_only_dirs with subdirs
-        also update left_only and right_only files
-        '''
-        self.left_only_dirs = {}
-        dircmp.parse_dirs(
-            dircmp.dict_to_list(self.left_only),
-            self.left,
-            self.left_only_dirs,
-            self.left_only,
-            True,
-            self.leftBasePath
-        )
-        #  Remove old dir names without /
-        for dir in self.left_only_dirs.keys():
-            self.left_only.pop(dir[:-1], None)
-            if dir[:-1] in self.left_list:
-                self.left_list.remove(dir[:-1])
-        self.left_only.update(self.left_only_dirs)
-        dircmp.update_list(
-            dircmp.dict_to_list(self.left_only_dirs),
-            self.left_list
-        )
-        
-        self.right_only_dirs = {}
-        dircmp.parse_dirs(
-            dircmp.dict_to_list(self.right_only),
-            self.right,
-            self.right_only_dirs,
-            self.right_only,
-            True,
-            self.rightBasePath
-        )
-        for dir in self.right_only_dirs.keys():
-            self.right_only.pop(dir[:-1], None)
-            if dir[:-1] in self.right_list:
-                self.right_list.remove(dir[:-1])
-        self.right_only.update(self.right_only_dirs)
-        dircmp.update_list(
-            dircmp.dict_to_list(self.right_only_dirs),
-            self.right_list
-        )
-    
-    @staticmethod
-    def parse_dirs(
-        files: list[str],
-        rootPath: str,
-        dirs: dict=None,
-        dirsFiles: dict=None,
-        recursive: bool=True,
-        basePath: str = ""
-    ):
-        '''
-        Parse dirs from given files in format
-        {"dirname": "rootPath", "dirname/subdirname": "subdirPath"}
-
-        And files
-        {"subdir/filename": "filepath"}
-
-        Args:
-            files (list[str]): Folder files
-            rootPath (str): Folder path
-            dirs (dict, optional): Dict, where 
-                to write dirs found among folder
-                files. Defaults to None
-            dirsFiles (dict, optional): Dict, 
-                where to write files found 
-                among folder files. Defaults
-                to None
-            recursive (bool, optional): Parse
-                dirs recursively. Defaults to
-                True
-            basePath (str, optional): Indicates
-                that rootPath is a subdirectory of
-                another directory, allows to calculate
-                the full prefix to the file:
-                subdir/file vs subdir/subdir/.../file
-        '''
-        for file in files:
-            file = file.rstrip(os.sep)
-            file = file.split(os.sep)[-1]
-            filepath = os.path.join(rootPath, file)
-            #  Calculate full subdir prefix
-            if basePath:
-                file = os.path.relpath(filepath, basePath)
-            
-            #  Fix layering of multiple calls
-            if os.path.exists(filepath):
-
-                if os.path.isdir(filepath):
-                    
-                    if dirs:
-                        dirs[f"{file}{os.sep}"] = rootPath
-                        
-                        #  Recursively extract subdirs and files
-                        if recursive:
-                            subdirs = {}
-                            subdirsFiles = {}
-
-                            dircmp.parse_dirs(
-                                os.listdir(filepath),
-                                filepath,
-                                subdirs,
-                                subdirsFiles,
-                                True,
-                                basePath
-                            )
-
-                            #  Convert names to subdir/name
-                            #  If basePath defined, then name calculations already done
-                            if not basePath:
-                                for name, filepath in subdirs.copy().items():
-                                    subdir = os.path.split(filepath)[1]
-                                    subdirs[f"{subdir}{os.sep}{name}"] = subdirs.pop(name)
-                                for name, filepath in subdirsFiles.copy().items():
-                                    subdir = os.path.split(filepath)[1]
-                                    subdirsFiles[f"{subdir}{os.sep}{name}"] = subdirsFiles.pop(name)
-
-                            dirs.update(subdirs)
-
-                            if dirsFiles:
-                                dirsFiles.update(subdirsFiles)
-                
-                elif dirsFiles:
-                    dirsFiles[file] = rootPath
-
-            elif dirsFiles:
-                dirsFiles.pop(file, None)
-    
-    @staticmethod
-    def list_to_dict(files: list[str], path) -> dict[str, str]:
-        '''
-        Convert filenames list to dict
-        {"filename": "filepath"}
 
-        Args:
-            path (str): Filepath
-            files (list[str): Filenames
+def find_deltas(backupPath: str) -> list[str]:
+    '''
+    Find deltas of the backup, they are kept next to it
 
-        Returns:
-            dict[str, str]: Converted dict
-        '''
-        return dict((file, path) for file in files)
-    
-    @staticmethod
-    def dict_to_list(files: dict[str, str]) -> list[str]:
-        '''
-        Convert filenames dict to list
-        ["filename", "subdirname/filename"]
+    Args:
+        backupPath (str): Path of full backup, dir or archive
 
-        Args:
-            files (dict[str, str]): Filenames
+    Returns:
+        list[str]: Paths of deltas in order of creation
+    '''
+    directory, name = os.path.split(backupPath.rstrip("/").rstrip("\\"))
+    prefix = f"{name}{DELTA_SUFFIX}"
 
-        Returns:
-            list[str]: Converted list
-        '''
-        return list(files.keys())
+    return sorted(
+        os.path.join(directory, file)
+        for file in os.listdir(directory or os.curdir)
+        if file.startswith(prefix) and file.endswith(".zip")
+    )
 
-    @staticmethod
-    def join_subdir(subdir: str, files: list[str]):
-        '''
-        Convert filenames to subdir/name format
 
-        Args:
-            subdir (str): Subdir name to join
-            files (list[str]): Filenames to convert
+def read_delta_info(deltaPath: str) -> dict:
+    '''
+    Read info member of the delta
 
-        Overwrites files list with changes
-        '''
-        for file in files.copy():
-            files.append(f"{subdir}{os.sep}{file}")
-            files.remove(file)
-    
-    @staticmethod
-    def update_list(values: list, target: list):
-        '''
-        dictionary.update for list
-        Adds values to the list only if they are not in it
-
-        Args:
-            values (list): Values to add
-            target (list): List
-        '''
-        for value in values:
-            if value not in target:
-                target.append(value)
-
-    methodmap = dict(
-        subdirs=phase4,
-        same_files=phase3,
-        diff_files=phase3,
-        funny_files=phase3,
-        common_dirs=phase2,
-        common_files=phase2,
-        common_funny=phase2,
-        common=phase1,
-        left_only=phase1,
-        left_only_dirs=phase5,
-        right_only=phase1,
-        right_only_dirs=phase5,
-        left_list=filecmp.dircmp.phase0,
-        right_list=filecmp.dircmp.phase0
-    )
+    Args:
+        deltaPath (str): Path of delta archive
 
+    Returns:
+        dict: previous, created, ignore, removed, dirs
+            and state, see write_delta
+    '''
+    with ZipFile(deltaPath, "r") as archive, archive.open(DELTA_INFO_NAME) as source:
+        return json.load(source)
 
-def contains_only(
-    string: str,
-    substring: str,
-    exclude: list[str]=[]
-) -> bool:
+
+def entry_signature(compared: TreeComparison, path: str) -> str | None:
     '''
-    Check if a string contains a substring
-    and does not contain any other substrings
+    State of the left side entry, the same
+    signature means the same entry
 
     Args:
-        string (str): String
-        substring (str): Substring to look for in the string
-        exclude (list[str], optional): Substrings that should
-            not be in the string. Defaults to [].
+        compared (TreeComparison): Comparison of the entry
+        path (str): Path of the entry
 
     Returns:
-        bool: A substring was found in a string and no
-            substrings were found from exclude
+        str | None: "dir", "link:target", "file:size:crc32"
+            or None if missing or can't be archived
     '''
-    if not substring in string:
-        return False
-    if exclude:
-        if any(substring in string for substring in exclude):
-            return False
-    return True
+    try:
+        stats = os.lstat(path)
+    except FileNotFoundError:
+        return None
+
+    if stat.S_ISLNK(stats.st_mode):
+        return f"link:{os.readlink(path)}"
+    if stat.S_ISDIR(stats.st_mode):
+        return "dir"
+    if stat.S_ISREG(stats.st_mode):
+        return f"file:{stats.st_size}:{compared.path_crc32(compared.left, path):08x}"
+    return None
+
+
+def write_delta(
+    compared: TreeComparison,
+    deltaPath: str,
+    previous: str | None=None
+) -> tuple[int, int, int] | None:
+    '''
+    Write zip with changes turning the right side of
+    the comparison, a full backup, into the left side
+
+    The delta has new and modified files and links, info
+    member has ignore patterns of the comparison, created
+    dirs, removed paths and the state: {"name": signature}
+    of all entries that differ from the full backup, names
+    are separated with "/". Ignored paths aren't tracked, so
+    they are dropped on restore, see apply_deltas. With the state
+    of the previous delta only changes since it are written,
+    so deltas are applied as a chain, see apply_deltas
+
+    Moved files are written as new ones, the delta doesn't
+    depend on the full backup content
+
+    Args:
+        compared (TreeComparison): Comparison of the current
+            state with the full backup
+        deltaPath (str): Path of delta archive to write
+        previous (str | None, optional): Path of the last
+            delta of the chain. Defaults to None.
+
+    Returns:
+        tuple[int, int, int] | None: Numbers of written
+            entries, removed paths and unreadable entries,
+            None if nothing changed since previous delta
+    '''
+    table = compared.table
+
+    def to_key(name: str) -> str:
+        return name.replace(os.sep, "/").rstrip("/")
+
+    def moved(side: int) -> list[str]:
+        return table.names(table.entries(
+            lambda flags, result: result == PathTable.MOVED and flags & 3 == side
+        ))
+
+    def signature(key: str) -> str | None:
+        return entry_signature(compared, os.path.join(compared.left, compared.to_name(key)))
+
+    #  Entries differing from the full backup
+    state = {}
+    errors = 0
+
+    for name in [ *compared.left_only, *compared.diff_files, *moved(PathTable.LEFT) ]:
+        key = to_key(name)
+        try:
+            state[key] = signature(key)
+        except OSError:
+            errors += 1
+    for name in [ *compared.right_only, *moved(PathTable.RIGHT) ]:
+        state.setdefault(to_key(name), None)
+
+    previousState = read_delta_info(previous)["state"] if previous else {}
+
+    files, dirs, removed = [], [], []
+
+    for key in sorted(state.keys() | previousState.keys()):
+        if key in state:
+            entry = state[key]
+            if key in previousState and previousState[key] == entry:
+                continue
+        else:
+            #  Same as in the full backup again
+            try:
+                entry = signature(key)
+            except OSError:
+                errors += 1
+                continue
+
+        if entry is None:
+            removed.append(key)
+        elif entry == "dir":
+            dirs.append(key)
+        else:
+            files.append(key)
+
+    if not (files or dirs or removed):
+        return None
 
+    info = {
+        "previous": os.path.basename(previous) if previous else None,
+        "created": time.time(),
+        "ignore": compared.ignore.patterns,
+        "removed": removed,
+        "dirs": dirs,
+        "state": state
+    }
 
-def insert_to_sorted(strings: list[str], sortedStrings: list[str]):
+    #  Unfinished delta is never found as a part of chain
+    temporaryPath = f"{deltaPath}.tmp"
+    written = 0
+
+    with ZipFile(temporaryPath, "w", zipfile.ZIP_DEFLATED) as archive:
+        for key in files:
+            try:
+                archive.write(os.path.join(compared.left, compared.to_name(key)), key)
+                written += 1
+            except OSError:
+                errors += 1
+        archive.writestr(DELTA_INFO_NAME, json.dumps(info, ensure_ascii=False))
+
+    os.replace(temporaryPath, deltaPath)
+
+    return written + len(dirs), len(removed), errors
+
+
+def remove_path(path: str):
     '''
-    Insert strings into an already sorted list
+    Remove file, link or dir tree if it exists
 
     Args:
-        strings (list[str]): Strings to insert
-        sortedStrings (list[str]): Sorted list
+        path (str): Path to remove
+    '''
+    if os.path.isdir(path) and not os.path.islink(path):
+        shutil.rmtree(path)
+    elif os.path.lexists(path):
+        os.remove(path)
 
-    Overwrites sortedStrings with inserted strings into it
+
+def remove_ignored(root: str, ignore: IgnorePatterns):
     '''
-    for string in strings:
-        for sortedString in sortedStrings:
-            if sortedString > string:
-                index = sortedStrings.index(sortedString)
-                sortedStrings.insert(index, string)
-                break
+    Remove paths matching ignore patterns from the dir tree
 
+    Args:
+        root (str): Directory path
+        ignore (IgnorePatterns): Patterns to remove
+    '''
+    stack = [""]
 
-def sorted_paths(files: list[str]) -> list[str]:
+    while stack:
+        prefix = stack.pop()
+        with os.scandir(os.path.join(root, prefix)) as scanner:
+            entries = list(scanner)
+
+        for entry in entries:
+            isdir = entry.is_dir(follow_symlinks=False)
+            name = f"{prefix}{entry.name}/" if isdir else f"{prefix}{entry.name}"
+
+            if ignore.match(name):
+                remove_path(entry.path)
+            elif isdir:
+                stack.append(name)
+
+
+def apply_deltas(root: str, deltas: list[str], preferredEncoding: str="cp866"):
     '''
-    Sort files by dirs
+    Apply chain of deltas to the dir with full backup.
+    Paths ignored by the comparison of a delta are
+    removed, their backup copies may be outdated
 
     Args:
-        files (list[str]): Files to sort
+        root (str): Dir with the full backup
+        deltas (list[str]): Paths of deltas in order of
+            creation, each must be next to its previous
+        preferredEncoding (str, optional): Encoding to use
+            when guessing filenames original. Defaults to "cp866".
+    '''
+    previous = None
+
+    for delta in deltas:
+        with ZipFile(delta, "r", preferredEncoding=preferredEncoding, overwriteDuplicates=True) as archive:
+            with archive.open(DELTA_INFO_NAME) as source:
+                info = json.load(source)
+
+            if info["previous"] != previous:
+                raise ValueError(f"Delta \"{delta}\" doesn't follow \"{previous}\" in the chain")
+            previous = os.path.basename(delta)
+
+            if info.get("ignore"):
+                remove_ignored(root, IgnorePatterns(info["ignore"]))
+
+            for key in info["removed"]:
+                remove_path(os.path.join(root, TreeComparison.to_name(key)))
+
+            for key in info["dirs"]:
+                path = os.path.join(root, TreeComparison.to_name(key))
+                if not os.path.isdir(path) or os.path.islink(path):
+                    remove_path(path)
+                os.makedirs(path, exist_ok=True)
+
+            members = [ name for name in archive.namelist() if name != DELTA_INFO_NAME ]
+
+            #  Files replace dirs of the full backup
+            for member in members:
+                name = archive.resolve_member(archive.getinfo(member))[0]
+                path = os.path.join(root, TreeComparison.to_name(name))
+                if os.path.isdir(path) and not os.path.islink(path):
+                    shutil.rmtree(path)
+
+            archive.extractall(root, members)
+
+
+def restore_backup(
+    backupPath: str,
+    target: str,
+    preferredEncoding: str="cp866",
+    deltas: list[str] | None=None,
+    ignore: list[str]=[]
+) -> str:
+    '''
+    Copy or extract full backup and apply its deltas,
+    paths ignored by them or by ignore aren't restored,
+    their backup copies may be outdated
+
+    Args:
+        backupPath (str): Path of full backup, dir or archive
+        target (str): Dir to restore into, must not exist
+        preferredEncoding (str, optional): Encoding to use
+            when guessing filenames original. Defaults to "cp866".
+        deltas (list[str] | None, optional): Chain of deltas
+            to apply. Defaults to all found next to the backup.
+        ignore (list[str], optional): Names or glob patterns
+            not to restore. Defaults to [].
 
     Returns:
-        list[str]: Sorted files
+        str: Path of restored dir, archives with a dir
+            named after them are restored into it
     '''
-    files = files.copy()
-    files.sort()
-    dirs = []
+    if os.path.exists(target):
+        raise FileExistsError(f"Restore target \"{target}\" already exists")
 
-    #  Find dirs
-    for file in files.copy():
-        if file.endswith(os.sep):
-            files.remove(file)
-            dirs.append(file)
-    
-    if not dirs:
-        return files
+    if deltas is None:
+        deltas = find_deltas(backupPath)
+
+    if os.path.isdir(backupPath):
+        shutil.copytree(backupPath, target, symlinks=True)
+        root = target
+    else:
+        with open_archive(backupPath, "r", preferredEncoding=preferredEncoding) as archive:
+            archive.extractall(target)
+            prefix = archivecmp.default_root(backupPath, archive.namelist())
+        root = os.path.join(target, TreeComparison.to_name(prefix))
 
-    dirs.sort()
-    sortedFiles = []
+    if ignore:
+        remove_ignored(root, IgnorePatterns(ignore))
 
-    for dir in dirs.copy():
-        sortedFiles.append(dir)
-        dirs.remove(dir)
-        for file in files.copy():
-            if contains_only(file, dir, dirs):
-                files.remove(file)
-                sortedFiles.append(file)
-    
-    insert_to_sorted(files, sortedFiles)
-    return sortedFiles
+    apply_deltas(root, deltas, preferredEncoding)
 
+    return root
 
-def print_files(title: str, files: list[str], output: IO):
+
+def render_progressbars(progressbars: list[ProgressBar]):
     '''
-    Print files list
+    Render several progress bars on separate lines
+    until all of them are finished
+
+    Bars should be in clearMode, change their counter
+    and finished variables from other threads
 
     Args:
-        title (str): List title
-        files (list[str]): Files names
-        output (IO): Output source. Use sys.stdout for printing in terminal
+        progressbars (list[ProgressBar]): Bars to render
     '''
-    if files:
-        print(f"{title}:", file=output, flush=True)
-        for file in sorted_paths(files):
-            print(f"    {file}", file=output, flush=True)
+    progressbars[0].change_cursor_visibility(False)
+    while True:
+        rendering = [ progressbar.render(progressbar.counter) for progressbar in progressbars ]
+        if not any(rendering):
+            break
+        time.sleep(progressbars[0].timeout)
+        clear_terminal(len(progressbars))
+    progressbars[0].change_cursor_visibility(True)
 
 
 def get_storage_drives() -> set[str]:
@@ -603,19 +2749,55 @@ def get_storage_drives() -> set[str]:
     return drives
 
 
+def watch_destination(
+    backupDestination: str,
+    journalPath: str,
+    ignore: list[str]=[".git"]
+):
+    '''
+    Keeps the change journal of backupDestination
+    until interrupted, so comparisons check only
+    paths changed since the backup. Linux only
+
+    Args:
+        backupDestination (str): Path of backup to watch
+        journalPath (str): Path of change journal
+        ignore (list[str], optional): Filenames to ignore.
+            Defaults [".git"]
+    '''
+    with ChangeJournal(journalPath) as journal:
+        watcher = DestinationWatcher(backupDestination, journal, ignore)
+        print(f"Watching {backupDestination}")
+        try:
+            watcher.run()
+        except KeyboardInterrupt:
+            pass
+
+
 def compare_backups(
     backupFilename: str,
     backupDestination: str,
     reportFilepath: str="compared.txt",
     preferredEncoding: str="cp866",
     ignore: list[str]=[".git"],
-    path: str | None=None
+    path: str | None=None,
+    workers: int | None=None,
+    hashCachePath: str | None=None,
+    reportFormat: str="text",
+    journalPath: str | None=None,
+    mode: str="full",
+    ranges: bool=False,
+    delta: bool=False
 ):
     '''
     Detects backups on connected drives and
     compares them with the current state located
     at backupDestination
 
+    Drives are compared concurrently, one thread
+    per drive, report sections are written in
+    sorted order of drives
+
     Args:
         backupFilename (str): Filename with extension
             to look for on drives.
@@ -624,13 +2806,36 @@ def compare_backups(
         reportFilepath (str, optional): Path of detailed
             report. Defaults to "compared.txt".
         preferredEncoding (str, optional): Encoding to use
-            when guessing zip filenames original.
+            when guessing zip or tar filenames original.
             Defaults to "cp866".
         ignore (list[str], optional): Filenames to ignore
             in backup. Defaults [".git"]
         path (str | None, optional): Path of backup to
             compare with backupDestination. Disables
             auto discovery. Defaults to None
+        workers (int | None, optional): Number of threads
+            comparing files content of backup dirs.
+            Defaults to ThreadPoolExecutor default
+        hashCachePath (str | None, optional): Path of
+            SQLite database with CRC32 of files, so
+            unchanged files are not read on next runs.
+            Defaults to None
+        reportFormat (str, optional): Report format, "text",
+            "jsonl" or "csv". Defaults to "text"
+        journalPath (str | None, optional): Path of change
+            journal kept by watch_destination. Only paths
+            changed since the backup was modified are
+            compared, if the journal covers that time.
+            Defaults to None
+        mode (str, optional): Files comparison tier, "stat",
+            "sample", "full" or "verify". Defaults to "full"
+        ranges (bool, optional): Find byte ranges changed in
+            modified files of backup, jsonl report has them
+            as "ranges": [[offset, length]] with "size" of
+            the file. Defaults to False
+        delta (bool, optional): Write a delta archive next
+            to each backup with changes since it and its last
+            delta, see write_delta. Defaults to False
     '''
     if path:
         path = path.rstrip("/").rstrip("\\")
@@ -639,93 +2844,148 @@ def compare_backups(
     else:
         drives = get_storage_drives()
     
-    report = open(reportFilepath, "w")
-    backupName, backupExtension = os.path.splitext(backupFilename)
-
-    for drive in drives.copy():
+    report = open(reportFilepath, "w", buffering=CHUNK_SIZE, newline="" if reportFormat == "csv" else None)
+    reportWriter = ReportWriter(report, reportFormat)
+    backupExtension = split_archive_extension(backupFilename)[1]
+    hashCache = HashCache(hashCachePath) if hashCachePath else None
+    #  Shared by drives, the destination is read by all of them
+    scheduler = IOScheduler()
+
+    journal = ChangeJournal(journalPath) if journalPath else None
+    #  {"drive": names changed since backup or None}
+    changed = {}
+
+    found = []
+    for drive in sorted(drives):
         try:
-            if backupFilename in os.listdir(drive):
+            files = os.listdir(drive)
+            #  Split zip is found by its first volume
+            if backupFilename in files or f"{backupFilename}.001" in files:
                 print(f"Found backup in {drive}")
-                backupFilepath = os.path.join(drive, backupFilename)
-                
-                if backupExtension:
-                    print(f"Extracting {backupFilepath}")
-
-                    if backupExtension == ".zip":
-                        with ZipFile(
-                            file=backupFilepath,
-                            mode="r",
-                            preferredEncoding=preferredEncoding,
-                            ignore=ignore,
-                            progressbar=True,
-                            useBarPrefix=False
-                        ) as zip:
-                            zip.extractall(tempfile.gettempdir())
-
-                    backupFilepath = os.path.join(tempfile.gettempdir(), backupName)
-
-                print(f"Comparing with {backupDestination}")
+                found.append(drive)
+                changed[drive] = None
+                if journal:
+                    backupFilepath = os.path.join(drive, backupFilename)
+                    backupFilepath = (VolumeFile.find_volumes(backupFilepath) or [backupFilepath])[-1]
+                    backupTime = os.stat(backupFilepath).st_mtime
+                    changed[drive] = journal.touched(backupDestination, backupTime)
+                    if changed[drive] is None:
+                        print("Change journal doesn't cover the backup, comparing everything")
+        except (PermissionError, FileNotFoundError):
+            pass
+
+    if journal:
+        journal.close()
+
+    if found:
+        print(f"Comparing with {backupDestination}")
+
+    #  One progress line per drive
+    progressbars = {
+        drive: ProgressBar(size=40, prefix=f"{drive} ", unit="files", clearMode=True)
+        for drive in found
+    }
+
+    def compare(drive: str) -> TreeComparison:
+        backupFilepath = os.path.join(drive, backupFilename)
+        try:
+            #  Archive is compared by checksums without extracting
+            if backupExtension:
+                compared = archivecmp(
+                    leftPath=backupDestination,
+                    archivePath=backupFilepath,
+                    preferredEncoding=preferredEncoding,
+                    ignore=ignore,
+                    progressbar=progressbars[drive],
+                    hashCache=hashCache,
+                    scheduler=scheduler,
+                    names=changed[drive],
+                    mode=mode
+                )
+            else:
                 compared = dircmp(
                     leftPath=backupDestination,
                     rightPath=backupFilepath,
                     ignore=ignore,
-                    progressbar=True
-                )
-
-                print(
-                    f"( {backupDestination}, {os.path.join(drive, backupFilename)} ):",
-                    end="\n\n",
-                    file=report,
-                    flush=True
-                )
-                print_files(
-                    "New",
-                    dircmp.dict_to_list(compared.right_only),
-                    report
-                )
-                print_files(
-                    "Modified",
-                    compared.diff_files,
-                    report
-                )
-                print_files(
-                    "Removed",
-                    dircmp.dict_to_list(compared.left_only),
-                    report
-                )
-                print_files(
-                    "Error",
-                    compared.funny_files,
-                    report
+                    progressbar=progressbars[drive],
+                    workers=workers,
+                    hashCache=hashCache,
+                    scheduler=scheduler,
+                    names=changed[drive],
+                    mode=mode
                 )
-                print(
-                    f"\n( new: {len(compared.right_only)}, modified: {len(compared.diff_files)}, removed: {len(compared.left_only)} )",
-                    end="\n\n\n",
-                    file=report,
-                    flush=True
+            if ranges:
+                compared.find_ranges()
+            if delta:
+                deltas = find_deltas(backupFilepath)
+                deltaPath = os.path.join(
+                    drive,
+                    f"{backupFilename}{DELTA_SUFFIX}{time.strftime('%Y%m%d-%H%M%S')}.zip"
                 )
+                writtenDeltas[drive] = deltaPath, write_delta(compared, deltaPath, deltas[-1] if deltas else None)
+            return compared
+        finally:
+            progressbars[drive].finished = True
+
+    #  {"drive": number of files in sections}
+    summaries = {}
+    #  {"drive": (delta path, result of write_delta)}
+    writtenDeltas = {}
+
+    if found:
+        renderer = threading.Thread(
+            target=render_progressbars,
+            args=(list(progressbars.values()),)
+        )
+        renderer.start()
 
-                compared.finish_progressbar()
-
-                print(
-                    f"( new: {len(compared.right_only)}, modified: {len(compared.diff_files)}, removed: {len(compared.left_only)} )",
-                    end="\n\n"
-                )
-
-                if backupExtension:
-                    shutil.rmtree(backupFilepath)
-
+        #  Drives are compared concurrently, but reported in
+        #  sorted order, so the report is the same every run
+        try:
+            with ThreadPoolExecutor(len(found)) as executor:
+                futures = { drive: executor.submit(compare, drive) for drive in found }
+
+                for drive in found:
+                    compared = futures.pop(drive).result()
+                    #  Results are built from the table once
+                    sections = {
+                        "New": list(compared.right_only),
+                        "Modified": compared.diff_files,
+                        "Removed": list(compared.left_only),
+                        "Moved": compared.moved,
+                        "Error": compared.funny_files
+                    }
+                    details = { name: { "offset": offset } for name, offset in compared.diff_offsets.items() }
+                    for name, (size, fileRanges) in compared.diff_ranges.items():
+                        details.setdefault(name, {}).update(size=size, ranges=fileRanges)
+                    reportWriter.write(backupDestination, os.path.join(drive, backupFilename), sections, details)
+                    summaries[drive] = { title: len(files) for title, files in sections.items() }
+                    del compared, sections, details
+        finally:
+            renderer.join()
+
+    for drive, summary in summaries.items():
+        print(
+            f"{drive} ( new: {summary['New']}, modified: {summary['Modified']}, removed: {summary['Removed']}, moved: {summary['Moved']} )"
+        )
+        if drive in writtenDeltas:
+            deltaPath, written = writtenDeltas[drive]
+            if written is None:
+                print("No changes since the last delta")
             else:
-                raise FileNotFoundError
-        
-        except (PermissionError, FileNotFoundError):
-            drives.remove(drive)
-    
-    if drives:
+                print(f"Delta {deltaPath} ( written: {written[0]}, removed: {written[1]}, errors: {written[2]} )")
+    print()
+
+    if found:
         print(f"View {os.path.basename(reportFilepath)} for detailed report")
     else:
         print("No backups found")
 
+    if hashCache:
+        #  Only the destination is scanned every run
+        hashCache.prune(backupDestination)
+        hashCache.close()
+
     report.close()
 
 
@@ -747,10 +3007,16 @@ if __name__ == "__main__":
         default="compared.txt",
         help="path of detailed report"
     )
+    parser.add_argument(
+        "--report-format",
+        choices=ReportWriter.FORMATS,
+        default="text",
+        help="format of detailed report: text, json lines or csv"
+    )
     parser.add_argument(
         "--preferred-encoding",
         default="cp866",
-        help="encoding to use when guessing zip filenames original"
+        help="encoding to use when guessing zip or tar filenames original"
     )
     parser.add_argument(
         "--ignore",
@@ -763,15 +3029,77 @@ if __name__ == "__main__":
         "--path",
         help="path of backup to compare with destination. disables auto discovery"
     )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        help="number of threads comparing files content"
+    )
+    parser.add_argument(
+        "--hash-cache",
+        help="path of database with checksums of files, unchanged files are not read again"
+    )
+    parser.add_argument(
+        "--mode",
+        choices=COMPARISON_MODES,
+        default="full",
+        help="stat: sizes and mtimes, sample: head, middle and tail blocks, "
+        "full: content, verify: samples and content of files with changed mtimes"
+    )
+    parser.add_argument(
+        "--ranges",
+        action="store_true",
+        help="find byte ranges changed in modified files, written to jsonl report"
+    )
+    parser.add_argument(
+        "--delta",
+        action="store_true",
+        help="write a delta archive next to backup with changes since it and its last delta"
+    )
+    parser.add_argument(
+        "--restore",
+        help="restore backup at path with its deltas applied into this dir, without ignored files"
+    )
+    parser.add_argument(
+        "--journal",
+        help="path of change journal, only files changed since backup are compared"
+    )
+    parser.add_argument(
+        "--watch",
+        action="store_true",
+        help="keep the change journal of destination until interrupted, linux only"
+    )
     args = parser.parse_args()
 
-    if args.name and args.destination:
+    if args.watch and args.destination and args.journal:
+        watch_destination(
+            backupDestination=args.destination,
+            journalPath=args.journal,
+            ignore=args.ignore
+        )
+
+    elif args.restore and args.path:
+        root = restore_backup(
+            backupPath=args.path,
+            target=args.restore,
+            preferredEncoding=args.preferred_encoding,
+            ignore=args.ignore
+        )
+        print(f"Restored into {root}")
+
+    elif args.name and args.destination:
         compare_backups(
             backupFilename=args.name,
             backupDestination=args.destination,
             reportFilepath=args.report,
             preferredEncoding=args.preferred_encoding,
-            ignore=args.ignore
+            ignore=args.ignore,
+            workers=args.workers,
+            hashCachePath=args.hash_cache,
+            reportFormat=args.report_format,
+            journalPath=args.journal,
+            mode=args.mode,
+            ranges=args.ranges,
+            delta=args.delta
         )
 
     elif args.destination and args.path:
@@ -781,5 +3109,12 @@ if __name__ == "__main__":
             reportFilepath=args.report,
             preferredEncoding=args.preferred_encoding,
             ignore=args.ignore,
-            path=args.path
+            path=args.path,
+            workers=args.workers,
+            hashCachePath=args.hash_cache,
+            reportFormat=args.report_format,
+            journalPath=args.journal,
+            mode=args.mode,
+            ranges=args.ranges,
+            delta=args.delta
         )
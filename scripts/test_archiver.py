@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+
+'''
+This file is part of 2trvl/2trvl
+Personal repository with scripts and configs
+Which is released under MIT License
+Copyright (c) 2022 Andrew Shteren
+---------------------------------------------
+               Archiver Tests
+---------------------------------------------
+Regression tests of archives changed in place,
+run with python -m unittest in scripts dir
+
+'''
+import hashlib
+import os
+import tempfile
+import unittest
+
+from archiver import ZipFile
+
+
+class DeduplicationTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.root = self.directory.name
+        self.archivePath = os.path.join(self.root, "backup.zip")
+        os.mkdir(os.path.join(self.root, "src"))
+        for name in ("a.txt", "b.txt"):
+            self.write_file(f"src/{name}", "same content\n")
+
+        with ZipFile(self.archivePath, "w", deduplicate=True) as archive:
+            archive.write(os.path.join(self.root, "src"), "src")
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def write_file(self, name: str, content: str):
+        with open(os.path.join(self.root, name), "w") as file:
+            file.write(content)
+
+    def extracted(self) -> dict[str, str]:
+        target = os.path.join(self.root, "extracted")
+        with ZipFile(self.archivePath, "r") as archive:
+            self.assertIsNone(archive.testzip())
+            archive.extractall(target)
+
+        contents = {}
+        for name in os.listdir(os.path.join(target, "src")):
+            with open(os.path.join(target, "src", name)) as file:
+                contents[name] = file.read()
+        return contents
+
+    def test_overwrite_original(self):
+        self.write_file("src/a.txt", "version2\n")
+
+        with ZipFile(self.archivePath, "a", deduplicate=True, overwriteDuplicates=True) as archive:
+            archive.write(os.path.join(self.root, "src", "a.txt"), "src/a.txt")
+
+        self.assertEqual(
+            self.extracted(),
+            { "a.txt": "version2\n", "b.txt": "same content\n" }
+        )
+
+    def test_remove_original(self):
+        with ZipFile(self.archivePath, "a") as archive:
+            archive.remove("src/a.txt")
+
+        self.assertEqual(self.extracted(), { "b.txt": "same content\n" })
+
+    def test_size_collision_hash(self):
+        self.write_file("src/c.txt", "next content\n")
+
+        with ZipFile(self.archivePath, "a", deduplicate=True, stats=True) as archive:
+            archive.write(os.path.join(self.root, "src", "c.txt"), "src/c.txt")
+            self.assertEqual(archive.stats.counters["files_prehashed"], 1)
+            self.assertEqual(
+                archive.manifest["src/c.txt"]["hash"],
+                hashlib.sha256(b"next content\n").hexdigest()
+            )
+
+        self.assertEqual(
+            self.extracted(),
+            { "a.txt": "same content\n", "b.txt": "same content\n", "c.txt": "next content\n" }
+        )
+
+
+class JournalTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.root = self.directory.name
+        self.archivePath = os.path.join(self.root, "backup.zip")
+        self.source = os.path.join(self.root, "src")
+        os.mkdir(self.source)
+        for name in ("f1", "f2", "f3"):
+            with open(os.path.join(self.source, name), "w") as file:
+                file.write(f"{name} content\n")
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_resume_interrupted_write(self):
+        archive = ZipFile(self.archivePath, "w", journal=True, checkpointInterval=0)
+        journal_member = archive._journal_member
+
+        def interrupt(member):
+            journal_member(member)
+            if member.filename == "src/f2":
+                raise KeyboardInterrupt
+
+        archive._journal_member = interrupt
+
+        with self.assertRaises(KeyboardInterrupt):
+            with archive:
+                archive.write(self.source, "src")
+
+        self.assertTrue(os.path.exists(archive.journalPath))
+
+        with ZipFile(self.archivePath, "a", journal=True) as archive:
+            archive.write(self.source, "src")
+
+        with ZipFile(self.archivePath, "r") as archive:
+            self.assertIsNone(archive.testzip())
+            self.assertEqual(
+                sorted(archive.namelist()),
+                ["src/", "src/f1", "src/f2", "src/f3"]
+            )
+            self.assertEqual(archive.read("src/f3"), b"f3 content\n")
+
+        self.assertFalse(os.path.exists(f"{self.archivePath}{ZipFile.JOURNAL_SUFFIX}"))
+
+
+if __name__ == "__main__":
+    unittest.main()